@@ -0,0 +1,103 @@
+import os
+import tempfile
+from datetime import datetime
+
+# mkstemp creates files readable only by their owner; published reports get
+# the permissions a plain open() would have given them.
+process_umask = os.umask(0)
+os.umask(process_umask)
+FILE_MODE = 0o666 & ~process_umask
+
+def write_temp(directory, content):
+    # content is bytes, a str or an iterable of str chunks (a streamed report).
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+    try:
+        os.chmod(tmp_path, FILE_MODE)
+        if isinstance(content, bytes):
+            file = os.fdopen(fd, 'wb')
+        else:
+            file = os.fdopen(fd, 'w', encoding='utf-8')
+        with file:
+            if isinstance(content, (str, bytes)):
+                file.write(content)
+            else:
+                file.writelines(content)
+            size = file.tell()
+    except Exception:
+        remove_quietly(tmp_path)
+        raise
+    return tmp_path, size
+
+def remove_quietly(file_path):
+    try:
+        os.remove(file_path)
+    except FileNotFoundError:
+        pass
+
+def publish(tmp_path, target_path):
+    # Makes the finished temp file visible as target_path, failing with
+    # FileExistsError if that name is taken. A hard link claims the name and
+    # publishes the content in one step; filesystems without hard links
+    # claim the name with O_EXCL and then rename over the empty placeholder.
+    try:
+        os.link(tmp_path, target_path)
+    except FileExistsError:
+        raise
+    except OSError:
+        os.close(os.open(target_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        os.replace(tmp_path, target_path)
+        return
+    os.remove(tmp_path)
+
+def candidate_paths(base, ext):
+    # The plain name first, then one stamped with the current second; only
+    # writers racing within the same second ever need a counter.
+    yield f"{base}{ext}"
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    yield f"{base} ({stamp}){ext}"
+    i = 2
+    while True:
+        yield f"{base} ({stamp}-{i}){ext}"
+        i += 1
+
+def write_unique(base, ext, content):
+    # Writes content under the first free name from candidate_paths. The
+    # cost does not depend on how many earlier reports share the base name,
+    # and concurrent writers never overwrite each other.
+    tmp_path, size = write_temp(os.path.dirname(base) or ".", content)
+    try:
+        for target_path in candidate_paths(base, ext):
+            try:
+                publish(tmp_path, target_path)
+                return target_path, size
+            except FileExistsError:
+                continue
+    finally:
+        remove_quietly(tmp_path)
+
+def write_content_addressed(base, ext, content_key, content):
+    # Identical inputs share one file: if the name already exists it holds
+    # the same report, so nothing is written.
+    target_path = f"{base}_{content_key[:16]}{ext}"
+    if os.path.exists(target_path):
+        return target_path, 0
+    tmp_path, size = write_temp(os.path.dirname(base) or ".", content)
+    try:
+        publish(tmp_path, target_path)
+    except FileExistsError:
+        size = 0
+    finally:
+        remove_quietly(tmp_path)
+    return target_path, size
+
+def replace_file(file_path, content):
+    # For files that are rewritten in place (fleet summary, site assets,
+    # .gz copies): readers see
+    # either the previous version or the new one, never a partial write.
+    tmp_path, size = write_temp(os.path.dirname(file_path) or ".", content)
+    try:
+        os.replace(tmp_path, file_path)
+    except Exception:
+        remove_quietly(tmp_path)
+        raise
+    return size
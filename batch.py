@@ -0,0 +1,228 @@
+import os
+import time
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from connectivity import ConnectivityStats, connection_results, write_connectivity_report
+from create_html import write_html_report, write_site_assets
+from dashboard import Dashboard, dashboard_row
+from fleet import FleetColumns, endpoint_metrics, write_fleet_report
+from history import HistoryStore, history_entry
+from parse_cache import ParseCache
+from pipeline import analyze_bundle, parse_bundle, report_digest, snapshot_host_name
+from profiling import span, start_profiling, stop_profiling, write_profile
+from select_directory import scan_bundle
+from snapshot_export import SnapshotOutput, snapshot_record
+from version_baseline import load_baseline
+
+def split_bundle_dirs(folder, info_dirs):
+    # A folder with one Info.txt below it, or one of its own, is a single
+    # bundle; a folder grouping several (e.g. one per host under a date
+    # folder) is split into its children.
+    if len(info_dirs) == 1 or folder in info_dirs:
+        return [folder]
+    return child_bundle_dirs(folder, info_dirs)
+
+def child_bundle_dirs(folder, info_dirs):
+    children = {}
+    for info_dir in info_dirs:
+        child = os.path.join(folder, os.path.relpath(info_dir, folder).split(os.sep)[0])
+        children.setdefault(child, []).append(info_dir)
+    return [bundle_dir for child, dirs in children.items() for bundle_dir in split_bundle_dirs(child, dirs)]
+
+def find_bundles(input_root, max_depth=None, exclude=None):
+    if os.path.isfile(input_root) or os.path.isfile(os.path.join(input_root, "Info.txt")):
+        return [input_root]
+
+    # One pruned scan of the whole tree that keeps going past the first
+    # Info.txt; bundle folders are then picked from where the Info.txt
+    # files are. Archives outside those folders are bundles of their own.
+    artifacts, duplicates, archive_paths = scan_bundle(input_root, max_depth, exclude, stop_when_complete=False)
+    info_paths = ([artifacts["Info.txt"]] if "Info.txt" in artifacts else []) + duplicates.get("Info.txt", [])
+    bundle_dirs = child_bundle_dirs(input_root, {os.path.dirname(path) for path in info_paths})
+    bundles = set(bundle_dirs)
+    for archive_path in archive_paths:
+        if not any(archive_path.startswith(bundle_dir + os.sep) for bundle_dir in bundle_dirs):
+            bundles.add(archive_path)
+    return sorted(bundles)
+
+# One cache per worker process, so its eviction bookkeeping spans every
+# bundle the worker handles.
+worker_caches = {}
+
+def get_worker_cache(cache_dir, cache_max_bytes):
+    key = (cache_dir, cache_max_bytes)
+    if key not in worker_caches:
+        worker_caches[key] = ParseCache(cache_dir, cache_max_bytes)
+    return worker_caches[key]
+
+def process_bundle(bundle_path, output_dir, version_info_path, debug=False, cache_dir=None, cache_max_bytes=None, fleet_metrics=False, scan_options=None, profile=False, output_format="html", record_history=False, content_names=False, layout="single", gzip_copy=False, dashboard=False, connectivity=False, log_signatures=None):
+    start = time.perf_counter()
+    result = {
+        "bundle": bundle_path,
+        "host_name": None,
+        "html_path": None,
+        "failed_steps": [],
+        "error": None,
+        "seconds": 0.0,
+        "cache_stats": None,
+        "metrics": None,
+        "profile": None,
+        "record": None,
+        "history": None,
+        "dashboard": None,
+        "connections": None
+    }
+
+    cache = get_worker_cache(cache_dir, cache_max_bytes) if cache_dir else None
+    stats_before = dict(cache.stats) if cache is not None else None
+    if profile:
+        start_profiling()
+    with span("bundle"):
+        try:
+            debug_dump_dir = tempfile.mkdtemp(prefix="ea_analyzer_") if debug else None
+            if output_format == "html":
+                snapshot, html_content = analyze_bundle(bundle_path, version_info_path, debug_dump_dir, cache, scan_options, layout=layout, log_signatures=log_signatures)
+                host_name = snapshot_host_name(snapshot)
+                html_output_path = os.path.join(output_dir, "Analyzer_Results.html")
+                content_key = report_digest(snapshot, version_info_path, layout) if content_names else None
+                result["html_path"] = write_html_report(html_content, host_name, html_output_path, content_key, gzip_copy)
+                if result["html_path"] is None:
+                    raise OSError(f"could not write the report for {host_name}")
+                if dashboard:
+                    result["dashboard"] = dashboard_row(snapshot, result["html_path"], output_dir, load_baseline(version_info_path))
+            else:
+                snapshot = parse_bundle(bundle_path, debug_dump_dir, cache, scan_options, log_signatures)
+                host_name = snapshot_host_name(snapshot)
+                result["record"] = snapshot_record(snapshot, version_info_path)
+            result["host_name"] = host_name
+            result["failed_steps"] = list(snapshot.failed_steps)
+            if fleet_metrics:
+                result["metrics"] = endpoint_metrics(snapshot)
+            if record_history:
+                result["history"] = history_entry(snapshot, bundle_path)
+            if connectivity:
+                result["connections"] = connection_results(snapshot)
+        except Exception as e:
+            result["error"] = str(e)
+    if profile:
+        # Tag every span with the host so outlier bundles can be found in
+        # the merged trace.
+        result["profile"] = stop_profiling(host=result["host_name"] or "N/A", bundle=str(bundle_path))
+
+    if cache is not None:
+        result["cache_stats"] = {key: value - stats_before[key] for key, value in cache.stats.items()}
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+def is_failure(result):
+    return result["error"] is not None or "Info.txt" in result["failed_steps"]
+
+def print_summary(results, elapsed):
+    failures = [r for r in results if is_failure(r)]
+    succeeded = len(results) - len(failures)
+    rate = len(results) / elapsed if elapsed > 0 else 0.0
+
+    print()
+    print("Batch summary")
+    print(f"  Bundles processed: {len(results)}")
+    print(f"  Succeeded:         {succeeded}")
+    print(f"  Failed:            {len(failures)}")
+    print(f"  Elapsed:           {elapsed:.2f}s")
+    print(f"  Throughput:        {rate:.2f} bundles/s")
+    if results:
+        slowest = max(results, key=lambda r: r["seconds"])
+        print(f"  Slowest bundle:    {slowest['bundle']} ({slowest['seconds']:.2f}s)")
+
+    cache_stats = [r["cache_stats"] for r in results if r["cache_stats"] is not None]
+    if cache_stats:
+        totals = {key: sum(stats[key] for stats in cache_stats) for key in cache_stats[0]}
+        print(f"  Parse cache:       {totals['parse_hits']} hit(s), {totals['parse_misses']} miss(es)")
+        print(f"  Report cache:      {totals['render_hits']} hit(s), {totals['render_misses']} miss(es)")
+        print(f"  Cache evictions:   {totals['evictions']}")
+
+    for r in failures:
+        reason = r["error"] if r["error"] is not None else f"could not parse {', '.join(r['failed_steps'])}"
+        print(f"  FAILED {r['bundle']}: {reason}")
+
+def run_batch(input_root, output_dir, version_info_path, workers=None, debug=False, cache_dir=None, cache_max_bytes=None, fleet_report=False, scan_options=None, profile=False, output_format="html", history_db=None, content_names=False, layout="single", gzip_copy=False, dashboard=False, connectivity_report=False, log_signatures=None):
+    bundles = find_bundles(input_root, **(scan_options or {}))
+    if not bundles:
+        print(f"No bundles found under {input_root}")
+        return []
+    if output_format == "html" and layout == "site":
+        write_site_assets(output_dir, gzip_copy)
+
+    print(f"Found {len(bundles)} bundle(s) under {input_root}")
+
+    start = time.perf_counter()
+    results = []
+    fleet = FleetColumns() if fleet_report else None
+    connectivity = ConnectivityStats() if connectivity_report else None
+    profile_events = []
+    snapshots = SnapshotOutput(output_format, output_dir) if output_format != "html" else None
+    # Workers only build the rows; the parent is the single writer.
+    history = HistoryStore(history_db) if history_db else None
+    board = Dashboard(output_dir) if dashboard and output_format == "html" else None
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(process_bundle, bundle, output_dir, version_info_path, debug, cache_dir, cache_max_bytes, fleet_report, scan_options, profile, output_format, history is not None, content_names, layout, gzip_copy, board is not None, connectivity is not None, log_signatures): bundle for bundle in bundles}
+            for future in as_completed(futures):
+                result = future.result()
+                metrics = result.pop("metrics")
+                if fleet is not None and metrics is not None:
+                    fleet.append(metrics)
+                # Each bundle's rows are folded into the per-URL counters and
+                # dropped, so memory grows with distinct URLs, not bundles.
+                connections = result.pop("connections")
+                if connectivity is not None and connections is not None and not is_failure(result) and "TestConnections.txt" not in result["failed_steps"]:
+                    connectivity.add(result["host_name"], connections)
+                events = result.pop("profile")
+                if events:
+                    profile_events.extend(events)
+                # Records are written as each bundle completes, so consumers
+                # can ingest the file while the batch is still running.
+                record = result.pop("record")
+                if snapshots is not None and record is not None and not is_failure(result):
+                    snapshots.write(record)
+                entry = result.pop("history")
+                if history is not None and entry is not None and not is_failure(result):
+                    history.insert(entry)
+                row = result.pop("dashboard")
+                if board is not None and row is not None:
+                    board.add(row)
+                results.append(result)
+                if debug and not is_failure(result) and result["html_path"] is not None:
+                    print(f"HTML report generated at {result['html_path']} for host {result['host_name']}")
+    finally:
+        if snapshots is not None:
+            snapshots.close()
+        if history is not None:
+            history.close()
+        if board is not None:
+            board.flush()
+        # Workers check the size bound only every few stores.
+        if cache_dir:
+            ParseCache(cache_dir, cache_max_bytes).evict()
+
+    print_summary(results, time.perf_counter() - start)
+    if snapshots is not None:
+        print(f"{snapshots.count} endpoint snapshot(s) written to {snapshots.path}")
+
+    if fleet is not None:
+        report_path = write_fleet_report(fleet, output_dir, version_info_path)
+        print(f"Fleet summary for {len(fleet)} endpoint(s) generated at {report_path}")
+
+    if connectivity is not None:
+        report_path = write_connectivity_report(connectivity, output_dir)
+        print(f"Connectivity summary for {len(connectivity.urls)} URL(s) across {len(connectivity)} endpoint(s) generated at {report_path}")
+
+    if history is not None:
+        print(f"{history.inserted} new snapshot(s) recorded in {history_db}")
+
+    if board is not None:
+        print(f"Dashboard updated at {board.index_path}")
+
+    if profile:
+        write_profile(profile_events, output_dir)
+    return results
@@ -0,0 +1,176 @@
+import os
+import json
+import random
+import argparse
+
+PLUGIN_NAMES = [
+    "Endpoint Protection", "Active Response Shell", "Windows Remote Intrusion Detection and Prevention",
+    "Asset Manager", "Endpoint Detection and Response", "DNS Filter", "Monitoring Service"
+]
+
+TARGET_PROCESSES = ["MBAMService", "MBCloudEA", "EAServiceMonitor", "EATray", "MBVpnService"]
+
+TARGET_SERVICES = [
+    "Malwarebytes Endpoint Agent Monitor", "Malwarebytes Service", "ThreatDown Endpoint Agent",
+    "MBVpnService", "MBVpnTunnelService"
+]
+
+def random_version(rng):
+    return f"1.2.{rng.randint(0, 9)}.{rng.randint(1, 1500)}"
+
+def random_text(rng, length):
+    alphabet = "abcdefghijklmnopqrstuvwxyz0123456789 -_/\\:.{}\"'"
+    return "".join(rng.choice(alphabet) for _ in range(length))
+
+def place_targets(rng, count, targets):
+    # Spread the interesting entries through the file so early-exit parsing
+    # still has to read a realistic share of it.
+    positions = sorted(rng.sample(range(count), min(len(targets), count)))
+    return dict(zip(positions, targets))
+
+def write_info(path, rng, host_name, plugins):
+    plugin_entries = []
+    for idx in range(plugins):
+        name = PLUGIN_NAMES[idx] if idx < len(PLUGIN_NAMES) else f"Synthetic Plugin {idx}"
+        entry = {
+            "product_name": name,
+            "plugin_version": random_version(rng),
+            "install_path": f"C:\\Program Files\\Vendor\\{name}\\",
+            "settings": {f"setting_{n}": random_text(rng, 24) for n in range(8)}
+        }
+        if name == "Endpoint Protection":
+            entry["protection_status"] = {key: rng.choice(["Started", "Started", "Started", "Stopped"]) for key in ["rtp", "ae", "arw", "mwac", "sp"]}
+        plugin_entries.append(entry)
+
+    agent_info = {
+        "host_name": host_name,
+        "fully_qualified_host_name": f"{host_name.lower()}.corp.example.com",
+        "last_user": "CORP\\user",
+        "engine_version": random_version(rng),
+        "service_version": random_version(rng),
+        "tray_version": [random_version(rng) for _ in range(3)],
+        "os_info": {
+            "os_version": "10.0.19045",
+            "os_release_name": "Windows 10 Enterprise",
+            "os_type": "Workstation",
+            "os_architecture": "x64"
+        },
+        "plugins": plugin_entries
+    }
+
+    with open(path, "w") as file:
+        file.write(f"AccountToken={random_text(rng, 32).replace('=', '')}\n")
+        file.write(f"NebulaMachineId={rng.getrandbits(128):032x}\n")
+        for idx in range(20):
+            file.write(f"Setting{idx}={random_text(rng, 40).replace('=', '')}\n")
+        file.write("Agent Info=" + json.dumps(agent_info, indent=4) + "\n")
+
+def write_test_connections(path, rng, connections):
+    with open(path, "w") as file:
+        for idx in range(connections):
+            passed = rng.random() > 0.1
+            block = {
+                "UriTested": f"https://endpoint{idx % 500}.service{idx}.example.com/api/v1/health",
+                "Message": "OK" if passed else "The remote server returned an error: (403) Forbidden.",
+                "StatusCode": 200 if passed else rng.choice([403, 404, 500, 502]),
+                "ExpectedStatusCode": 200,
+                "Result": passed,
+                "Headers": {
+                    "Server": "nginx",
+                    "Date": "Mon, 01 Jan 2024 00:00:00 GMT",
+                    "Content-Type": "application/json; charset={utf-8}",
+                    "X-Request-Id": f"{rng.getrandbits(64):016x}"
+                }
+            }
+            file.write(f"Testing connection {idx}...\n")
+            file.write(json.dumps(block, indent=4))
+            file.write("\n")
+
+def write_processes(path, rng, processes):
+    targets = place_targets(rng, processes, TARGET_PROCESSES)
+    entries = []
+    for idx in range(processes):
+        name = targets.get(idx, f"process{idx}")
+        entries.append({
+            "name": name,
+            "id": idx,
+            "responding": rng.random() > 0.05,
+            "CommandLine": f"C:\\Windows\\System32\\{name}.exe " + random_text(rng, 200),
+            "Modules": [{"ModuleName": f"mod{n}.dll", "FileName": f"C:\\Windows\\mod{n}.dll"} for n in range(3)]
+        })
+    with open(path, "w") as file:
+        json.dump(entries, file, indent=2)
+
+def write_services(path, rng, services):
+    targets = place_targets(rng, services, TARGET_SERVICES)
+    entries = []
+    for idx in range(services):
+        caption = targets.get(idx, f"Service {idx}")
+        entries.append({
+            "Caption": caption,
+            "Name": caption.replace(" ", ""),
+            "State": rng.choice(["Running", "Running", "Stopped"]),
+            "StartMode": "Auto",
+            "PathName": f"\"C:\\Program Files\\{caption}\\svc.exe\" " + random_text(rng, 120)
+        })
+    with open(path, "w") as file:
+        json.dump(entries, file, indent=2)
+
+def write_machine_info(path, rng, drives):
+    drive_entries = []
+    for idx in range(drives):
+        total_size = rng.randint(64, 4096) * 1024 ** 3
+        drive_entries.append({
+            "name": f"{chr(ord('C') + idx % 24)}:\\" if idx < 24 else f"\\\\?\\Volume{{{idx:08x}}}\\",
+            "volume_label": f"Volume {idx}",
+            "drive_format": rng.choice(["NTFS", "ReFS", "FAT32"]),
+            "total_size": total_size,
+            "freespace_available": rng.randint(0, total_size)
+        })
+    with open(path, "w") as file:
+        json.dump({"drives": drive_entries}, file, indent=2)
+
+def write_system_info(path, rng):
+    with open(path, "w") as file:
+        json.dump({"SystemUptime": f"{rng.randint(0, 90)}.{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:{rng.randint(0, 59):02d}.1234567"}, file)
+
+def generate_bundle(output_dir, connections=10000, processes=20000, services=20000, drives=64, plugins=200, seed=0, host_name=None):
+    rng = random.Random(seed)
+    os.makedirs(output_dir, exist_ok=True)
+    host_name = host_name or f"BENCH-{seed:04d}"
+
+    write_info(os.path.join(output_dir, "Info.txt"), rng, host_name, plugins)
+    write_test_connections(os.path.join(output_dir, "TestConnections.txt"), rng, connections)
+    write_processes(os.path.join(output_dir, "RunningProcesses.json"), rng, processes)
+    write_services(os.path.join(output_dir, "Services.json"), rng, services)
+    write_machine_info(os.path.join(output_dir, "machine_info.json"), rng, drives)
+    write_system_info(os.path.join(output_dir, "SystemInfo.json"), rng)
+
+    return {
+        "connections": connections,
+        "processes": processes,
+        "services": services,
+        "drives": drives,
+        "plugins": plugins,
+        "seed": seed
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic endpoint bundle for benchmarking.")
+    parser.add_argument('output_dir', help="Directory to write the bundle into")
+    parser.add_argument('--connections', type=int, default=10000, help="Number of TestConnections.txt blocks")
+    parser.add_argument('--processes', type=int, default=20000, help="Number of RunningProcesses.json entries")
+    parser.add_argument('--services', type=int, default=20000, help="Number of Services.json entries")
+    parser.add_argument('--drives', type=int, default=64, help="Number of drives in machine_info.json")
+    parser.add_argument('--plugins', type=int, default=200, help="Number of plugins in the Agent Info JSON")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed")
+    parser.add_argument('--count', type=int, default=1, help="Number of bundles to generate (one subdirectory each)")
+    args = parser.parse_args()
+
+    for idx in range(args.count):
+        output_dir = args.output_dir if args.count == 1 else os.path.join(args.output_dir, f"bundle_{idx:05d}")
+        generate_bundle(output_dir, args.connections, args.processes, args.services, args.drives, args.plugins, args.seed + idx)
+        print(f"Generated bundle in {output_dir}")
+
+if __name__ == "__main__":
+    main()
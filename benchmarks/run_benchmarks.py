@@ -0,0 +1,202 @@
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import platform
+import argparse
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from generate_bundle import generate_bundle
+from info_to_json import slice_json
+from testconnection_to_json import convert_test_connection_to_json
+from create_html import (
+    load_json, get_processes, get_services, get_drive_info, get_plugin_versions, get_connection_results,
+    format_system_uptime, format_processes, get_plugin_version_from_confluence_name, generate_html_content,
+    generate_html_from_json, script_version
+)
+from pipeline import analyze_bundle
+
+DEFAULT_VERSION_INFO = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "version_info.json")
+
+confluence_names = ['Asset', 'MBAM', 'EDR', 'SIEM', 'Engine', 'UserAgent', 'Service', 'BFP', 'EA Monitor Service', 'DNS Filter', 'DNS crpyt proxy', 'ActiveResponse']
+
+def prepare_workspace(bundle_dir, workspace, version_info_path):
+    # Lay the bundle out the way main.py used to before rendering, so
+    # generate_html_from_json reads the same files it does in production.
+    json_dir = os.path.join(workspace, "json")
+    os.makedirs(json_dir, exist_ok=True)
+    for name in ["machine_info.json", "SystemInfo.json"]:
+        shutil.copy(os.path.join(bundle_dir, name), workspace)
+    for name in ["Services.json", "RunningProcesses.json"]:
+        shutil.copy(os.path.join(bundle_dir, name), json_dir)
+
+    info_json_path = os.path.join(json_dir, "Info.json")
+    with open(info_json_path, 'w') as file:
+        json.dump(slice_json(os.path.join(bundle_dir, "Info.txt")), file)
+    convert_test_connection_to_json(os.path.join(bundle_dir, "TestConnections.txt"), os.path.join(json_dir, "TestConnections.json"))
+    return info_json_path
+
+def build_cases(bundle_dir, workspace, version_info_path):
+    info_txt_path = os.path.join(bundle_dir, "Info.txt")
+    connections_path = os.path.join(bundle_dir, "TestConnections.txt")
+    processes_path = os.path.join(bundle_dir, "RunningProcesses.json")
+    services_path = os.path.join(bundle_dir, "Services.json")
+    machine_info_path = os.path.join(bundle_dir, "machine_info.json")
+    info_json_path = prepare_workspace(bundle_dir, workspace, version_info_path)
+    html_dir = os.path.join(workspace, "results")
+
+    data = load_json(info_json_path)
+    connection_data = load_json(os.path.join(workspace, "json", "TestConnections.json"))
+    processes = load_json(processes_path)
+    services = load_json(services_path)
+    drives = load_json(machine_info_path).get('drives', [])
+    system_info = load_json(os.path.join(bundle_dir, "SystemInfo.json"))
+
+    render_args = (
+        data,
+        get_drive_info(drives),
+        get_plugin_versions(data.get('AgentInfo', {}).get('plugins', [])),
+        get_connection_results(connection_data),
+        format_system_uptime(system_info.get('SystemUptime', '0.00:00:00')),
+        get_services(services),
+        format_processes(get_processes(processes)),
+        get_plugin_version_from_confluence_name(version_info_path, confluence_names),
+    )
+
+    def end_to_end():
+        _, html_path = generate_html_from_json(info_json_path, os.path.join(html_dir, "report.html"), version_info_path, workspace)
+        os.remove(html_path)
+
+    bundle_bytes = sum(os.path.getsize(os.path.join(bundle_dir, name)) for name in os.listdir(bundle_dir))
+
+    # name -> (callable, input bytes, records)
+    return {
+        "slice_json": (lambda: slice_json(info_txt_path), os.path.getsize(info_txt_path), len(data.get('AgentInfo', {}).get('plugins', []))),
+        "convert_test_connection_to_json": (lambda: convert_test_connection_to_json(connections_path, os.path.join(workspace, "TestConnections.out.json")), os.path.getsize(connections_path), len(connection_data)),
+        "get_processes": (lambda: get_processes(processes), None, len(processes)),
+        "get_services": (lambda: get_services(services), None, len(services)),
+        "get_drive_info": (lambda: get_drive_info(drives), None, len(drives)),
+        "generate_html_content": (lambda: generate_html_content(*render_args), None, None),
+        "generate_html_from_json": (end_to_end, os.path.getsize(info_json_path) + os.path.getsize(processes_path) + os.path.getsize(services_path) + os.path.getsize(machine_info_path), None),
+        "analyze_bundle": (lambda: analyze_bundle(bundle_dir, version_info_path), bundle_bytes, None),
+    }
+
+def measure(func, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+
+    # Peak memory is taken on a separate run so tracing overhead does not
+    # distort the timings above.
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return timings, peak
+
+def run_cases(cases, repeats, selected=None):
+    results = {}
+    for name, (func, input_bytes, records) in cases.items():
+        if selected and name not in selected:
+            continue
+        timings, peak = measure(func, repeats)
+        best = min(timings)
+        result = {
+            "best_seconds": best,
+            "mean_seconds": sum(timings) / len(timings),
+            "repeats": repeats,
+            "peak_memory_bytes": peak,
+        }
+        if input_bytes is not None:
+            result["input_bytes"] = input_bytes
+            result["mb_per_second"] = input_bytes / best / 1024 ** 2 if best else None
+        if records is not None:
+            result["records"] = records
+            result["records_per_second"] = records / best if best else None
+        results[name] = result
+        print(format_result(name, result))
+    return results
+
+def format_result(name, result):
+    line = f"{name:<34} best {result['best_seconds'] * 1000:9.2f} ms  mean {result['mean_seconds'] * 1000:9.2f} ms  peak {result['peak_memory_bytes'] / 1024 ** 2:8.2f} MB"
+    if result.get("mb_per_second") is not None:
+        line += f"  {result['mb_per_second']:8.2f} MB/s"
+    if result.get("records_per_second") is not None:
+        line += f"  {result['records_per_second']:12.0f} rec/s"
+    return line
+
+def compare_results(results, baseline_path):
+    try:
+        with open(baseline_path, 'r') as file:
+            baseline = json.load(file).get("results", {})
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"Error reading baseline results {baseline_path}: {e}")
+        return
+
+    print(f"\nCompared with {baseline_path}:")
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        time_change = (result["best_seconds"] / previous["best_seconds"] - 1) * 100 if previous["best_seconds"] else 0.0
+        memory_change = (result["peak_memory_bytes"] / previous["peak_memory_bytes"] - 1) * 100 if previous["peak_memory_bytes"] else 0.0
+        print(f"{name:<34} time {time_change:+7.1f}%  peak memory {memory_change:+7.1f}%")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the analyzer's parsers and report renderer on a synthetic bundle.")
+    parser.add_argument('--bundle', help="Existing bundle folder to benchmark (default: generate one)")
+    parser.add_argument('--connections', type=int, default=10000, help="TestConnections.txt blocks in the generated bundle")
+    parser.add_argument('--processes', type=int, default=20000, help="RunningProcesses.json entries in the generated bundle")
+    parser.add_argument('--services', type=int, default=20000, help="Services.json entries in the generated bundle")
+    parser.add_argument('--drives', type=int, default=64, help="Drives in the generated bundle")
+    parser.add_argument('--plugins', type=int, default=200, help="Plugins in the generated Agent Info JSON")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed for the generated bundle")
+    parser.add_argument('--repeats', type=int, default=5, help="Timed runs per benchmark")
+    parser.add_argument('--only', action='append', help="Run only this benchmark (can be repeated)")
+    parser.add_argument('--version-info', default=DEFAULT_VERSION_INFO, help="Path to version_info.json")
+    parser.add_argument('--output', help="Write results to this JSON file (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument('--compare', help="Previous results JSON to compare against")
+    args = parser.parse_args()
+
+    workspace = tempfile.mkdtemp(prefix="ea_bench_")
+    try:
+        if args.bundle:
+            bundle_dir = args.bundle
+            parameters = {"bundle": os.path.abspath(args.bundle)}
+        else:
+            bundle_dir = os.path.join(workspace, "bundle")
+            print("Generating synthetic bundle...")
+            parameters = generate_bundle(bundle_dir, args.connections, args.processes, args.services, args.drives, args.plugins, args.seed)
+
+        cases = build_cases(bundle_dir, os.path.join(workspace, "temp"), args.version_info)
+        results = run_cases(cases, args.repeats, args.only)
+    finally:
+        shutil.rmtree(workspace, ignore_errors=True)
+
+    output_path = args.output or os.path.join(os.path.dirname(os.path.abspath(__file__)), "results", f"{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, 'w') as file:
+        json.dump({
+            "script_version": script_version,
+            "timestamp": datetime.now().isoformat(timespec='seconds'),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "bundle": parameters,
+            "results": results,
+        }, file, indent=4)
+    print(f"\nResults written to {output_path}")
+
+    if args.compare:
+        compare_results(results, args.compare)
+
+if __name__ == "__main__":
+    main()
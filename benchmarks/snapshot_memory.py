@@ -0,0 +1,75 @@
+import os
+import sys
+import gc
+import json
+import shutil
+import tempfile
+import argparse
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from generate_bundle import generate_bundle
+from pipeline import open_bundle, parse_source_dicts
+from snapshot_model import EndpointSnapshot
+
+def resident_bytes(build, bundle_dirs):
+    # Memory still allocated once every snapshot has been built and kept,
+    # which is what a batch or fleet run holding endpoints in memory pays.
+    gc.collect()
+    tracemalloc.start()
+    kept = []
+    for bundle_dir in bundle_dirs:
+        with open_bundle(bundle_dir) as sources:
+            kept.append(build(sources))
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current, peak
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure resident memory per endpoint for dict snapshots and the slotted snapshot model.")
+    parser.add_argument('--endpoints', type=int, default=50, help="Number of synthetic endpoints to keep resident")
+    parser.add_argument('--connections', type=int, default=500, help="TestConnections.txt blocks per endpoint")
+    parser.add_argument('--drives', type=int, default=8, help="Drives per endpoint")
+    parser.add_argument('--plugins', type=int, default=40, help="Plugins per endpoint")
+    parser.add_argument('--output', help="Write results to this JSON file (default: benchmarks/results/snapshot_memory_<timestamp>.json)")
+    args = parser.parse_args()
+
+    workspace = tempfile.mkdtemp(prefix="ea_snapshot_memory_")
+    try:
+        bundle_dirs = []
+        for idx in range(args.endpoints):
+            bundle_dir = os.path.join(workspace, f"bundle_{idx:05d}")
+            # Processes and services are reduced to a few states while
+            # parsing, so tiny files are enough.
+            generate_bundle(bundle_dir, connections=args.connections, processes=20, services=20, drives=args.drives, plugins=args.plugins, seed=idx)
+            bundle_dirs.append(bundle_dir)
+
+        dict_current, dict_peak = resident_bytes(parse_source_dicts, bundle_dirs)
+        model_current, model_peak = resident_bytes(lambda sources: EndpointSnapshot(parse_source_dicts(sources)), bundle_dirs)
+    finally:
+        shutil.rmtree(workspace, ignore_errors=True)
+
+    results = {
+        "endpoints": args.endpoints,
+        "dict_bytes_per_endpoint": dict_current / args.endpoints,
+        "model_bytes_per_endpoint": model_current / args.endpoints,
+        "saved_bytes_per_endpoint": (dict_current - model_current) / args.endpoints,
+        "saved_percent": (1 - model_current / dict_current) * 100 if dict_current else 0.0,
+        "dict_peak_bytes": dict_peak,
+        "model_peak_bytes": model_peak,
+    }
+    print(f"Dict snapshots:  {results['dict_bytes_per_endpoint'] / 1024:10.1f} KB per endpoint")
+    print(f"Snapshot model:  {results['model_bytes_per_endpoint'] / 1024:10.1f} KB per endpoint")
+    print(f"Saved:           {results['saved_bytes_per_endpoint'] / 1024:10.1f} KB per endpoint ({results['saved_percent']:.1f}%)")
+
+    output_path = args.output or os.path.join(os.path.dirname(os.path.abspath(__file__)), "results", f"snapshot_memory_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, 'w') as file:
+        json.dump({"timestamp": datetime.now().isoformat(timespec='seconds'), "parameters": vars(args), "results": results}, file, indent=4)
+    print(f"\nResults written to {output_path}")
+
+if __name__ == "__main__":
+    main()
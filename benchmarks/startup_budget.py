@@ -0,0 +1,118 @@
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import platform
+import argparse
+import subprocess
+import statistics
+from datetime import datetime
+
+from generate_bundle import generate_bundle
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BUDGET = os.path.join(os.path.dirname(os.path.abspath(__file__)), "startup_budget.json")
+TOP_IMPORTS = 10
+
+def time_command(command, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        completed = subprocess.run(command, cwd=REPO_ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        timings.append(time.perf_counter() - start)
+        if completed.returncode != 0:
+            print(f"Command failed ({completed.returncode}): {' '.join(command)}")
+            print(completed.stderr.decode('utf-8', errors='replace'))
+            return None
+    return timings
+
+def slowest_imports(command):
+    # -X importtime writes "import time: self | cumulative | name" to stderr.
+    completed = subprocess.run([sys.executable, "-X", "importtime"] + command, cwd=REPO_ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    imports = []
+    for line in completed.stderr.decode('utf-8', errors='replace').splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, self_us, cumulative_us, name = [part.strip() for part in line.replace("import time:", "|", 1).split("|")]
+        if not name.startswith(" "):
+            imports.append({"module": name.strip(), "self_ms": int(self_us) / 1000, "cumulative_ms": int(cumulative_us) / 1000})
+    return sorted(imports, key=lambda item: item["self_ms"], reverse=True)[:TOP_IMPORTS]
+
+def load_budget(budget_path):
+    try:
+        with open(budget_path, 'r') as file:
+            return json.load(file)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"Error reading budget {budget_path}: {e}")
+        return {}
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure CLI startup time against a budget.")
+    parser.add_argument('--runs', type=int, default=7, help="Runs per command; the median is compared with the budget")
+    parser.add_argument('--budget', default=DEFAULT_BUDGET, help="JSON file of per-command budgets in milliseconds")
+    parser.add_argument('--output', help="Write results to this JSON file (default: benchmarks/results/startup_<timestamp>.json)")
+    args = parser.parse_args()
+
+    budget = load_budget(args.budget)
+    workspace = tempfile.mkdtemp(prefix="ea_startup_")
+    try:
+        bundle_dir = os.path.join(workspace, "bundle")
+        generate_bundle(bundle_dir, connections=20, processes=50, services=50, drives=2, plugins=7)
+        output_dir = os.path.join(workspace, "results")
+
+        commands = {
+            "interpreter": [sys.executable, "-c", "pass"],
+            "import_main": [sys.executable, "-c", "import main"],
+            "help": [sys.executable, "main.py", "--help"],
+            "folder_small_bundle": [sys.executable, "main.py", "--folder", bundle_dir, "--output-dir", output_dir],
+        }
+
+        results = {}
+        for name, command in commands.items():
+            timings = time_command(command, args.runs)
+            if timings is None:
+                return 1
+            results[name] = {"median_ms": statistics.median(timings) * 1000, "min_ms": min(timings) * 1000, "runs": args.runs}
+
+        imports = slowest_imports(["main.py", "--folder", bundle_dir, "--output-dir", output_dir])
+    finally:
+        shutil.rmtree(workspace, ignore_errors=True)
+
+    # Budgets are measured above bare interpreter startup so they stay
+    # comparable between faster and slower machines.
+    interpreter_ms = results["interpreter"]["median_ms"]
+    over_budget = []
+    print(f"{'Command':<22} {'Median ms':>10} {'Overhead ms':>12} {'Budget ms':>10}")
+    for name, result in results.items():
+        result["overhead_ms"] = result["median_ms"] - interpreter_ms
+        limit = budget.get(name)
+        result["budget_ms"] = limit
+        status = ""
+        if limit is not None and name != "interpreter" and result["overhead_ms"] > limit:
+            over_budget.append(name)
+            status = "  OVER BUDGET"
+        print(f"{name:<22} {result['median_ms']:>10.1f} {result['overhead_ms']:>12.1f} {limit if limit is not None else '-':>10}{status}")
+
+    print("\nSlowest imports for --folder (self time):")
+    for item in imports:
+        print(f"  {item['self_ms']:>8.2f} ms  {item['module']}")
+
+    output_path = args.output or os.path.join(os.path.dirname(os.path.abspath(__file__)), "results", f"startup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, 'w') as file:
+        json.dump({
+            "timestamp": datetime.now().isoformat(timespec='seconds'),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "results": results,
+            "slowest_imports": imports,
+            "over_budget": over_budget,
+        }, file, indent=4)
+    print(f"\nResults written to {output_path}")
+
+    return 1 if over_budget else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
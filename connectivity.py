@@ -0,0 +1,250 @@
+import os
+import sys
+import random
+from collections import Counter
+from urllib.parse import urlsplit
+
+from atomic_write import replace_file
+from create_html import get_run_timestamp, script_version
+from fleet import format_percentage, format_host_list
+
+MAX_SAMPLE_HOSTS = 10
+MAX_RANKED_URLS = 100
+MAX_STATUS_PAIRS = 3
+
+def connection_results(snapshot):
+    # One compact row per tested URL; this is all the parent needs to
+    # aggregate, so full snapshots never cross the process boundary.
+    rows = []
+    for url, details in snapshot.test_connections.items():
+        rows.append((url, bool(details.get("Result", False)), details.get("StatusCode"), details.get("ExpectedStatusCode")))
+    return rows
+
+def url_site(url):
+    try:
+        site = urlsplit(url).netloc
+    except ValueError:
+        site = ''
+    return sys.intern(site or url)
+
+class UrlStats:
+    # Fixed-size state per URL: the histogram of failed checks is bounded by
+    # the distinct (StatusCode, ExpectedStatusCode) pairs and the host sample
+    # by MAX_SAMPLE_HOSTS, however many endpoints report the URL.
+    __slots__ = ('url', 'site', 'passed', 'failed', 'status_pairs', 'sample_hosts')
+
+    def __init__(self, url):
+        self.url = url
+        self.site = url_site(url)
+        self.passed = 0
+        self.failed = 0
+        self.status_pairs = Counter()
+        self.sample_hosts = []
+
+    @property
+    def checks(self):
+        return self.passed + self.failed
+
+    @property
+    def failure_rate(self):
+        return self.failed / self.checks if self.checks else 0.0
+
+class ConnectivityStats:
+    def __init__(self):
+        self.urls = {}
+        self.endpoints = 0
+        self.failing_endpoints = 0
+        # Reservoir sampling keeps each URL's failing-host sample uniform
+        # over the whole batch, not biased to the first bundles to finish.
+        self.random = random.Random(0)
+
+    def __len__(self):
+        return self.endpoints
+
+    def add(self, host_name, rows):
+        self.endpoints += 1
+        host_failed = False
+        for url, passed, status_code, expected_status_code in rows:
+            url = sys.intern(url)
+            stats = self.urls.get(url)
+            if stats is None:
+                stats = self.urls[url] = UrlStats(url)
+            if passed:
+                stats.passed += 1
+                continue
+            stats.failed += 1
+            stats.status_pairs[(status_code, expected_status_code)] += 1
+            host_failed = True
+            if len(stats.sample_hosts) < MAX_SAMPLE_HOSTS:
+                stats.sample_hosts.append(host_name)
+            else:
+                slot = self.random.randrange(stats.failed)
+                if slot < MAX_SAMPLE_HOSTS:
+                    stats.sample_hosts[slot] = host_name
+        if host_failed:
+            self.failing_endpoints += 1
+
+    def ranked(self):
+        failing = [stats for stats in self.urls.values() if stats.failed]
+        failing.sort(key=lambda stats: (-stats.failed, -stats.failure_rate, stats.url))
+        return failing
+
+    def sites(self):
+        sites = {}
+        for stats in self.urls.values():
+            totals = sites.setdefault(stats.site, [0, 0, 0])
+            totals[0] += 1
+            totals[1] += stats.checks
+            totals[2] += stats.failed
+        return sorted(sites.items(), key=lambda item: (-item[1][2], item[0]))
+
+    def failed_status_pairs(self):
+        pairs = Counter()
+        urls = Counter()
+        for stats in self.urls.values():
+            for pair, count in stats.status_pairs.items():
+                pairs[pair] += count
+                urls[pair] += 1
+        return [(pair, count, urls[pair]) for pair, count in pairs.most_common()]
+
+def format_status_code(code):
+    return 'N/A' if code is None else str(code)
+
+def format_status_pairs(stats):
+    pairs = stats.status_pairs.most_common()
+    listed = ", ".join(f"{format_status_code(status)} (expected {format_status_code(expected)}) ×{count}" for (status, expected), count in pairs[:MAX_STATUS_PAIRS])
+    if len(pairs) > MAX_STATUS_PAIRS:
+        listed += f" … and {len(pairs) - MAX_STATUS_PAIRS} more"
+    return listed or '—'
+
+def get_ranked_table(ranked):
+    if not ranked:
+        return '<div>No failed connection checks.</div>'
+    rows = ['''
+    <table class="fleet_table">
+        <tr>
+            <th style="width: 30%;">URL</th>
+            <th style="text-align: right;">Checks</th>
+            <th style="text-align: right;">Failed</th>
+            <th style="text-align: right;">Failure Rate</th>
+            <th style="width: 25%;">Status Codes</th>
+            <th style="width: 25%;">Sample Failing Hosts</th>
+        </tr>
+    ''']
+    for stats in ranked[:MAX_RANKED_URLS]:
+        rows.append(f'''
+        <tr>
+            <td>{stats.url}</td>
+            <td style="text-align: right;">{stats.checks}</td>
+            <td style="text-align: right;">{stats.failed}</td>
+            <td style="text-align: right;">{format_percentage(stats.failed, stats.checks)}</td>
+            <td>{format_status_pairs(stats)}</td>
+            <td>{format_host_list(sorted(stats.sample_hosts))}</td>
+        </tr>
+        ''')
+    rows.append('</table>')
+    if len(ranked) > MAX_RANKED_URLS:
+        rows.append(f'<div>… and {len(ranked) - MAX_RANKED_URLS} more failing URL(s)</div>')
+    return "".join(rows)
+
+def get_site_table(sites):
+    rows = ['''
+    <table class="fleet_table">
+        <tr>
+            <th>Site</th>
+            <th style="text-align: right;">URLs</th>
+            <th style="text-align: right;">Checks</th>
+            <th style="text-align: right;">Failed</th>
+            <th style="text-align: right;">Failure Rate</th>
+        </tr>
+    ''']
+    for site, (urls, checks, failed) in sites:
+        rows.append(f'''
+        <tr>
+            <td>{site}</td>
+            <td style="text-align: right;">{urls}</td>
+            <td style="text-align: right;">{checks}</td>
+            <td style="text-align: right;">{failed}</td>
+            <td style="text-align: right;">{format_percentage(failed, checks)}</td>
+        </tr>
+        ''')
+    rows.append('</table>')
+    return "".join(rows)
+
+def get_status_table(pairs):
+    if not pairs:
+        return '<div>No failed connection checks.</div>'
+    rows = ['''
+    <table class="fleet_table">
+        <tr>
+            <th>Status Code</th>
+            <th>Expected Status Code</th>
+            <th style="text-align: right;">Checks</th>
+            <th style="text-align: right;">URLs</th>
+        </tr>
+    ''']
+    for (status, expected), count, urls in pairs:
+        rows.append(f'''
+        <tr>
+            <td>{format_status_code(status)}</td>
+            <td>{format_status_code(expected)}</td>
+            <td style="text-align: right;">{count}</td>
+            <td style="text-align: right;">{urls}</td>
+        </tr>
+        ''')
+    rows.append('</table>')
+    return "".join(rows)
+
+def generate_connectivity_html(connectivity):
+    total_checks = sum(stats.checks for stats in connectivity.urls.values())
+    failed_checks = sum(stats.failed for stats in connectivity.urls.values())
+    ranked = connectivity.ranked()
+
+    return f"""
+    <!DOCTYPE html>
+    <html lang="en">
+    <head>
+        <meta charset="UTF-8">
+        <title>Connectivity Summary</title>
+        <style>
+            body {{
+                font-family: Consolas, monospace;
+                padding: 20px;
+            }}
+            table {{
+                border-collapse: collapse;
+                width: 100%;
+                table-layout: fixed;
+            }}
+            td, th {{
+                text-align: left;
+                padding: 8px;
+                overflow-wrap: anywhere;
+            }}
+            .fleet_table tr:nth-child(even) {{
+                background-color: #d9d9d9;
+            }}
+        </style>
+    </head>
+    <body>
+        <h1>Endpoint Agent Connectivity Summary</h1>
+        <div><span style="font-weight: bold;">Script Version:</span> {script_version} | <span style="font-weight: bold;">Script RunTime:</span> {get_run_timestamp()} | <span style="font-weight: bold;">Endpoints:</span> {len(connectivity)}</div>
+        <div>Distinct URLs tested: {len(connectivity.urls)}, failing: {len(ranked)}</div>
+        <div>Total connection checks: {total_checks}, failed: {failed_checks} ({format_percentage(failed_checks, total_checks)})</div>
+        <div>Endpoints with at least one failed connection: {connectivity.failing_endpoints} ({format_percentage(connectivity.failing_endpoints, len(connectivity))})</div>
+        <hr>
+        <h2>Worst Endpoints</h2>
+        {get_ranked_table(ranked)}
+        <h2>By Site</h2>
+        {get_site_table(connectivity.sites())}
+        <h2>By Status Code</h2>
+        {get_status_table(connectivity.failed_status_pairs())}
+    </body>
+    </html>
+    """
+
+def write_connectivity_report(connectivity, output_dir):
+    os.makedirs(output_dir, exist_ok=True)
+    report_path = os.path.join(output_dir, "Connectivity_Summary.html")
+    replace_file(report_path, generate_connectivity_html(connectivity))
+    return report_path
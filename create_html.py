@@ -1,6 +1,14 @@
 import json
 import os
+import gzip
 from datetime import datetime
+from functools import lru_cache
+
+from atomic_write import write_unique, write_content_addressed, replace_file
+from json_stream import iter_json_objects
+from profiling import span
+from report_template import REPORT_TEMPLATE, REPORT_STYLESHEET, STYLESHEET_NAME, FRAGMENT_FIELDS, report_templates, compact_fragment
+from version_baseline import load_baseline, parse_version, compare_parsed
 
 script_version = "v.0.7.1"
 
@@ -25,12 +33,21 @@ def create_html_directory(html_path):
         os.makedirs(html_dir, exist_ok=True)
     return html_dir
 
+@lru_cache(maxsize=4096)
 def trim_version(version):
     parts = version.split('.')
     if len(parts) >= 4:
         return f"{parts[0]}.{parts[1]}.{parts[3]}"
     return version
 
+plugin_baseline_names = {
+    'Endpoint Protection': 'MBAM',
+    'Active Response Shell': 'ActiveResponse',
+    'Windows Remote Intrusion Detection and Prevention': 'BFP',
+    'Asset Manager': 'Asset',
+    'Endpoint Detection and Response': 'EDR',
+}
+
 def get_plugin_versions(plugins):
     plugin_version_map = {
         'Endpoint Protection': 'endpoint_protection',
@@ -43,16 +60,30 @@ def get_plugin_versions(plugins):
     plugin_info = {key: trim_version(next((p.get('plugin_version', 'N/A') for p in plugins if p.get('product_name') == key), 'N/A')) for key in plugin_version_map}
     return plugin_info
 
-def get_services(state):
-    services_state_map = {
-        'Malwarebytes Endpoint Agent Monitor': 'ea_monitor',
-        'Malwarebytes Service': 'mbam_service',
-        'Malwarebytes Endpoint Agent': 'ea_service',
-        'ThreatDown Endpoint Agent': 'ea_service',
-        'MBVpnService' : 'mb_vpn_service',
-        'MBVpnTunnelService' : 'mb_vpn_tunnel_service'
-    }
+services_state_map = {
+    'Malwarebytes Endpoint Agent Monitor': 'ea_monitor',
+    'Malwarebytes Service': 'mbam_service',
+    'Malwarebytes Endpoint Agent': 'ea_service',
+    'ThreatDown Endpoint Agent': 'ea_service',
+    'MBVpnService' : 'mb_vpn_service',
+    'MBVpnTunnelService' : 'mb_vpn_tunnel_service'
+}
+
+processes_state_map = {
+    'MBAMService': 'mbam_service',
+    'MBCloudEA': 'mb_cloud_ea',
+    'EAServiceMonitor': 'ea_service_monitor',
+    'EATray': 'ea_tray',
+    'MBVpnService': 'mb_vpn_service'
+}
+
+def get_protection_statuses(agent_info):
+    for plugin in agent_info.get('plugins', []):
+        if plugin.get('product_name') == 'Endpoint Protection':
+            return plugin.get('protection_status', {})
+    return {}
 
+def get_services(state):
     service_info = {
         'ea_monitor': 'N/A',
         'mbam_service': 'N/A',
@@ -61,7 +92,10 @@ def get_services(state):
         'mb_vpn_tunnel_service': 'N/A'
 
     }
+    unresolved = set(service_info)
 
+    # `state` may be a lazy stream of records, so stop pulling from it as
+    # soon as every service we report on has a value.
     for s in state:
         caption = s.get('Caption', '')
         state_value = s.get('State', 'N/A')
@@ -69,18 +103,14 @@ def get_services(state):
             internal_name = services_state_map[caption]
             if service_info[internal_name] == 'N/A':
                 service_info[internal_name] = state_value
+                if state_value != 'N/A':
+                    unresolved.discard(internal_name)
+                    if not unresolved:
+                        break
 
     return service_info
 
 def get_processes(state):
-    processes_state_map = {
-        'MBAMService': 'mbam_service',
-        'MBCloudEA': 'mb_cloud_ea',
-        'EAServiceMonitor': 'ea_service_monitor',
-        'EATray': 'ea_tray',
-        'MBVpnService': 'mb_vpn_service'
-    }
-
     process_info = {
         'mbam_service': 'N/A',
         'mb_cloud_ea': 'N/A',
@@ -89,20 +119,41 @@ def get_processes(state):
         'mb_vpn_service': 'N/A'
     }
 
+    # A process running in several sessions is listed once per session and
+    # the last entry wins, so the whole list is always read.
     for s in state:
         name = s.get('name', '')
-        process_value = s.get('responding', 'N/A')
         if name in processes_state_map:
-            internal_name = processes_state_map[name]
-            process_info[internal_name] = process_value
+            process_info[processes_state_map[name]] = s.get('responding', 'N/A')
 
     return process_info
 
+def iter_json_records(file, fields):
+    for record in iter_json_objects(file):
+        if isinstance(record, dict):
+            yield {field: record[field] for field in fields if field in record}
+
+def stream_services(file):
+    return get_services(iter_json_records(file, ('Caption', 'State')))
+
+def stream_processes(file):
+    return get_processes(iter_json_records(file, ('name', 'responding')))
+
 def bytes_to_gb(bytes_value):
     return bytes_value / (1024 ** 3)
 
+def get_drive_usage(drives):
+    usage = []
+    for drive in drives:
+        total_size_gb = bytes_to_gb(drive.get('total_size', 0))
+        freespace_available_gb = bytes_to_gb(drive.get('freespace_available', 0))
+        storage_used_gb = total_size_gb - freespace_available_gb
+        storage_used_percentage = (storage_used_gb / total_size_gb) * 100 if total_size_gb > 0 else 0
+        usage.append((drive, storage_used_gb, total_size_gb, freespace_available_gb, storage_used_percentage))
+    return usage
+
 def get_drive_info(drives):
-    storage_info_html = '''
+    storage_info_html = ['''
     <table class="storage_info">
         <tr>
             <th>Drive Name</th>
@@ -115,15 +166,11 @@ def get_drive_info(drives):
         </tr>
         <hr>
         <h2 style="margin-bottom: -5px;">Storage Information</h2>
-    '''
-    for idx, drive in enumerate(drives):
-        total_size_gb = bytes_to_gb(drive.get('total_size', 0))
-        freespace_available_gb = bytes_to_gb(drive.get('freespace_available', 0))
-        storage_used_gb = total_size_gb - freespace_available_gb
-        storage_used_percentage = (storage_used_gb / total_size_gb) * 100 if total_size_gb > 0 else 0
+    ''']
+    for idx, (drive, storage_used_gb, total_size_gb, freespace_available_gb, storage_used_percentage) in enumerate(get_drive_usage(drives)):
         storage_percentage_display = f"{storage_used_percentage:.2f}%"
 
-        storage_info_html += f"""
+        storage_info_html.append(f"""
         <tr style="background-color: {'#d9d9d9' if idx % 2 == 0 else '#ffffff'};">
             <td>{drive.get('name', 'N/A')}</td>
             <td>{drive.get('volume_label', 'N/A')}</td>
@@ -133,12 +180,12 @@ def get_drive_info(drives):
             <td style="text-align: right;">{freespace_available_gb:.2f}</td>
             <td style="text-align: right;">{storage_percentage_display}</td>
         </tr>
-        """
-    storage_info_html += '</table>'
-    return storage_info_html
+        """)
+    storage_info_html.append('</table>')
+    return "".join(storage_info_html)
 
 def get_connection_results(connection_data):
-    connection_results_html = '''
+    connection_results_html = ['''
     <table class="connection_results">
         <tr>
             <th>URL</th>
@@ -146,7 +193,7 @@ def get_connection_results(connection_data):
         </tr>
         <hr>
         <h2 style="margin-bottom: -5px;">Test Connection Results</h2>
-    '''
+    ''']
     def connection_indicator_symbol(status):
         return "✔" if status == "Passed" else "✖"
 
@@ -154,14 +201,14 @@ def get_connection_results(connection_data):
         status = "Passed" if details.get("Result", False) else "Failed"
         symbol = connection_indicator_symbol(status)
         status_class = "status-passed" if status == "Passed" else "status-failed"
-        connection_results_html += f'''
+        connection_results_html.append(f'''
         <tr style="background-color: {'#d9d9d9' if idx % 2 == 0 else '#ffffff'};">
             <td>{url}</td>
             <td class="{status_class}">{symbol} {status}</td>
         </tr>
-        '''
-    connection_results_html += '</table>'
-    return connection_results_html
+        ''')
+    connection_results_html.append('</table>')
+    return "".join(connection_results_html)
 
 def format_system_uptime(uptime):
     if '.' in uptime and uptime.count('.') == 2:
@@ -209,30 +256,21 @@ def format_processes(runningprocesses_info):
     return formatted_processes
 
 def get_plugin_version_from_confluence_name(version_info_path, confluence_names):
-    version_data = load_json(version_info_path)
-    if not version_data:
-        return {}
-
-    version_info = {}
-    for item in version_data:
-        confluence_name = item.get('confluence_name', '')
-        if confluence_name in confluence_names:
-            version_info[confluence_name] = item.get('plugin_version', 'N/A')
+    return load_baseline(version_info_path).select(confluence_names)
 
-    return version_info
+def compare_versions(version, base_version):
+    return compare_parsed(parse_version(version), parse_version(base_version))
 
 def color_version(version, base_version):
-    try:
-        version_tuple = tuple(map(int, version.split('.')))
-        base_version_tuple = tuple(map(int, base_version.split('.')))
-    except ValueError:
+    comparison = compare_versions(version, base_version)
+    if comparison is None:
         return version
 
-    if version_tuple < base_version_tuple:
+    if comparison < 0:
         color = 'red'
         style = 'bold'
         # version += '!'
-    elif version_tuple == base_version_tuple:
+    elif comparison == 0:
         color = 'green'
         style = 'normal'
     else:
@@ -242,337 +280,151 @@ def color_version(version, base_version):
     return f'<span style="color: {color}; font-weight: {style};">{version}</span>'
 
 
-def generate_html_content(data, storage_info_html, plugin_versions, connection_results_html, system_uptime, services_info, formatted_processes, additional_versions):
+def report_values(data, storage_info_html, plugin_versions, connection_results_html, system_uptime, services_info, formatted_processes, additional_versions, history_html="", log_hits_html=""):
     agent_info = data.get('AgentInfo', {})
 
-    protection_statuses = {}
-    for plugin in agent_info.get('plugins', []):
-        if plugin.get('product_name') == 'Endpoint Protection':
-            protection_statuses = plugin.get('protection_status', {})
-            break
+    protection_statuses = get_protection_statuses(agent_info)
 
     formatted_services = format_services(services_info)
 
-    return f"""
-    <!DOCTYPE html>
-    <html lang="en">
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>{agent_info.get('host_name', 'N/A')} Results</title>
-        <style>
-            body {{
-                font-family: Consolas, monospace;
-                padding: 20px;
-            }}
-            h1 {{
-                margin-bottom: 20px;
-            }}
-            h3 {{
-                margin-top: 40px;
-            }}
-            .info-item {{
-                margin-bottom: 10px;
-            }}
-            .info-item label {{
-                display: inline-block;
-                width: 50%;
-            }}
-            .info-item-connection label {{
-                display: inline-block;
-                width: 670px;
-                margin-bottom: 10px
-            }}
-            .indicator {{
-                display: inline-block;
-                width: 10px;
-                height: 10px;
-                border-radius: 50%;
-                margin-right: 10px;
-            }}
-            .indicator-started {{
-                background-color: green;
-            }}
-            .indicator-stopped {{
-                background-color: red;
-            }}
-            .grey-background {{
-                color: #808080;
-                padding: 10px;
-                margin-top: 20px;
-            }}
-            .grey-background a {{
-                color: #808080;
-                text-decoration: none;
-                font-weight: bold;
-            }}
-            .grey-background a:hover {{
-                text-decoration: underline;
-            }}
-
-            table {{
-                border-collapse: collapse;
-                width: 100%;
-                table-layout:fixed;
-            }}
-
-            td, th {{
-                border: 0px solid #dddddd;
-                text-align: left;
-                padding: 8px;
-                font-weight: normal;
-            }}
-
-            .data_table tr:nth-child(even), .storage_info tr:nth-child(even), .connection_results tr:nth-child(even) {{
-                background-color: #d9d9d9;
-            }}
-
-            td:nth-child(1), td:nth-child(3), th:nth-child(1), th:nth-child(3) {{
-                font-weight: bold;
-            }}
-
-            td.table_category, th.table_category {{
-                font-weight: bold;
-                font-size: 150%;
-            }}
-
-            /* Specific styles for storage information and test connection tables */
-            .storage_info th, .connection_results th {{
-                font-weight: bold;
-            }}
-
-            .storage_info td, .connection_results td {{
-                font-weight: normal;
-            }}
-
-            .connection_results .status-passed {{
-                color: green;
-            }}
-
-            .connection_results .status-failed {{
-                color: red;
-            }}
-        </style>
-    </head>
-    <body>
-        <h1>Endpoint Agent Analyzer Results</h1>
-        <div class="info-item">
-            <label><span style="font-weight: bold;">Script Version:</span> {script_version} | <span style="font-weight: bold;">Script RunTime:</span> {get_run_timestamp()}</label>
-        </div>
-        <br>
-        
-        <!-- Account Token and Nebula Machine ID Information -->
-        <table>
-        <tr>
-        <th>Account Token:</th>
-        <th colspan="3">{data.get('AccountToken', 'N/A')}</th>
-        </tr>
-        <tr>
-        <th>Nebula Machine ID:</th>
-        <th colspan="3">{data.get('NebulaMachineId', 'N/A')}</th>
-        </tr>
-        </table>
-        <hr>
-
-        <!-- General Information and Operating System Information -->
-        <div>
-        <table class="data_table">
-        <tr>
-        <th  colspan="2" class="table_category">General Information</th>
-        <th colspan="2" class="table_category">Operating System</th>
-        </tr>
-        <tr>
-        <th>Endpoint Name:</th>
-        <th>{agent_info.get('host_name', 'N/A')}</th>
-        <th>OS Version:</th>
-        <th>{agent_info.get('os_info', {}).get('os_version', 'N/A')}</th>
-        </tr>
-        <tr>
-        <th>FQDN</th>
-        <th>{agent_info.get('fully_qualified_host_name', 'N/A')}</th>
-        <th>OS Friendly Name:</th>
-        <th>{agent_info.get('os_info', {}).get('os_release_name', 'N/A')}</th>
-        </tr>
-        <tr>
-        <th>Last User:</th>
-        <th>{agent_info.get('last_user', 'N/A')}</th>
-        <th>OS Type:</th>
-        <th>{agent_info.get('os_info', {}).get('os_type', 'N/A')}</th>
-        </tr>
-        <tr>
-        <th>System Uptime</th>
-        <th>{system_uptime}</th>
-        <th>OS Architecture:</th>
-        <th>{agent_info.get('os_info', {}).get('os_architecture', 'N/A')}</th>
-        </tr>
-        </table>
-        <hr>
-        </div>
-        
-        <!-- Protection Status and Agent and Plugins Information -->
-        <div>
-        <table class="data_table">
-        <tr>
-        <th  colspan="2" class="table_category">Protection Status</th>
-        <th colspan="2" class="table_category">Agent and Plugins</th>
-        </tr>
-        <tr>
-        <th>Malware Protection:</th>
-        <th>{format_status(protection_statuses.get('rtp', 'N/A'))}</th>
-        <th>Endpoint Agent:</th>
-        <th>{color_version(trim_version(agent_info.get('engine_version', 'N/A')), additional_versions.get('Engine', 'N/A'))}</th>
-        </tr>
-        <tr>
-        <th>Exploit Protection:</th>
-        <th>{format_status(protection_statuses.get('ae', 'N/A'))}</th>
-        <th>Endpoint Protection:</th>
-        <th>{color_version(plugin_versions['Endpoint Protection'], additional_versions.get('MBAM', 'N/A'))}</th>
-        </tr>
-        <tr>
-        <th>Behavior Protection:</th>
-        <th>{format_status(protection_statuses.get('arw', 'N/A'))}</th>
-        <th>Active Response Shell:</th>
-        <th>{color_version(plugin_versions['Active Response Shell'], additional_versions.get('ActiveResponse', 'N/A'))}</th>
-        </tr>
-        <tr>
-        <th>Web Protection:</th>
-        <th>{format_status(protection_statuses.get('mwac', 'N/A'))}</th>
-        <th>Brute Force Protection:</th>
-        <th>{color_version(plugin_versions['Windows Remote Intrusion Detection and Prevention'], additional_versions.get('BFP', 'N/A'))}</th>
-        </tr>
-        <tr>
-        <th>Self Protection:</th>
-        <th>{format_status(protection_statuses.get('sp', 'N/A'))}</th>
-        <th>Asset Manager:</th>
-        <th>{color_version(plugin_versions['Asset Manager'], additional_versions.get('Asset', 'N/A'))}</th>
-        </tr>
-        <tr>
-        <th></th>
-        <th></th>
-        <th>Endpoint Detection and Response:</th>
-        <th>{color_version(plugin_versions['Endpoint Detection and Response'], additional_versions.get('EDR', 'N/A'))}</th>
-        </tr>
-        <tr>
-        <th></th>
-        <th></th>
-        <th>User Agent:</th>
-        <th>{", ".join([color_version(trim_version(v), additional_versions.get('UserAgent', 'N/A')) for v in agent_info.get('tray_version', [])])}</th>
-        </tr>
-        <tr>
-        <th></th>
-        <th></th>
-        <th>Service Version:</th>
-        <th>{color_version(trim_version(agent_info.get('service_version', 'N/A')), additional_versions.get('Service', 'N/A'))}</th>
-        </tr>
-        </table>
-        </div>
-
-        <!-- Services and Processes Information-->
-        <div>
-        <table class="data_table">
-        <tr>
-        <th  colspan="2" class="table_category">Services</th>
-        <th colspan="2" class="table_category">Processes</th>
-        </tr>
-        <tr>
-        <th>Malwarebytes Service:</th>
-        <th>{formatted_services.get('mbam_service', 'N/A')}</th>
-        <th>MBAMService.exe</th>
-        <th>{formatted_processes.get('mbam_service', 'N/A')}</th>
-        </tr>
-        <tr>
-        <th>Endpoint Agent:</th>
-        <th>{formatted_services.get('ea_service', 'N/A')}</th>
-        <th>MBCloudEA.exe</th>
-        <th>{formatted_processes.get('mb_cloud_ea', 'N/A')}</th>
-        </tr>
-        <tr>
-        <th>Endpoint Agent Monitor</th>
-        <th>{formatted_services.get('ea_monitor', 'N/A')}</th>
-        <th>EAServiceMonitor.exe</th>
-        <th>{formatted_processes.get('ea_service_monitor', 'N/A')}</th>
-        </tr>
-        <tr>
-        <th></th>
-        <th></th>
-        <th>EATray.exe</th>
-        <th>{formatted_processes.get('ea_tray', 'N/A')}</th>
-        </tr>
-        <tr>
-        <th>VPN Service</th>
-        <th>{formatted_services.get('mb_vpn_service', 'N/A')}</th>
-        <th>MBVpnService.exe</th>
-        <th>{formatted_processes.get('mb_vpn_service', 'N/A')}</th>
-        </tr>
-        <tr>
-        <th>VPN Tunnel Service</th>
-        <th>{formatted_services.get('mb_vpn_tunnel_service', 'N/A')}</th>
-        <th></th>
-        <th></th>
-        </tr>
+    return {
+        'title_host_name': agent_info.get('host_name', 'N/A'),
+        'script_version': script_version,
+        'run_timestamp': get_run_timestamp(),
+        'account_token': data.get('AccountToken', 'N/A'),
+        'nebula_machine_id': data.get('NebulaMachineId', 'N/A'),
+        'host_name': agent_info.get('host_name', 'N/A'),
+        'os_version': agent_info.get('os_info', {}).get('os_version', 'N/A'),
+        'fqdn': agent_info.get('fully_qualified_host_name', 'N/A'),
+        'os_release_name': agent_info.get('os_info', {}).get('os_release_name', 'N/A'),
+        'last_user': agent_info.get('last_user', 'N/A'),
+        'os_type': agent_info.get('os_info', {}).get('os_type', 'N/A'),
+        'system_uptime': system_uptime,
+        'os_architecture': agent_info.get('os_info', {}).get('os_architecture', 'N/A'),
+        'rtp_status': format_status(protection_statuses.get('rtp', 'N/A')),
+        'engine_version': color_version(trim_version(agent_info.get('engine_version', 'N/A')), additional_versions.get('Engine', 'N/A')),
+        'ae_status': format_status(protection_statuses.get('ae', 'N/A')),
+        'endpoint_protection_version': color_version(plugin_versions['Endpoint Protection'], additional_versions.get('MBAM', 'N/A')),
+        'arw_status': format_status(protection_statuses.get('arw', 'N/A')),
+        'active_response_shell_version': color_version(plugin_versions['Active Response Shell'], additional_versions.get('ActiveResponse', 'N/A')),
+        'mwac_status': format_status(protection_statuses.get('mwac', 'N/A')),
+        'brute_force_protection_version': color_version(plugin_versions['Windows Remote Intrusion Detection and Prevention'], additional_versions.get('BFP', 'N/A')),
+        'sp_status': format_status(protection_statuses.get('sp', 'N/A')),
+        'asset_manager_version': color_version(plugin_versions['Asset Manager'], additional_versions.get('Asset', 'N/A')),
+        'edr_version': color_version(plugin_versions['Endpoint Detection and Response'], additional_versions.get('EDR', 'N/A')),
+        'user_agent_versions': ", ".join([color_version(trim_version(v), additional_versions.get('UserAgent', 'N/A')) for v in agent_info.get('tray_version', [])]),
+        'service_version': color_version(trim_version(agent_info.get('service_version', 'N/A')), additional_versions.get('Service', 'N/A')),
+        'mbam_service_state': formatted_services.get('mbam_service', 'N/A'),
+        'mbam_service_process': formatted_processes.get('mbam_service', 'N/A'),
+        'ea_service_state': formatted_services.get('ea_service', 'N/A'),
+        'mb_cloud_ea_process': formatted_processes.get('mb_cloud_ea', 'N/A'),
+        'ea_monitor_state': formatted_services.get('ea_monitor', 'N/A'),
+        'ea_service_monitor_process': formatted_processes.get('ea_service_monitor', 'N/A'),
+        'ea_tray_process': formatted_processes.get('ea_tray', 'N/A'),
+        'mb_vpn_service_state': formatted_services.get('mb_vpn_service', 'N/A'),
+        'mb_vpn_service_process': formatted_processes.get('mb_vpn_service', 'N/A'),
+        'mb_vpn_tunnel_service_state': formatted_services.get('mb_vpn_tunnel_service', 'N/A'),
+        'storage_info_html': storage_info_html,
+        'connection_results_html': connection_results_html,
+        'log_hits_html': log_hits_html,
+        'history_html': history_html
+    }
 
-        </div>
-        <hr>
+def generate_html_content(data, storage_info_html, plugin_versions, connection_results_html, system_uptime, services_info, formatted_processes, additional_versions):
+    return REPORT_TEMPLATE.render(report_values(data, storage_info_html, plugin_versions, connection_results_html, system_uptime, services_info, formatted_processes, additional_versions))
 
-        <!-- Storage Information -->
-        <div class="storage_info">
-            {storage_info_html}
-        </div>
-        <!-- Test Connection Results Information -->
-        <div class="connection_results">
-            {connection_results_html}
-        </div>
-        <div class="full-width grey-background">
-            * If one of the above failed, ask the customer to review:
-            <a href="https://support.threatdown.com/hc/en-us/articles/4413798711699-Network-access-requirements-for-Nebula">Network access requirements for Nebula</a>
-        </div>
-    </body>
-    </html>
-    """
-
-def generate_html_from_json(info_json_path, html_path, version_info_path):
-    html_dir = create_html_directory(html_path)
-    data = load_json(info_json_path)
-    
-    machine_info = load_json(os.path.join('temp', 'machine_info.json'))
+def build_report_values(data, machine_info, connection_data, system_info, services_info, processes_info, version_info_path, history_html="", log_hits_html=""):
     drives_info = machine_info.get('drives', [])
     storage_info_html = get_drive_info(drives_info)
     
     plugins = data.get('AgentInfo', {}).get('plugins', [])
     plugin_versions = get_plugin_versions(plugins)
     
-    connection_data = load_json(os.path.join("temp", "json", "TestConnections.json"))
     connection_results_html = get_connection_results(connection_data)
     
-    system_info = load_json(os.path.join('temp', 'SystemInfo.json'))
     system_uptime = format_system_uptime(system_info.get('SystemUptime', '0.00:00:00'))
 
-    services_info = get_services(load_json(os.path.join("temp", "json", "Services.json")))
-    
-    processes_info = get_processes(load_json(os.path.join("temp", "json", "RunningProcesses.json")))
     formatted_processes = format_processes(processes_info)
 
     confluence_names = ['Asset', 'MBAM', 'EDR', 'SIEM', 'Engine', 'UserAgent', 'Service', 'BFP', 'EA Monitor Service', 'DNS Filter', 'DNS crpyt proxy', 'ActiveResponse']
     additional_versions = get_plugin_version_from_confluence_name(version_info_path, confluence_names)
 
-    html_content = generate_html_content(data, storage_info_html, plugin_versions, connection_results_html, system_uptime, services_info, formatted_processes, additional_versions)
-
-    host_name = data.get('AgentInfo', {}).get('host_name', 'Analyzer_Results')
-    filename = f"{host_name}_Analyzer_Results.html"
-    html_path_with_name = os.path.join(html_dir, filename)
-
-    if os.path.exists(html_path_with_name):
-        base, ext = os.path.splitext(html_path_with_name)
-        i = 1
-        while os.path.exists(f"{base} ({i}){ext}"):
-            i += 1
-        html_path_with_name = f"{base} ({i}){ext}"
+    return report_values(data, storage_info_html, plugin_versions, connection_results_html, system_uptime, services_info, formatted_processes, additional_versions, history_html, log_hits_html)
+
+def layout_values(values, layout):
+    if layout == "site":
+        for field in FRAGMENT_FIELDS:
+            values[field] = compact_fragment(values[field])
+    return values
+
+# Cached reports are rendered with this in place of the run time, which is
+# filled in each time the report is written out.
+RUN_TIMESTAMP_PLACEHOLDER = "\0run_timestamp\0"
+
+def render_report(data, machine_info, connection_data, system_info, services_info, processes_info, version_info_path, history_html="", layout="single", log_hits_html="", run_timestamp=None):
+    values = build_report_values(data, machine_info, connection_data, system_info, services_info, processes_info, version_info_path, history_html, log_hits_html)
+    if run_timestamp is not None:
+        values['run_timestamp'] = run_timestamp
+    return report_templates[layout].render(layout_values(values, layout))
+
+def render_report_chunks(data, machine_info, connection_data, system_info, services_info, processes_info, version_info_path, history_html="", layout="single", log_hits_html=""):
+    values = build_report_values(data, machine_info, connection_data, system_info, services_info, processes_info, version_info_path, history_html, log_hits_html)
+    return report_templates[layout].iter_render(layout_values(values, layout))
+
+def get_host_name(data):
+    return data.get('AgentInfo', {}).get('host_name', 'Analyzer_Results')
+
+def write_gzip_copy(file_path, content):
+    # Precompressed copy for file servers that serve .gz files directly
+    # (e.g. nginx gzip_static). mtime=0 keeps identical pages identical.
+    if not os.path.exists(file_path + ".gz"):
+        replace_file(file_path + ".gz", gzip.compress(content.encode('utf-8'), compresslevel=9, mtime=0))
+
+def write_site_assets(output_dir, gzip_copy=False):
+    # The stylesheet shared by every site-mode page. Its name changes with
+    # its content, so an existing file is already up to date.
+    assets_dir = os.path.join(output_dir, "assets")
+    os.makedirs(assets_dir, exist_ok=True)
+    stylesheet_path = os.path.join(assets_dir, STYLESHEET_NAME)
+    if not os.path.exists(stylesheet_path):
+        replace_file(stylesheet_path, REPORT_STYLESHEET)
+    if gzip_copy:
+        write_gzip_copy(stylesheet_path, REPORT_STYLESHEET)
+    return stylesheet_path
+
+def write_html_report(html_content, host_name, html_path, content_key=None, gzip_copy=False):
+    html_dir = create_html_directory(html_path)
+    base = os.path.join(html_dir, f"{host_name}_Analyzer_Results")
+    if gzip_copy and not isinstance(html_content, str):
+        html_content = "".join(html_content)
 
+    html_path_with_name = None
     try:
-        with open(html_path_with_name, 'w', encoding='utf-8') as file:
-            file.write(html_content)
+        with span("write report") as write_span:
+            if content_key is None:
+                html_path_with_name, bytes_written = write_unique(base, ".html", html_content)
+            else:
+                html_path_with_name, bytes_written = write_content_addressed(base, ".html", content_key, html_content)
+            if gzip_copy:
+                write_gzip_copy(html_path_with_name, html_content)
+            write_span.set(bytes_written=bytes_written)
     except Exception as e:
-        print(f"Error writing '{html_path_with_name}': {e}")
+        print(f"Error writing report for '{host_name}' to '{html_dir or '.'}': {e}")
+
+    return html_path_with_name
+
+def generate_html_from_json(info_json_path, html_path, version_info_path, temp_dir="temp"):
+    data = load_json(info_json_path)
+    machine_info = load_json(os.path.join(temp_dir, 'machine_info.json'))
+    connection_data = load_json(os.path.join(temp_dir, "json", "TestConnections.json"))
+    system_info = load_json(os.path.join(temp_dir, 'SystemInfo.json'))
+    services_info = get_services(load_json(os.path.join(temp_dir, "json", "Services.json")))
+    processes_info = get_processes(load_json(os.path.join(temp_dir, "json", "RunningProcesses.json")))
+
+    html_content = render_report_chunks(data, machine_info, connection_data, system_info, services_info, processes_info, version_info_path)
+
+    host_name = get_host_name(data)
+    html_path_with_name = write_html_report(html_content, host_name, html_path)
 
     return host_name, html_path_with_name
 
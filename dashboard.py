@@ -0,0 +1,438 @@
+import os
+import json
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+from atomic_write import replace_file
+from create_html import get_plugin_versions, get_protection_statuses, plugin_baseline_names, script_version
+from fleet import protection_status_names
+
+# Rows per chunk file. The dashboard loads only the chunks covering the page
+# being shown, and an update rewrites at most the last chunk.
+CHUNK_SIZE = 1000
+
+# Batch and watch modes collect rows and write them in groups rather than
+# rewriting the last chunk for every report.
+FLUSH_ROWS = 200
+
+LOCK_TIMEOUT_SECONDS = 30.0
+
+DASHBOARD_FIELDS = ["report", "host_name", "machine_id", "collected_at", "protection", "outdated_plugins", "failed_connections"]
+
+# Manifest and chunks are JSON wrapped in a function call and loaded as
+# <script> tags, so the dashboard also works when opened from a file share
+# or local disk, where browsers block fetch().
+MANIFEST_CALLBACK = "dashboardManifest"
+CHUNK_CALLBACK = "dashboardChunk"
+
+def dashboard_row(snapshot, report_path, output_dir, baseline):
+    data = snapshot.info
+    agent_info = data.get('AgentInfo', {})
+    protection_statuses = get_protection_statuses(agent_info)
+    outdated_plugins = []
+    for product, version in get_plugin_versions(agent_info.get('plugins', [])).items():
+        confluence_name = plugin_baseline_names[product]
+        if baseline.classify(confluence_name, [version])[0] == -1:
+            outdated_plugins.append(confluence_name)
+    return [
+        os.path.relpath(report_path, output_dir).replace(os.sep, "/"),
+        agent_info.get('host_name', 'N/A'),
+        data.get('NebulaMachineId', 'N/A'),
+        round(snapshot.collected_at),
+        [str(protection_statuses.get(key, 'N/A')) for key in protection_status_names],
+        outdated_plugins,
+        sum(1 for details in snapshot.test_connections.values() if not details.get("Result", False)),
+    ]
+
+def wrap(callback, *values):
+    return f"{callback}({', '.join(json.dumps(value, ensure_ascii=False, separators=(',', ':')) for value in values)});\n"
+
+def unwrap(content):
+    # Inverse of wrap() for the last argument, which is all the chunk and
+    # manifest readers need.
+    start = content.index("(") + 1
+    if content.startswith(CHUNK_CALLBACK):
+        start = content.index(",", start) + 1
+    return json.loads(content[start:content.rindex(")")])
+
+def try_lock(fd):
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+def unlock(fd):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+@contextmanager
+def dashboard_lock(data_dir):
+    # Serializes manifest updates between processes writing into the same
+    # output directory (e.g. two interactive runs). The OS drops the lock
+    # when its holder exits, so a crashed run never leaves a stale lock and
+    # the lock file itself is never removed.
+    lock_path = os.path.join(data_dir, ".lock")
+    fd = os.open(lock_path, os.O_CREAT | os.O_RDWR)
+    try:
+        deadline = time.monotonic() + LOCK_TIMEOUT_SECONDS
+        while not try_lock(fd):
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Timed out waiting for {lock_path}")
+            time.sleep(0.05)
+        try:
+            yield
+        finally:
+            unlock(fd)
+    finally:
+        os.close(fd)
+
+class Dashboard:
+    def __init__(self, output_dir, chunk_size=CHUNK_SIZE):
+        self.output_dir = output_dir
+        self.data_dir = os.path.join(output_dir, "dashboard")
+        self.chunk_size = chunk_size
+        self.pending = []
+        os.makedirs(self.data_dir, exist_ok=True)
+        self.index_path = write_dashboard_page(output_dir)
+
+    def chunk_path(self, index):
+        return os.path.join(self.data_dir, f"chunk-{index:05d}.js")
+
+    def manifest_path(self):
+        return os.path.join(self.data_dir, "manifest.js")
+
+    def locations_path(self):
+        # Report path -> chunk holding its row. Kept out of the manifest,
+        # which the page loads on every visit.
+        return os.path.join(self.data_dir, "rows.json")
+
+    def load_locations(self, manifest):
+        if manifest["total"] == 0:
+            return {}
+        try:
+            with open(self.locations_path(), 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"Error reading {self.locations_path()}: {e}; rebuilding it")
+        locations = {}
+        for index, count in enumerate(manifest["chunk_rows"]):
+            for row in self.load_chunk(index)[:count]:
+                locations[row[0]] = index
+        return locations
+
+    def load_manifest(self):
+        try:
+            with open(self.manifest_path(), 'r', encoding='utf-8') as file:
+                manifest = unwrap(file.read())
+            if manifest.get("fields") == DASHBOARD_FIELDS:
+                return manifest
+            print(f"Dashboard manifest in {self.data_dir} has an older layout; starting a new one")
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"Error reading dashboard manifest in {self.data_dir}: {e}")
+        return {
+            "fields": DASHBOARD_FIELDS,
+            "protection_keys": list(protection_status_names),
+            "chunk_size": self.chunk_size,
+            "chunk_rows": [],
+            "total": 0,
+        }
+
+    def load_chunk(self, index):
+        with open(self.chunk_path(index), 'r', encoding='utf-8') as file:
+            return unwrap(file.read())
+
+    def add(self, row, flush=False):
+        self.pending.append(row)
+        if flush or len(self.pending) >= FLUSH_ROWS:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        with dashboard_lock(self.data_dir):
+            manifest = self.load_manifest()
+            chunk_rows = manifest["chunk_rows"]
+            chunk_size = manifest["chunk_size"]
+            locations = self.load_locations(manifest)
+
+            # A report that is already listed (re-analyzing with
+            # --content-names reuses the file) gets its row replaced in
+            # place; only new reports are appended.
+            latest = {row[0]: row for row in self.pending}
+            updates = {}
+            pending = []
+            for report, row in latest.items():
+                if locations.get(report, len(chunk_rows)) < len(chunk_rows):
+                    updates.setdefault(locations[report], {})[report] = row
+                else:
+                    pending.append(row)
+            for index, replacements in updates.items():
+                rows = [replacements.get(row[0], row) for row in self.load_chunk(index)[:chunk_rows[index]]]
+                replace_file(self.chunk_path(index), wrap(CHUNK_CALLBACK, index, rows))
+
+            # New rows go into the last, partly filled chunk, the only one
+            # read back for appending.
+            if not pending:
+                pass
+            elif chunk_rows and chunk_rows[-1] < chunk_size:
+                index = len(chunk_rows) - 1
+                rows = self.load_chunk(index)[:chunk_rows[index]]
+            else:
+                index = len(chunk_rows)
+                rows = []
+                chunk_rows.append(0)
+
+            while pending:
+                room = chunk_size - len(rows)
+                for row in pending[:room]:
+                    locations[row[0]] = index
+                rows.extend(pending[:room])
+                pending = pending[room:]
+                replace_file(self.chunk_path(index), wrap(CHUNK_CALLBACK, index, rows))
+                chunk_rows[index] = len(rows)
+                if pending:
+                    index += 1
+                    rows = []
+                    chunk_rows.append(0)
+            replace_file(self.locations_path(), json.dumps(locations, ensure_ascii=False, separators=(',', ':')))
+
+            # Written last, so readers never see counts for rows that are
+            # not on disk yet.
+            manifest["total"] = sum(chunk_rows)
+            manifest["updated_at"] = time.time()
+            manifest["script_version"] = script_version
+            replace_file(self.manifest_path(), wrap(MANIFEST_CALLBACK, manifest))
+        self.pending = []
+
+def write_dashboard_page(output_dir):
+    page_path = os.path.join(output_dir, "Dashboard.html")
+    try:
+        with open(page_path, 'r', encoding='utf-8') as file:
+            if file.read() == DASHBOARD_PAGE:
+                return page_path
+    except FileNotFoundError:
+        pass
+    replace_file(page_path, DASHBOARD_PAGE)
+    return page_path
+
+DASHBOARD_PAGE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="UTF-8">
+<meta name="viewport" content="width=device-width, initial-scale=1.0">
+<title>Endpoint Agent Analyzer Dashboard</title>
+<style>
+body { font-family: Consolas, monospace; padding: 20px; }
+table { border-collapse: collapse; width: 100%; }
+th, td { text-align: left; padding: 6px 8px; }
+th { cursor: pointer; user-select: none; }
+tbody tr:nth-child(odd) { background-color: #d9d9d9; }
+.bad { color: red; }
+.controls { margin: 12px 0; }
+.controls > * { margin-right: 12px; }
+</style>
+</head>
+<body>
+<h1>Endpoint Agent Analyzer Dashboard</h1>
+<div class="controls">
+<input id="search" type="search" placeholder="Host name or machine ID" size="40">
+<label><input id="protection" type="checkbox"> Protection not started</label>
+<label><input id="outdated" type="checkbox"> Outdated plugins</label>
+<label><input id="failing" type="checkbox"> Failing connections</label>
+<span id="status"></span>
+</div>
+<table>
+<thead><tr>
+<th data-column="1">Host</th>
+<th data-column="2">Machine ID</th>
+<th data-column="3">Collected</th>
+<th data-column="4">Protection</th>
+<th data-column="5">Outdated Plugins</th>
+<th data-column="6">Failed Connections</th>
+</tr></thead>
+<tbody id="rows"></tbody>
+</table>
+<div class="controls">
+<button id="previous">Previous</button>
+<span id="page"></span>
+<button id="next">Next</button>
+</div>
+<script>
+var PAGE_SIZE = 100;
+var manifest = null, offsets = [], chunks = {}, waiting = {};
+var page = 0, sortColumn = null, descending = false, renderToken = 0;
+
+function $(id) { return document.getElementById(id); }
+
+function loadScript(src) {
+    var script = document.createElement("script");
+    script.src = src;
+    document.head.appendChild(script);
+}
+
+function dashboardManifest(data) {
+    manifest = data;
+    offsets = [0];
+    manifest.chunk_rows.forEach(function (count) { offsets.push(offsets[offsets.length - 1] + count); });
+    render();
+}
+
+function dashboardChunk(index, rows) {
+    chunks[index] = rows.slice(0, manifest.chunk_rows[index]);
+    var callbacks = waiting[index] || [];
+    delete waiting[index];
+    callbacks.forEach(function (callback) { callback(); });
+}
+
+function loadChunks(indexes, callback) {
+    var remaining = 0;
+    function done() {
+        remaining--;
+        $("status").textContent = remaining ? "Loading " + remaining + " chunk(s)..." : "";
+        if (!remaining) callback();
+    }
+    indexes.forEach(function (index) {
+        if (chunks[index]) return;
+        remaining++;
+        if (!waiting[index]) {
+            waiting[index] = [];
+            loadScript("dashboard/chunk-" + String(index).padStart(5, "0") + ".js?v=" + manifest.updated_at);
+        }
+        waiting[index].push(done);
+    });
+    if (!remaining) callback();
+    else $("status").textContent = "Loading " + remaining + " chunk(s)...";
+}
+
+function badProtection(row) {
+    var bad = [];
+    row[4].forEach(function (status, i) { if (status !== "Started") bad.push(manifest.protection_keys[i] + ": " + status); });
+    return bad;
+}
+
+function sortKey(row, column) {
+    if (column === 4) return badProtection(row).length;
+    if (column === 5) return row[5].length;
+    return row[column];
+}
+
+function filtered() {
+    return $("search").value !== "" || $("protection").checked || $("outdated").checked || $("failing").checked;
+}
+
+function matches(row) {
+    var text = $("search").value.toLowerCase();
+    if (text && row[1].toLowerCase().indexOf(text) < 0 && row[2].toLowerCase().indexOf(text) < 0) return false;
+    if ($("protection").checked && !badProtection(row).length) return false;
+    if ($("outdated").checked && !row[5].length) return false;
+    if ($("failing").checked && !row[6]) return false;
+    return true;
+}
+
+function render() {
+    if (!manifest) return;
+    var token = ++renderToken;
+    if (!filtered() && sortColumn === null) {
+        // Unfiltered, unsorted pages load only the chunks they cover.
+        page = Math.max(0, Math.min(page, Math.ceil(manifest.total / PAGE_SIZE) - 1));
+        var start = page * PAGE_SIZE, end = Math.min(start + PAGE_SIZE, manifest.total), needed = [];
+        for (var i = 0; i < manifest.chunk_rows.length; i++) {
+            if (offsets[i] < end && offsets[i + 1] > start) needed.push(i);
+        }
+        loadChunks(needed, function () {
+            if (token !== renderToken) return;
+            var rows = [];
+            needed.forEach(function (i) { rows = rows.concat(chunks[i]); });
+            show(rows.slice(start - offsets[needed[0] || 0], end - offsets[needed[0] || 0]), manifest.total);
+        });
+        return;
+    }
+    // Filtering and sorting need every row; chunks stay cached afterwards.
+    var all = manifest.chunk_rows.map(function (_, i) { return i; });
+    loadChunks(all, function () {
+        if (token !== renderToken) return;
+        var rows = [];
+        all.forEach(function (i) { rows = rows.concat(chunks[i].filter(matches)); });
+        if (sortColumn !== null) {
+            rows.sort(function (a, b) {
+                var x = sortKey(a, sortColumn), y = sortKey(b, sortColumn);
+                return (x < y ? -1 : x > y ? 1 : 0) * (descending ? -1 : 1);
+            });
+        }
+        page = Math.max(0, Math.min(page, Math.ceil(rows.length / PAGE_SIZE) - 1));
+        show(rows.slice(page * PAGE_SIZE, (page + 1) * PAGE_SIZE), rows.length);
+    });
+}
+
+function cell(tr, text, bad) {
+    var td = document.createElement("td");
+    td.textContent = text;
+    if (bad) td.className = "bad";
+    tr.appendChild(td);
+    return td;
+}
+
+function show(rows, total) {
+    var body = document.createElement("tbody");
+    body.id = "rows";
+    rows.forEach(function (row) {
+        var tr = document.createElement("tr");
+        var link = document.createElement("a");
+        link.href = row[0];
+        link.textContent = row[1];
+        cell(tr, "").appendChild(link);
+        cell(tr, row[2]);
+        cell(tr, new Date(row[3] * 1000).toLocaleString());
+        var bad = badProtection(row);
+        cell(tr, bad.length ? bad.join(", ") : "All started", bad.length);
+        cell(tr, row[5].join(", "), row[5].length);
+        cell(tr, String(row[6]), row[6]);
+        body.appendChild(tr);
+    });
+    $("rows").replaceWith(body);
+    var pages = Math.max(1, Math.ceil(total / PAGE_SIZE));
+    $("page").textContent = "Page " + (page + 1) + " of " + pages + " (" + total + " of " + manifest.total + " endpoints)";
+    $("previous").disabled = page === 0;
+    $("next").disabled = page + 1 >= pages;
+}
+
+var searchTimer = null;
+$("search").addEventListener("input", function () {
+    clearTimeout(searchTimer);
+    searchTimer = setTimeout(function () { page = 0; render(); }, 200);
+});
+["protection", "outdated", "failing"].forEach(function (id) {
+    $(id).addEventListener("change", function () { page = 0; render(); });
+});
+$("previous").addEventListener("click", function () { page--; render(); });
+$("next").addEventListener("click", function () { page++; render(); });
+document.querySelectorAll("th[data-column]").forEach(function (th) {
+    th.addEventListener("click", function () {
+        var column = Number(th.getAttribute("data-column"));
+        descending = sortColumn === column ? !descending : false;
+        sortColumn = column;
+        page = 0;
+        render();
+    });
+});
+loadScript("dashboard/manifest.js?v=" + Date.now());
+</script>
+</body>
+</html>
+"""
@@ -0,0 +1,7 @@
+# Settings shared by the command line and the modules that apply them. This
+# module imports nothing, so main.py can build its arguments from it without
+# loading the analysis modules.
+
+SNAPSHOT_FORMATS = ("ndjson", "csv")
+
+DEFAULT_CACHE_MAX_BYTES = 512 * 1024 * 1024
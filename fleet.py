@@ -0,0 +1,278 @@
+import os
+from array import array
+from itertools import compress
+from collections import Counter
+
+from atomic_write import replace_file
+from create_html import (
+    get_run_timestamp, script_version, get_plugin_versions, get_protection_statuses,
+    get_drive_usage, plugin_baseline_names
+)
+from version_baseline import load_baseline
+
+protection_status_names = {
+    'rtp': 'Malware Protection',
+    'ae': 'Exploit Protection',
+    'arw': 'Behavior Protection',
+    'mwac': 'Web Protection',
+    'sp': 'Self Protection',
+}
+
+baseline_labels = {-1: 'Behind', 0: 'Current', 1: 'Ahead', None: 'Unknown'}
+
+DISK_ALERT_PERCENT = 90.0
+MAX_LISTED_HOSTS = 100
+
+def process_state_label(responding):
+    if responding == True:
+        return 'Responding'
+    elif responding == False:
+        return 'Not Responding'
+    return 'N/A'
+
+def endpoint_metrics(snapshot):
+    data = snapshot.info
+    agent_info = data.get('AgentInfo', {})
+    protection_statuses = get_protection_statuses(agent_info)
+    plugin_versions = get_plugin_versions(agent_info.get('plugins', []))
+    drive_usage = get_drive_usage(snapshot.machine_info.get('drives', []))
+    results = [details.get("Result", False) for details in snapshot.test_connections.values()]
+    passed = sum(1 for result in results if result)
+
+    return {
+        "host_name": agent_info.get('host_name', 'N/A'),
+        "machine_id": data.get('NebulaMachineId', 'N/A'),
+        "protection": {key: protection_statuses.get(key, 'N/A') for key in protection_status_names},
+        "plugins": plugin_versions,
+        "services": dict(snapshot.services.items()),
+        "processes": {name: process_state_label(responding) for name, responding in snapshot.processes.items()},
+        "max_drive_used": max((usage[4] for usage in drive_usage), default=0.0),
+        "connections_passed": passed,
+        "connections_failed": len(results) - passed,
+    }
+
+class CategoryColumn:
+    # Dictionary-encoded column: every distinct label is stored once and
+    # each row is a 16-bit code, so counting is a C-level Counter pass.
+    def __init__(self):
+        self.codes = array('H')
+        self.labels = []
+        self.index = {}
+
+    def append(self, label):
+        label = str(label)
+        code = self.index.get(label)
+        if code is None:
+            code = len(self.labels)
+            self.index[label] = code
+            self.labels.append(label)
+        self.codes.append(code)
+
+    def counts(self):
+        return {self.labels[code]: count for code, count in Counter(self.codes).most_common()}
+
+    def rows_matching(self, predicate):
+        wanted = frozenset(code for code, label in enumerate(self.labels) if predicate(label))
+        if not wanted:
+            return []
+        return list(compress(range(len(self.codes)), map(wanted.__contains__, self.codes)))
+
+class FleetColumns:
+    def __init__(self):
+        self.host_names = []
+        self.machine_ids = []
+        self.protection = {key: CategoryColumn() for key in protection_status_names}
+        self.plugins = {product: CategoryColumn() for product in plugin_baseline_names}
+        self.services = {}
+        self.processes = {}
+        self.max_drive_used = array('d')
+        self.connections_passed = array('I')
+        self.connections_failed = array('I')
+
+    def __len__(self):
+        return len(self.host_names)
+
+    def append(self, metrics):
+        row = len(self.host_names)
+        self.host_names.append(metrics["host_name"])
+        self.machine_ids.append(metrics["machine_id"])
+        for key, column in self.protection.items():
+            column.append(metrics["protection"].get(key, 'N/A'))
+        for product, column in self.plugins.items():
+            column.append(metrics["plugins"].get(product, 'N/A'))
+        self.append_states(self.services, metrics["services"], row)
+        self.append_states(self.processes, metrics["processes"], row)
+        self.max_drive_used.append(metrics["max_drive_used"])
+        self.connections_passed.append(metrics["connections_passed"])
+        self.connections_failed.append(metrics["connections_failed"])
+
+    def append_states(self, columns, states, row):
+        for name, state in states.items():
+            if name not in columns:
+                column = CategoryColumn()
+                # Backfill a column first seen part-way through the fleet.
+                for _ in range(row):
+                    column.append('N/A')
+                columns[name] = column
+        for name, column in columns.items():
+            column.append(states.get(name, 'N/A'))
+
+    def hosts_at(self, rows):
+        return [self.host_names[row] for row in rows]
+
+def is_failing_state(label):
+    return label.lower() not in ['started', 'running', 'n/a']
+
+def format_percentage(count, total):
+    return f"{(count / total) * 100 if total else 0:.1f}%"
+
+def format_host_list(host_names):
+    if not host_names:
+        return '—'
+    listed = ", ".join(host_names[:MAX_LISTED_HOSTS])
+    if len(host_names) > MAX_LISTED_HOSTS:
+        listed += f" … and {len(host_names) - MAX_LISTED_HOSTS} more"
+    return listed
+
+def get_category_table(title, columns, display_names, is_failing, fleet):
+    total = len(fleet)
+    rows = [f'''
+    <h2>{title}</h2>
+    <table class="fleet_table">
+        <tr>
+            <th>Item</th>
+            <th>Value</th>
+            <th style="text-align: right;">Endpoints</th>
+            <th style="text-align: right;">Percentage</th>
+        </tr>
+    ''']
+    failing_rows = []
+    for key, column in columns.items():
+        for label, count in column.counts().items():
+            rows.append(f'''
+        <tr>
+            <td>{display_names.get(key, key)}</td>
+            <td>{label}</td>
+            <td style="text-align: right;">{count}</td>
+            <td style="text-align: right;">{format_percentage(count, total)}</td>
+        </tr>
+        ''')
+        failing = column.rows_matching(is_failing)
+        if failing:
+            failing_rows.append((display_names.get(key, key), failing))
+    rows.append('</table>')
+
+    for name, failing in failing_rows:
+        rows.append(f'''
+    <div class="failing_hosts"><span style="font-weight: bold;">{name} ({len(failing)}):</span> {format_host_list(fleet.hosts_at(failing))}</div>
+    ''')
+    return "".join(rows)
+
+def get_baseline_table(fleet, baseline):
+    total = len(fleet)
+    rows = [f'''
+    <h2>Plugin Baseline</h2>
+    <table class="fleet_table">
+        <tr>
+            <th>Item</th>
+            <th>Value</th>
+            <th style="text-align: right;">Endpoints</th>
+            <th style="text-align: right;">Percentage</th>
+        </tr>
+    ''']
+    failing_rows = []
+    for product, column in fleet.plugins.items():
+        confluence_name = plugin_baseline_names[product]
+        # Classify each distinct version once; rows only carry codes, so
+        # the per-row work is just regrouping the code counts.
+        classes = [baseline_labels[c] for c in baseline.classify(confluence_name, column.labels)]
+        counts = Counter()
+        for label, count in column.counts().items():
+            counts[classes[column.index[label]]] += count
+        for label, count in counts.most_common():
+            rows.append(f'''
+        <tr>
+            <td>{product} (baseline {baseline.get(confluence_name)})</td>
+            <td>{label}</td>
+            <td style="text-align: right;">{count}</td>
+            <td style="text-align: right;">{format_percentage(count, total)}</td>
+        </tr>
+        ''')
+        behind = frozenset(label for label, cls in zip(column.labels, classes) if cls == 'Behind')
+        failing = column.rows_matching(behind.__contains__)
+        if failing:
+            failing_rows.append((product, failing))
+    rows.append('</table>')
+
+    for name, failing in failing_rows:
+        rows.append(f'''
+    <div class="failing_hosts"><span style="font-weight: bold;">{name} behind baseline ({len(failing)}):</span> {format_host_list(fleet.hosts_at(failing))}</div>
+    ''')
+    return "".join(rows)
+
+def generate_fleet_html(columns, baseline):
+    total = len(columns)
+
+    failed_connections = list(compress(range(total), columns.connections_failed))
+    disk_alerts = list(compress(range(total), map(DISK_ALERT_PERCENT.__le__, columns.max_drive_used)))
+    mean_drive_used = sum(columns.max_drive_used) / total if total else 0.0
+
+    sections = [
+        get_category_table("Protection Status", columns.protection, protection_status_names, is_failing_state, columns),
+        get_category_table("Plugin Versions", columns.plugins, {}, lambda label: False, columns),
+        get_baseline_table(columns, baseline),
+        get_category_table("Services", columns.services, {}, is_failing_state, columns),
+        get_category_table("Processes", columns.processes, {}, lambda label: label == 'Not Responding', columns),
+    ]
+
+    return f"""
+    <!DOCTYPE html>
+    <html lang="en">
+    <head>
+        <meta charset="UTF-8">
+        <title>Fleet Summary</title>
+        <style>
+            body {{
+                font-family: Consolas, monospace;
+                padding: 20px;
+            }}
+            table {{
+                border-collapse: collapse;
+                width: 100%;
+                table-layout: fixed;
+            }}
+            td, th {{
+                text-align: left;
+                padding: 8px;
+            }}
+            .fleet_table tr:nth-child(even) {{
+                background-color: #d9d9d9;
+            }}
+            .failing_hosts {{
+                margin-top: 10px;
+                color: red;
+            }}
+        </style>
+    </head>
+    <body>
+        <h1>Endpoint Agent Fleet Summary</h1>
+        <div><span style="font-weight: bold;">Script Version:</span> {script_version} | <span style="font-weight: bold;">Script RunTime:</span> {get_run_timestamp()} | <span style="font-weight: bold;">Endpoints:</span> {total}</div>
+        <hr>
+        {"".join(sections)}
+        <h2>Storage</h2>
+        <div>Mean highest drive usage: {mean_drive_used:.2f}%</div>
+        <div>Endpoints with a drive at or above {DISK_ALERT_PERCENT:.0f}% used: {len(disk_alerts)} ({format_percentage(len(disk_alerts), total)})</div>
+        <div class="failing_hosts">{format_host_list(columns.hosts_at(disk_alerts))}</div>
+        <h2>Test Connections</h2>
+        <div>Endpoints with at least one failed connection: {len(failed_connections)} ({format_percentage(len(failed_connections), total)})</div>
+        <div>Total connection checks: {sum(columns.connections_passed) + sum(columns.connections_failed)}, failed: {sum(columns.connections_failed)}</div>
+        <div class="failing_hosts">{format_host_list(columns.hosts_at(failed_connections))}</div>
+    </body>
+    </html>
+    """
+
+def write_fleet_report(columns, output_dir, version_info_path):
+    os.makedirs(output_dir, exist_ok=True)
+    report_path = os.path.join(output_dir, "Fleet_Summary.html")
+    replace_file(report_path, generate_fleet_html(columns, load_baseline(version_info_path)))
+    return report_path
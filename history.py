@@ -0,0 +1,479 @@
+import os
+import sys
+import json
+import zlib
+import sqlite3
+import hashlib
+import argparse
+from datetime import datetime
+
+from create_html import get_plugin_versions, get_protection_statuses, get_drive_usage, get_services, get_processes, trim_version, plugin_baseline_names
+from fleet import protection_status_names, process_state_label
+from snapshot_model import EndpointSnapshot
+from version_baseline import load_baseline
+
+# Drive usage always moves a little between collections; smaller changes
+# than this are not reported.
+DRIVE_CHANGE_PERCENT = 1.0
+
+# Bump when snapshot_attributes() or the choice of each machine's latest
+# snapshot changes so existing databases are re-indexed on open.
+INDEX_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY,
+    machine_id TEXT NOT NULL,
+    host_name TEXT NOT NULL,
+    collected_at REAL NOT NULL,
+    recorded_at REAL NOT NULL,
+    bundle TEXT,
+    digest TEXT NOT NULL,
+    data BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS snapshots_by_machine ON snapshots (machine_id, collected_at);
+CREATE INDEX IF NOT EXISTS snapshots_by_host ON snapshots (host_name, collected_at);
+CREATE INDEX IF NOT EXISTS snapshots_by_time ON snapshots (collected_at);
+DROP INDEX IF EXISTS snapshots_by_digest;
+CREATE TABLE IF NOT EXISTS latest (
+    machine_id TEXT PRIMARY KEY,
+    host_name TEXT NOT NULL,
+    snapshot_id INTEGER NOT NULL,
+    collected_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS latest_by_host ON latest (host_name);
+CREATE TABLE IF NOT EXISTS attributes (
+    machine_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (machine_id, kind, name)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS attributes_by_value ON attributes (kind, name, value);
+"""
+
+# Attribute kinds that can be filtered with NAME=VALUE / NAME!=VALUE, and
+# the names each one accepts.
+query_names = {
+    "protection": list(protection_status_names),
+    "plugin": list(plugin_baseline_names.values()),
+    "service": list(get_services([])),
+    "process": list(get_processes([])),
+}
+
+def format_timestamp(timestamp):
+    return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
+
+def snapshot_attributes(snapshot):
+    # One (kind, name, value) row per queryable fact. Only each machine's
+    # newest snapshot is indexed, so the rows describe the fleet as it is now.
+    agent_info = snapshot.info.get('AgentInfo', {})
+    protection_statuses = get_protection_statuses(agent_info)
+    rows = [("protection", key, str(protection_statuses.get(key, 'N/A'))) for key in protection_status_names]
+    rows += [("plugin", plugin_baseline_names[product], version) for product, version in get_plugin_versions(agent_info.get('plugins', [])).items()]
+    rows += [("service", name, str(state)) for name, state in snapshot.services.items()]
+    rows += [("process", name, process_state_label(responding)) for name, responding in snapshot.processes.items()]
+    rows += [("failed_url", url, str(details.get("StatusCode", 'N/A'))) for url, details in snapshot.test_connections.items() if not details.get("Result", False)]
+    return rows
+
+def history_entry(snapshot, bundle=None):
+    # Everything needed for an insert, built where the snapshot was parsed
+    # so batch workers can hand it to the single writer in the parent.
+    data = snapshot.info
+    agent_info = data.get('AgentInfo', {})
+    payload = json.dumps(snapshot.to_dict(), sort_keys=True).encode('utf-8')
+    content = json.dumps(snapshot.content_dict(), sort_keys=True).encode('utf-8')
+    return {
+        "machine_id": data.get('NebulaMachineId', 'N/A'),
+        "host_name": agent_info.get('host_name', 'N/A'),
+        "collected_at": snapshot.collected_at,
+        "recorded_at": datetime.now().timestamp(),
+        "bundle": None if bundle is None else str(bundle),
+        "digest": hashlib.sha256(content).hexdigest(),
+        "data": zlib.compress(payload),
+        "attributes": snapshot_attributes(snapshot),
+    }
+
+class HistoryStore:
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.connection = sqlite3.connect(db_path)
+        self.connection.row_factory = sqlite3.Row
+        # WAL lets readers (diffs, queries) run while a batch is inserting.
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+        self.inserted = 0
+        # Databases recorded before the query index existed are indexed once
+        # when first opened.
+        if self.connection.execute("PRAGMA user_version").fetchone()[0] < INDEX_VERSION:
+            self.reindex()
+            self.connection.execute(f"PRAGMA user_version = {INDEX_VERSION}")
+
+    def find_duplicate(self, entry):
+        # Only the machine's snapshot at or just before this one is matched:
+        # that covers a re-run batch and an unchanged re-collection, while a
+        # machine that goes A -> B -> A still records all three.
+        row = self.connection.execute(
+            "SELECT id, digest FROM snapshots WHERE machine_id = ? AND collected_at <= ? ORDER BY collected_at DESC, id DESC LIMIT 1",
+            (entry["machine_id"], entry["collected_at"])
+        ).fetchone()
+        return row["id"] if row is not None and row["digest"] == entry["digest"] else None
+
+    def insert(self, entry):
+        with self.connection:
+            snapshot_id = self.find_duplicate(entry)
+            if snapshot_id is None:
+                cursor = self.connection.execute(
+                    "INSERT INTO snapshots (machine_id, host_name, collected_at, recorded_at, bundle, digest, data) "
+                    "VALUES (:machine_id, :host_name, :collected_at, :recorded_at, :bundle, :digest, :data)",
+                    entry
+                )
+                snapshot_id = cursor.lastrowid
+                self.inserted += 1
+            # A duplicate can still be the machine's newest collection.
+            self.update_latest(snapshot_id, entry["machine_id"], entry["host_name"], entry["collected_at"], entry["attributes"])
+        return snapshot_id
+
+    def record(self, snapshot, bundle=None):
+        return self.insert(history_entry(snapshot, bundle))
+
+    def load(self, snapshot_id):
+        row = self.connection.execute("SELECT * FROM snapshots WHERE id = ?", (snapshot_id,)).fetchone()
+        if row is None:
+            return None, None
+        return dict(row), EndpointSnapshot(json.loads(zlib.decompress(row["data"])))
+
+    def list_snapshots(self, host=None, limit=50):
+        # host matches either the NebulaMachineId or the host name; both
+        # lookups are served by their (key, collected_at) index.
+        columns = "id, machine_id, host_name, collected_at, recorded_at, bundle"
+        if host is None:
+            rows = self.connection.execute(f"SELECT {columns} FROM snapshots ORDER BY collected_at DESC LIMIT ?", (limit,))
+        else:
+            rows = self.connection.execute(
+                f"SELECT {columns} FROM snapshots WHERE machine_id = ? "
+                f"UNION SELECT {columns} FROM snapshots WHERE host_name = ? "
+                "ORDER BY collected_at DESC LIMIT ?",
+                (host, host, limit)
+            )
+        return [dict(row) for row in rows]
+
+    def previous(self, snapshot_id):
+        row = self.connection.execute("SELECT machine_id, collected_at FROM snapshots WHERE id = ?", (snapshot_id,)).fetchone()
+        if row is None:
+            return None
+        previous = self.connection.execute(
+            "SELECT id FROM snapshots WHERE machine_id = ? AND collected_at <= ? AND id != ? ORDER BY collected_at DESC, id DESC LIMIT 1",
+            (row["machine_id"], row["collected_at"], snapshot_id)
+        ).fetchone()
+        return None if previous is None else previous["id"]
+
+    def diff(self, old_id, new_id):
+        old_meta, old_snapshot = self.load(old_id)
+        new_meta, new_snapshot = self.load(new_id)
+        if old_snapshot is None or new_snapshot is None:
+            return None, None, []
+        return old_meta, new_meta, diff_snapshots(old_snapshot, new_snapshot)
+
+    def record_with_diff_html(self, snapshot, bundle=None):
+        snapshot_id = self.record(snapshot, bundle)
+        previous_id = self.previous(snapshot_id)
+        if previous_id is None:
+            return ""
+        old_meta, new_meta, changes = self.diff(previous_id, snapshot_id)
+        return get_history_html(old_meta, new_meta, changes)
+
+    def update_latest(self, snapshot_id, machine_id, host_name, collected_at, attributes):
+        row = self.connection.execute("SELECT collected_at FROM latest WHERE machine_id = ?", (machine_id,)).fetchone()
+        if row is not None and row["collected_at"] > collected_at:
+            return
+        self.connection.execute("INSERT OR REPLACE INTO latest (machine_id, host_name, snapshot_id, collected_at) VALUES (?, ?, ?, ?)", (machine_id, host_name, snapshot_id, collected_at))
+        self.connection.execute("DELETE FROM attributes WHERE machine_id = ?", (machine_id,))
+        self.connection.executemany("INSERT OR REPLACE INTO attributes (machine_id, kind, name, value) VALUES (?, ?, ?, ?)", [(machine_id, kind, name, value) for kind, name, value in attributes])
+
+    def reindex(self):
+        rows = self.connection.execute(
+            "SELECT id, machine_id, host_name, collected_at, data FROM snapshots AS s WHERE id = "
+            "(SELECT id FROM snapshots WHERE machine_id = s.machine_id ORDER BY collected_at DESC, id DESC LIMIT 1)"
+        ).fetchall()
+        with self.connection:
+            self.connection.execute("DELETE FROM latest")
+            self.connection.execute("DELETE FROM attributes")
+            for row in rows:
+                snapshot = EndpointSnapshot(json.loads(zlib.decompress(row["data"])))
+                self.update_latest(row["id"], row["machine_id"], row["host_name"], row["collected_at"], snapshot_attributes(snapshot))
+        return len(rows)
+
+    def attribute_values(self, kind, name):
+        return [row[0] for row in self.connection.execute("SELECT DISTINCT value FROM attributes WHERE kind = ? AND name = ?", (kind, name))]
+
+    def query(self, conditions, host=None, limit=None):
+        # conditions are (kind, name, values, negate). A match is looked up
+        # in the (kind, name, value) index, so selective filters only touch
+        # the machines they match; an exclusion is one primary-key probe per
+        # machine, walked in host order so --limit stops early.
+        columns = ["latest.snapshot_id", "latest.host_name", "latest.machine_id", "latest.collected_at"]
+        joins = []
+        clauses = []
+        join_params = []
+        where_params = []
+        for idx, (kind, name, values, negate) in enumerate(conditions):
+            columns.append(f"a{idx}.value")
+            joins.append(f"LEFT JOIN attributes AS a{idx} ON a{idx}.machine_id = latest.machine_id AND a{idx}.kind = ? AND a{idx}.name = ?")
+            join_params += [kind, name]
+            placeholders = ", ".join("?" * len(values))
+            if negate:
+                clauses.append(f"NOT EXISTS (SELECT 1 FROM attributes WHERE machine_id = latest.machine_id AND kind = ? AND name = ? AND value IN ({placeholders}))")
+            else:
+                clauses.append(f"latest.machine_id IN (SELECT machine_id FROM attributes WHERE kind = ? AND name = ? AND value IN ({placeholders}))")
+            where_params += [kind, name] + list(values)
+        if host is not None:
+            clauses.append("(latest.host_name = ? OR latest.machine_id = ?)")
+            where_params += [host, host]
+
+        sql = f"SELECT {', '.join(columns)} FROM latest {' '.join(joins)}"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY latest.host_name"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+
+        keys = ["id", "host_name", "machine_id", "collected_at"] + [f"{kind}.{name}" for kind, name, _, _ in conditions]
+        results = []
+        for row in self.connection.execute(sql, join_params + where_params):
+            result = dict(zip(keys, row))
+            for key in keys[4:]:
+                if result[key] is None:
+                    result[key] = 'N/A'
+            results.append(result)
+        return results
+
+    def close(self):
+        self.connection.close()
+
+def snapshot_versions(snapshot):
+    agent_info = snapshot.info.get('AgentInfo', {})
+    versions = dict(get_plugin_versions(agent_info.get('plugins', [])))
+    versions['Engine'] = trim_version(agent_info.get('engine_version', 'N/A'))
+    versions['Service'] = trim_version(agent_info.get('service_version', 'N/A'))
+    versions['User Agent'] = ", ".join(trim_version(v) for v in agent_info.get('tray_version', []))
+    return versions
+
+def snapshot_drives(snapshot):
+    return {drive.get('name', 'N/A'): percent for drive, _, _, _, percent in get_drive_usage(snapshot.machine_info.get('drives', []))}
+
+def snapshot_connections(snapshot):
+    return {url: "Passed" if details.get("Result", False) else "Failed" for url, details in snapshot.test_connections.items()}
+
+def diff_mapping(section, old, new, changes):
+    # Accepts dicts or snapshot records; both expose items().
+    old = dict(old.items())
+    new = dict(new.items())
+    for key in list(old) + [key for key in new if key not in old]:
+        old_value = old.get(key, 'N/A')
+        new_value = new.get(key, 'N/A')
+        if old_value != new_value:
+            changes.append((section, key, str(old_value), str(new_value)))
+
+def diff_snapshots(old, new):
+    changes = []
+    diff_mapping("Versions", snapshot_versions(old), snapshot_versions(new), changes)
+    diff_mapping("Protection", get_protection_statuses(old.info.get('AgentInfo', {})), get_protection_statuses(new.info.get('AgentInfo', {})), changes)
+    diff_mapping("Services", old.services, new.services, changes)
+    diff_mapping("Processes", old.processes, new.processes, changes)
+
+    old_drives = snapshot_drives(old)
+    new_drives = snapshot_drives(new)
+    for name in list(old_drives) + [name for name in new_drives if name not in old_drives]:
+        old_percent = old_drives.get(name)
+        new_percent = new_drives.get(name)
+        if old_percent is None or new_percent is None or abs(new_percent - old_percent) >= DRIVE_CHANGE_PERCENT:
+            changes.append((
+                "Drive Usage", name,
+                'N/A' if old_percent is None else f"{old_percent:.2f}%",
+                'N/A' if new_percent is None else f"{new_percent:.2f}%"
+            ))
+
+    diff_mapping("Test Connections", snapshot_connections(old), snapshot_connections(new), changes)
+    return changes
+
+def get_history_html(old_meta, new_meta, changes):
+    rows = [f'''
+        <hr>
+        <h2 style="margin-bottom: -5px;">Changes Since {format_timestamp(old_meta["collected_at"])}</h2>
+        <div class="connection_results">
+        <table class="connection_results">
+            <tr>
+                <th>Section</th>
+                <th>Item</th>
+                <th>Before</th>
+                <th>After</th>
+            </tr>
+    ''']
+    if not changes:
+        rows.append('''
+            <tr>
+                <td colspan="4">No changes</td>
+            </tr>
+        ''')
+    for idx, (section, item, old_value, new_value) in enumerate(changes):
+        rows.append(f'''
+            <tr style="background-color: {'#d9d9d9' if idx % 2 == 0 else '#ffffff'};">
+                <td>{section}</td>
+                <td>{item}</td>
+                <td>{old_value}</td>
+                <td>{new_value}</td>
+            </tr>
+        ''')
+    rows.append(f'''
+        </table>
+        <div>Compared snapshot {old_meta["id"]} ({format_timestamp(old_meta["collected_at"])}) with snapshot {new_meta["id"]} ({format_timestamp(new_meta["collected_at"])}).</div>
+        </div>
+''')
+    return "".join(rows)
+
+def print_snapshots(rows):
+    print(f"{'ID':>8}  {'Collected':<19}  {'Host':<24}  {'NebulaMachineId':<36}  Bundle")
+    for row in rows:
+        print(f"{row['id']:>8}  {format_timestamp(row['collected_at']):<19}  {row['host_name']:<24}  {row['machine_id']:<36}  {row['bundle'] or ''}")
+
+def print_changes(old_meta, new_meta, changes):
+    print(f"Snapshot {old_meta['id']} ({format_timestamp(old_meta['collected_at'])}) -> {new_meta['id']} ({format_timestamp(new_meta['collected_at'])}), host {new_meta['host_name']}")
+    if not changes:
+        print("No changes")
+    for section, item, old_value, new_value in changes:
+        print(f"  {section:<16} {item:<60} {old_value} -> {new_value}")
+
+def parse_condition(kind, text):
+    # NAME=VALUE or NAME!=VALUE
+    negate = "!=" in text
+    name, separator, value = text.partition("!=" if negate else "=")
+    if not separator or name not in query_names[kind]:
+        return None
+    return (kind, name, [value], negate)
+
+def query_conditions(store, args):
+    conditions = []
+    for kind in query_names:
+        for text in getattr(args, kind):
+            condition = parse_condition(kind, text)
+            if condition is None:
+                print(f"Error: --{kind} expects NAME=VALUE or NAME!=VALUE with NAME one of {', '.join(query_names[kind])}")
+                return None
+            conditions.append(condition)
+
+    if args.behind:
+        # The baseline comparison runs once per distinct version in the
+        # index, not once per endpoint.
+        baseline = load_baseline(args.version_info)
+        for name in args.behind:
+            if name not in query_names["plugin"]:
+                print(f"Error: --behind expects one of {', '.join(query_names['plugin'])}")
+                return None
+            versions = store.attribute_values("plugin", name)
+            behind = [version for version, result in zip(versions, baseline.classify(name, versions)) if result == -1]
+            conditions.append(("plugin", name, behind, False))
+
+    for url in args.failing_url:
+        conditions.append(("failed_url", url, store.attribute_values("failed_url", url), False))
+    return conditions
+
+def print_query_results(results):
+    if not results:
+        print("No matching endpoints")
+        return
+    header = list(results[0])
+    rows = [[format_timestamp(value) if key == "collected_at" else str(value) for key, value in result.items()] for result in results]
+    widths = [max(len(header[idx]), max(len(row[idx]) for row in rows)) for idx in range(len(header))]
+    print("  ".join(name.ljust(width) for name, width in zip(header, widths)))
+    for row in rows:
+        print("  ".join(value.ljust(width) for value, width in zip(row, widths)))
+    print(f"{len(results)} endpoint(s)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect and diff snapshots recorded with --history-db.")
+    parser.add_argument('--db', required=True, help="History database written by main.py --history-db")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    list_parser = subparsers.add_parser('list', help="List recorded snapshots, newest first")
+    list_parser.add_argument('--host', help="Host name or NebulaMachineId")
+    list_parser.add_argument('--limit', type=int, default=50, help="Maximum number of snapshots to list")
+
+    diff_parser = subparsers.add_parser('diff', help="Show what changed between two snapshots of a host")
+    diff_parser.add_argument('--host', help="Host name or NebulaMachineId; diffs its two latest snapshots")
+    diff_parser.add_argument('--from', dest="from_id", type=int, help="Older snapshot ID")
+    diff_parser.add_argument('--to', dest="to_id", type=int, help="Newer snapshot ID")
+    diff_parser.add_argument('--html', help="Also write the diff as an HTML section to this file")
+
+    query_parser = subparsers.add_parser('query', help="Find endpoints by the state of their latest snapshot")
+    query_parser.add_argument('--protection', action='append', default=[], help="Protection status, e.g. rtp!=Started (repeatable)")
+    query_parser.add_argument('--plugin', action='append', default=[], help="Plugin version, e.g. MBAM=1.2.345 (repeatable)")
+    query_parser.add_argument('--behind', action='append', default=[], help="Plugin whose version is behind the baseline, e.g. MBAM (repeatable)")
+    query_parser.add_argument('--service', action='append', default=[], help="Service state, e.g. mbam_service=Stopped (repeatable)")
+    query_parser.add_argument('--process', action='append', default=[], help="Process state, e.g. ea_tray='Not Responding' (repeatable)")
+    query_parser.add_argument('--failing-url', action='append', default=[], help="Endpoints whose connection test to this URL failed (repeatable)")
+    query_parser.add_argument('--host', help="Host name or NebulaMachineId")
+    query_parser.add_argument('--version-info', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "version_info.json"), help="Baseline used by --behind")
+    query_parser.add_argument('--format', choices=["table", "ndjson"], default="table", help="Output format")
+    query_parser.add_argument('--limit', type=int, default=None, help="Maximum number of endpoints to return")
+
+    subparsers.add_parser('reindex', help="Rebuild the query index from each machine's newest snapshot")
+    args = parser.parse_args()
+
+    store = HistoryStore(args.db)
+    try:
+        if args.command == "list":
+            print_snapshots(store.list_snapshots(args.host, args.limit))
+            return 0
+
+        if args.command == "reindex":
+            print(f"{store.reindex()} endpoint(s) re-indexed")
+            return 0
+
+        if args.command == "query":
+            conditions = query_conditions(store, args)
+            if conditions is None:
+                return 1
+            results = store.query(conditions, args.host, args.limit)
+            if args.format == "ndjson":
+                for result in results:
+                    print(json.dumps(result, ensure_ascii=False))
+            else:
+                print_query_results(results)
+            return 0
+
+        to_id = args.to_id
+        from_id = args.from_id
+        if to_id is None:
+            if args.host is None:
+                print("Error: give --host or --to.")
+                return 1
+            latest = store.list_snapshots(args.host, 1)
+            if not latest:
+                print(f"No snapshots recorded for {args.host}")
+                return 1
+            to_id = latest[0]["id"]
+        if from_id is None:
+            from_id = store.previous(to_id)
+            if from_id is None:
+                print(f"Snapshot {to_id} has no earlier snapshot to compare with")
+                return 1
+
+        old_meta, new_meta, changes = store.diff(from_id, to_id)
+        if old_meta is None:
+            print(f"Snapshot {from_id} or {to_id} not found")
+            return 1
+        if old_meta["machine_id"] != new_meta["machine_id"]:
+            print(f"Warning: snapshots {from_id} and {to_id} belong to different machines")
+        print_changes(old_meta, new_meta, changes)
+        if args.html:
+            with open(args.html, 'w', encoding='utf-8') as file:
+                file.write(get_history_html(old_meta, new_meta, changes))
+            print(f"Diff written to {args.html}")
+        return 0
+    finally:
+        store.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
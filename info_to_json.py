@@ -1,6 +1,56 @@
+import io
 import json
 import os
 
+def read_agent_info(lines, first_line):
+    # Returns (found, value). A decode is tried after the first line and on
+    # lines closing a bracket at column 0, where an indented object ends, so
+    # reading stops with the object. A failed try waits for the text to
+    # double before the next one, keeping the total work linear.
+    decoder = json.JSONDecoder()
+    pieces = []
+    size = 0
+    attempted_size = 0
+    line = first_line
+    while line is not None:
+        piece = line.strip()
+        if piece:
+            pieces.append(piece)
+            size += len(piece)
+            if (line is first_line or line.startswith(("}", "]"))) and size >= 2 * attempted_size:
+                try:
+                    agent_info, _ = decoder.raw_decode("".join(pieces))
+                    return True, agent_info
+                except json.JSONDecodeError:
+                    attempted_size = size
+        line = next(lines, None)
+
+    json_content = "".join(pieces)
+    if not json_content:
+        return False, None
+    # Raises for an incomplete or malformed value, as a full parse would.
+    agent_info, _ = decoder.raw_decode(json_content)
+    return True, agent_info
+
+def parse_info_file(info_file):
+    data = {}
+    lines = iter(info_file)
+
+    for line in lines:
+        if "Agent Info=" in line:
+            found, agent_info = read_agent_info(lines, line.split("=", 1)[1])
+            if found:
+                data["AgentInfo"] = agent_info
+            break
+        elif "=" in line:
+            key, value = line.split("=", 1)
+            data[key.strip()] = value.strip()
+
+    return data
+
+def parse_info_text(content):
+    return parse_info_file(io.StringIO(content))
+
 def slice_json(info_txt_path):
     try:
         if not os.path.isfile(info_txt_path):
@@ -8,29 +58,7 @@ def slice_json(info_txt_path):
             return None
         
         with open(info_txt_path, "r") as info_file:
-            content = info_file.read()
-        
-        lines = content.splitlines()
-
-        data = {}
-        json_content = ""
-        in_json_section = False
-
-        for line in lines:
-            if "Agent Info=" in line:
-                in_json_section = True
-                json_content += line.split("=", 1)[1].strip()
-            elif in_json_section:
-                json_content += line.strip()
-            elif "=" in line:
-                key, value = line.split("=", 1)
-                data[key.strip()] = value.strip()
-        
-        if json_content:
-            agent_info = json.loads(json_content)
-            data["AgentInfo"] = agent_info
-
-        return data
+            return parse_info_file(info_file)
     
     except IOError as e:
         print(f"Error reading file {info_txt_path}: {e}")
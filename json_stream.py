@@ -0,0 +1,117 @@
+import re
+import json
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+DEFAULT_MAX_OBJECT_SIZE = 64 * 1024 * 1024
+
+# Braces change the nesting depth; a string is consumed whole so braces
+# inside it are ignored. Jumping between tokens with a compiled regex keeps
+# the per-character work in C. An unterminated string (no closing quote
+# captured) means the object continues in the next chunk.
+_TOKEN = re.compile(r'"(?:[^"\\]+|\\.)*(")?|[{}]', re.DOTALL)
+
+def iter_json_objects(stream, chunk_size=DEFAULT_CHUNK_SIZE, max_object_size=DEFAULT_MAX_OBJECT_SIZE, on_error=None):
+    decoder = json.JSONDecoder()
+    buffer = ""
+    start = -1
+    pos = 0
+    depth = 0
+    eof = False
+    # Set while scanning past an oversize object: only its nesting depth is
+    # tracked, so nothing nested inside it is yielded as a top-level object.
+    skipping = False
+
+    while True:
+        if start < 0:
+            start = buffer.find("{", pos)
+            if start < 0:
+                if eof:
+                    return
+                buffer = stream.read(chunk_size)
+                pos = 0
+                if not buffer:
+                    return
+                continue
+            # Well-formed objects that are already fully buffered decode in
+            # one C-level pass; the token scan below only runs for objects
+            # that straddle a chunk boundary or are not valid JSON.
+            try:
+                obj, end = decoder.raw_decode(buffer, start)
+            except json.JSONDecodeError:
+                pass
+            else:
+                yield obj
+                pos = end
+                start = -1
+                continue
+            pos = start + 1
+            depth = 1
+
+        end = None
+        while end is None:
+            match = _TOKEN.search(buffer, pos)
+            if match is None:
+                pos = len(buffer)
+                break
+            token = match.group()
+            if token == "{":
+                depth += 1
+            elif token == "}":
+                depth -= 1
+                if depth == 0:
+                    end = match.end()
+            elif match.group(1) is None:
+                pos = match.start()
+                break
+            pos = match.end()
+
+        if end is None:
+            if eof:
+                if skipping:
+                    return
+                # Often just a stray "{" in the text between objects, so the
+                # scan resumes right after it rather than giving up.
+                if on_error is not None:
+                    on_error(ValueError(f"Unterminated JSON object at offset {start} of the current buffer"))
+                pos = start + 1
+                start = -1
+                continue
+            if not skipping and len(buffer) - start > max_object_size:
+                if on_error is not None:
+                    on_error(ValueError(f"JSON object at offset {start} of the current buffer exceeds {max_object_size} characters"))
+                skipping = True
+            # Read at least as much new text as is kept before rebuilding the
+            # buffer, so an object spanning many chunks is copied a
+            # logarithmic number of times rather than once per chunk.
+            kept = buffer[pos:] if skipping else buffer[start:]
+            chunks = []
+            size = 0
+            while not chunks or size < len(kept):
+                chunk = stream.read(chunk_size)
+                if not chunk:
+                    eof = True
+                    break
+                chunks.append(chunk)
+                size += len(chunk)
+            if not chunks:
+                continue
+            buffer = kept + "".join(chunks)
+            if skipping:
+                pos = 0
+            else:
+                pos -= start
+                start = 0
+            continue
+
+        if skipping:
+            skipping = False
+        else:
+            try:
+                obj, _ = decoder.raw_decode(buffer, start)
+            except json.JSONDecodeError as e:
+                if on_error is not None:
+                    on_error(e)
+            else:
+                yield obj
+        pos = end
+        start = -1
@@ -0,0 +1,400 @@
+import os
+import re
+import html
+import json
+import mmap
+import zipfile
+import fnmatch
+import hashlib
+import functools
+import posixpath
+from itertools import chain
+from contextlib import ExitStack, contextmanager
+
+try:
+    from re import _parser as sre_parse
+except ImportError:
+    import sre_parse
+
+from profiling import span
+from select_directory import list_directory, is_excluded, is_archive_name
+
+LOG_FILE_PATTERNS = ("*.log", "*.log.*")
+
+# Signature name -> regular expression, matched against single log lines;
+# ^ and $ anchor to the start and end of a line. Case-insensitive patterns
+# work but skip the literal prefilter, so prefer [Ee]rror to (?i)error.
+DEFAULT_SIGNATURES = {
+    "Unhandled exception": r"[Uu]nhandled [Ee]xception",
+    "Access denied": r"[Aa]ccess (?:is )?denied",
+    "Connection failure": r"[Cc]onnection (?:refused|reset|timed out)|[Uu]nable to connect",
+    "TLS/certificate error": r"(?:SSL|TLS) handshake failed|[Cc]ertificate (?:error|validation failed)",
+    "Name resolution failure": r"[Nn]o such host is known|[Nn]ame resolution failed",
+    "Unexpected termination": r"terminated unexpectedly",
+    "Out of memory": r"OutOfMemory|[Oo]ut of memory",
+    "Disk full": r"[Dd]isk (?:is )?full|[Nn]ot enough space on the disk",
+    "Fatal error": r"\bFATAL\b",
+}
+
+# Logs are scanned a block at a time, so each block is still in the CPU
+# cache while every signature's literals are searched for in it.
+BLOCK_SIZE = 1024 * 1024
+MIN_LITERAL_LENGTH = 3
+MAX_LINE_BYTES = 4096
+MAX_SAMPLE_CHARS = 300
+
+# Leading ISO 8601 timestamp of a log line, e.g. "2026-10-17 12:00:01.123"
+# or "[2026-10-17T12:00:01Z]".
+line_timestamp = re.compile(rb"\[?(\d{4}-\d{2}-\d{2})[ T](\d{2}:\d{2}:\d{2})")
+TIMESTAMP_SEARCH_BYTES = 64
+
+def is_log_name(file_name):
+    file_name = file_name.lower()
+    return any(fnmatch.fnmatch(file_name, pattern) for pattern in LOG_FILE_PATTERNS)
+
+def load_signatures(signatures_path):
+    try:
+        with open(signatures_path, 'r', encoding='utf-8') as file:
+            signatures = json.load(file)
+    except (OSError, ValueError) as e:
+        print(f"Error reading log signatures from {signatures_path}: {e}")
+        return None
+    if not isinstance(signatures, dict) or not all(isinstance(pattern, str) for pattern in signatures.values()):
+        print(f"Error reading log signatures from {signatures_path}: expected an object mapping names to regular expressions")
+        return None
+    return signatures
+
+def better_literals(best, candidate):
+    if candidate is None:
+        return best
+    if best is None:
+        return candidate
+    best_key = (min(map(len, best)), -len(best))
+    candidate_key = (min(map(len, candidate)), -len(candidate))
+    return candidate if candidate_key > best_key else best
+
+def required_literals(parsed):
+    # Case-sensitive byte strings of which every match contains at least
+    # one, or None if the pattern does not pin any down.
+    best = None
+    run = b""
+    for op, av in parsed:
+        if op is sre_parse.LITERAL and av != ord("\n"):
+            run += bytes((av,))
+            continue
+        best = better_literals(best, (run,) if run else None)
+        run = b""
+        if op is sre_parse.SUBPATTERN:
+            _, add_flags, _, body = av
+            if not add_flags & re.IGNORECASE:
+                best = better_literals(best, required_literals(body))
+        elif op is sre_parse.BRANCH:
+            alternatives = [required_literals(branch) for branch in av[1]]
+            if all(alternatives):
+                best = better_literals(best, tuple(sorted(set(chain.from_iterable(alternatives)))))
+        elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT) and av[0] >= 1:
+            best = better_literals(best, required_literals(av[2]))
+    return better_literals(best, (run,) if run else None)
+
+def signature_literals(pattern):
+    try:
+        parsed = sre_parse.parse(pattern.pattern, pattern.flags)
+    except Exception:
+        return None
+    if parsed.state.flags & re.IGNORECASE:
+        return None
+    literals = required_literals(parsed)
+    if literals is None or min(map(len, literals)) < MIN_LITERAL_LENGTH:
+        return None
+    return literals
+
+class SignatureSet:
+    # Python's re has no multi-pattern automaton, and an alternation of all
+    # signatures is retried branch by branch at every byte. Instead each
+    # signature is reduced to the literals any match must contain; those
+    # are found with bytes.find, and the full regex only runs on the few
+    # lines that contain one.
+    def __init__(self, signatures):
+        self.names = []
+        self.patterns = []
+        for name, pattern in signatures.items():
+            try:
+                compiled = re.compile(pattern.encode('utf-8'), re.MULTILINE)
+            except re.error as e:
+                print(f"Skipping log signature '{name}': {e}")
+                continue
+            self.names.append(name)
+            self.patterns.append(compiled)
+
+        self.literals = {}
+        self.unanchored = []
+        for index, pattern in enumerate(self.patterns):
+            literals = signature_literals(pattern)
+            if literals is None:
+                self.unanchored.append(index)
+                continue
+            for literal in literals:
+                self.literals.setdefault(literal, []).append(index)
+
+    def scan_block(self, buffer, start, end, hits):
+        candidates = {}
+        for literal, indexes in self.literals.items():
+            pos = buffer.find(literal, start, end)
+            while pos != -1:
+                line_start = max(start, buffer.rfind(b"\n", start, pos) + 1)
+                line_end = buffer.find(b"\n", pos, end)
+                if line_end == -1:
+                    line_end = end
+                for index in indexes:
+                    candidates.setdefault(index, {})[line_start] = line_end
+                pos = buffer.find(literal, line_end, end)
+
+        for index, lines in candidates.items():
+            pattern = self.patterns[index]
+            for line_start in sorted(lines):
+                line_end = lines[line_start]
+                if pattern.search(buffer, line_start, line_end):
+                    hits[index].add(buffer, line_start, line_end)
+
+        for index in self.unanchored:
+            pattern = self.patterns[index]
+            match = pattern.search(buffer, start, end)
+            while match:
+                # A match found over the whole block may run into the next
+                # line (\s, [^x]); only one within its first line counts.
+                line_start = max(start, buffer.rfind(b"\n", start, match.start()) + 1)
+                line_end = buffer.find(b"\n", match.start(), end)
+                if line_end == -1:
+                    line_end = end
+                if pattern.search(buffer, line_start, line_end):
+                    hits[index].add(buffer, line_start, line_end)
+                match = pattern.search(buffer, line_end + 1, end)
+
+@functools.lru_cache(maxsize=8)
+def compiled_signatures(signature_items):
+    # Batch workers compile each configured signature set once.
+    return SignatureSet(dict(signature_items))
+
+def signature_set(signatures):
+    return compiled_signatures(tuple(signatures.items()))
+
+class FileHits:
+    # Matching lines for one signature in one file. Only the first and last
+    # line are kept, however many lines match.
+    __slots__ = ('count', 'first_line', 'last_line')
+
+    def __init__(self):
+        self.count = 0
+        self.first_line = None
+        self.last_line = None
+
+    def add(self, buffer, line_start, line_end):
+        line = buffer[line_start:min(line_end, line_start + MAX_LINE_BYTES)]
+        if self.first_line is None:
+            self.first_line = line
+        self.last_line = line
+        self.count += 1
+
+def block_end(buffer, start, size):
+    end = start + BLOCK_SIZE
+    if end >= size:
+        return size
+    newline = buffer.find(b"\n", end)
+    return size if newline == -1 else newline + 1
+
+def scan_mapped(file, signatures, hits):
+    size = os.fstat(file.fileno()).st_size
+    if size == 0:
+        return 0
+    with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        if hasattr(buffer, "madvise") and hasattr(mmap, "MADV_SEQUENTIAL"):
+            buffer.madvise(mmap.MADV_SEQUENTIAL)
+        start = 0
+        while start < size:
+            end = block_end(buffer, start, size)
+            signatures.scan_block(buffer, start, end, hits)
+            start = end
+    return size
+
+def scan_stream(file, signatures, hits):
+    # Archive members cannot be mapped; they are read in blocks and split
+    # after the last complete line.
+    size = 0
+    carry = b""
+    for chunk in iter(lambda: file.read(BLOCK_SIZE), b""):
+        size += len(chunk)
+        buffer = carry + chunk
+        cut = buffer.rfind(b"\n") + 1
+        if cut == 0 and len(buffer) < MAX_LINE_BYTES * 16:
+            carry = buffer
+            continue
+        cut = cut or len(buffer)
+        signatures.scan_block(buffer, 0, cut, hits)
+        carry = buffer[cut:]
+    if carry:
+        signatures.scan_block(carry, 0, len(carry), hits)
+    return size
+
+def scan_log(source, signatures):
+    hits = [FileHits() for _ in signatures.patterns]
+    if callable(source):
+        with source() as file:
+            size = scan_stream(file, signatures, hits)
+    else:
+        with open(source, 'rb') as file:
+            size = scan_mapped(file, signatures, hits)
+    return hits, size
+
+def line_time(line):
+    match = line_timestamp.search(line, 0, TIMESTAMP_SEARCH_BYTES)
+    if match is None:
+        return None
+    return f"{match.group(1).decode()} {match.group(2).decode()}"
+
+def sample_text(line):
+    return line.decode('utf-8', errors='replace').strip()[:MAX_SAMPLE_CHARS]
+
+def scan_logs(logs, signatures):
+    signatures = signature_set(signatures)
+    totals = [{"count": 0, "first_seen": None, "last_seen": None, "files": [], "sample": None} for _ in signatures.names]
+    with span("scan logs") as scan_span:
+        bytes_read = 0
+        for name in sorted(logs):
+            try:
+                hits, size = scan_log(logs[name], signatures)
+            except Exception as e:
+                print(f"Error scanning log {name}: {e}")
+                continue
+            bytes_read += size
+            for total, file_hits in zip(totals, hits):
+                if not file_hits.count:
+                    continue
+                total["count"] += file_hits.count
+                total["files"].append(name)
+                first_seen = line_time(file_hits.first_line)
+                last_seen = line_time(file_hits.last_line)
+                # Rotated logs are separate files, so the earliest and latest
+                # lines can come from any of them.
+                earlier = first_seen is not None and (total["first_seen"] is None or first_seen < total["first_seen"])
+                if total["sample"] is None or earlier:
+                    total["sample"] = sample_text(file_hits.first_line)
+                if earlier:
+                    total["first_seen"] = first_seen
+                if last_seen is not None and (total["last_seen"] is None or last_seen > total["last_seen"]):
+                    total["last_seen"] = last_seen
+        log_hits = [dict(signature=name, **total) for name, total in zip(signatures.names, totals) if total["count"]]
+        scan_span.set(bytes_read=bytes_read, records=len(log_hits))
+    log_hits.sort(key=lambda hit: -hit["count"])
+    return log_hits
+
+def collect_archive_logs(archive, logs):
+    for info in archive.infolist():
+        if not info.is_dir() and is_log_name(posixpath.basename(info.filename)):
+            logs.setdefault(info.filename, functools.partial(archive.open, info))
+    return logs
+
+def collect_logs(bundle_path, stack, max_depth=None, exclude=None):
+    # Log files anywhere in the bundle, keyed by their path inside it. Only
+    # the bundle's own archives are searched, not archives nested in them.
+    exclude = exclude or []
+    logs = {}
+    if os.path.isfile(bundle_path):
+        return collect_archive_logs(stack.enter_context(zipfile.ZipFile(bundle_path)), logs)
+
+    archive_paths = []
+    level = [bundle_path]
+    depth = 0
+    while level:
+        next_level = []
+        for folder_path in level:
+            for name, path, is_dir in list_directory(folder_path):
+                rel_path = os.path.relpath(path, bundle_path)
+                if is_excluded(name, rel_path, exclude):
+                    continue
+                if is_dir:
+                    next_level.append(path)
+                elif is_log_name(name):
+                    logs[rel_path] = path
+                elif is_archive_name(name):
+                    archive_paths.append(path)
+        depth += 1
+        if max_depth is not None and depth > max_depth:
+            break
+        level = sorted(next_level)
+
+    for archive_path in archive_paths:
+        try:
+            collect_archive_logs(stack.enter_context(zipfile.ZipFile(archive_path)), logs)
+        except zipfile.BadZipFile as e:
+            print(f"Skipping {archive_path}: {e}")
+    return logs
+
+@contextmanager
+def open_logs(bundle_path, scan_options=None, signatures=None):
+    # Yields None when log scanning is off, so callers can pass the result
+    # straight through.
+    if signatures is None:
+        yield None
+        return
+    with ExitStack() as stack:
+        with span("collect logs") as collect_span:
+            logs = collect_logs(bundle_path, stack, **(scan_options or {}))
+            collect_span.set(records=len(logs))
+        yield logs
+
+def log_identity(source):
+    # Cheap stand-in for the content hash: re-hashing gigabytes of logs
+    # would cost as much as scanning them again.
+    if callable(source):
+        info = source.args[0]
+        return f"{info.CRC}:{info.file_size}"
+    stat = os.stat(source)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+def logs_key(logs, signatures):
+    digest = hashlib.sha256(json.dumps(signatures, sort_keys=True).encode('utf-8'))
+    for name in sorted(logs):
+        try:
+            identity = log_identity(logs[name])
+        except OSError:
+            identity = "missing"
+        digest.update(f"\0{name}\0{identity}".encode('utf-8'))
+    return digest.hexdigest()
+
+def get_log_hits_html(log_hits):
+    rows = ['''
+        <hr>
+        <h2 style="margin-bottom: -5px;">Log Signatures</h2>
+        <div class="connection_results">
+        <table class="connection_results">
+            <tr>
+                <th>Signature</th>
+                <th>Lines</th>
+                <th>First Seen</th>
+                <th>Last Seen</th>
+                <th>Files</th>
+                <th>First Match</th>
+            </tr>
+    ''']
+    if not log_hits:
+        rows.append('''
+            <tr>
+                <td colspan="6">No signatures matched in the bundle's logs</td>
+            </tr>
+        ''')
+    for idx, hit in enumerate(log_hits):
+        rows.append(f'''
+            <tr style="background-color: {'#d9d9d9' if idx % 2 == 0 else '#ffffff'};">
+                <td>{hit.get('signature')}</td>
+                <td>{hit.get('count')}</td>
+                <td>{hit.get('first_seen') or 'N/A'}</td>
+                <td>{hit.get('last_seen') or 'N/A'}</td>
+                <td>{html.escape(", ".join(hit.get('files', ())))}</td>
+                <td>{html.escape(hit.get('sample') or '')}</td>
+            </tr>
+        ''')
+    rows.append('''
+        </table>
+        </div>
+''')
+    return "".join(rows)
@@ -1,15 +1,15 @@
-import subprocess
 import sys
 import os
-import json
-import shutil
 import argparse
 
-from info_to_json import slice_json
-from testconnection_to_json import convert_test_connection_to_json
-from create_html import generate_html_from_json
+from profiling import span, start_profiling, stop_profiling, write_profile
+from defaults import SNAPSHOT_FORMATS, DEFAULT_CACHE_MAX_BYTES
+
+# Analysis modules are imported inside main() once the mode is known, so
+# --help and argument errors return without loading the parsers.
 
 def open_directory(path):
+    import subprocess
     if sys.platform == 'win32':
         os.startfile(path)
     elif sys.platform == 'darwin':
@@ -17,107 +17,185 @@ def open_directory(path):
     else:
         subprocess.Popen(['xdg-open', path])
 
+def run_directory_picker(debug, max_depth, exclude):
+    import subprocess
+    python_executable = sys.executable
+    script_path = os.path.join(os.path.dirname(__file__), "select_directory.py")
+    select_args = (["--debug"] if debug else []) + (["--max-depth", str(max_depth)] if max_depth is not None else [])
+    for pattern in exclude:
+        select_args += ["--exclude", pattern]
+    subprocess.run([python_executable, script_path] + select_args)
+
 def main():
     parser = argparse.ArgumentParser(description="Process some files.")
     parser.add_argument('--debug', action='store_true', help="Enable debug output")
+    parser.add_argument('--input-root', help="Process every bundle under this directory without prompting")
+    parser.add_argument('--folder', help="Analyze this bundle folder or .zip in-process instead of opening the folder picker")
+    parser.add_argument('--output-dir', help="Directory for --folder, batch and watch reports (default: results/)")
+    parser.add_argument('--workers', type=int, default=None, help="Number of worker processes for batch mode")
+    parser.add_argument('--serve', action='store_true', help="Run a local HTTP service that analyzes POSTed bundles")
+    parser.add_argument('--host', default="127.0.0.1", help="Serve mode: address to bind")
+    parser.add_argument('--port', type=int, default=8765, help="Serve mode: port to bind")
+    parser.add_argument('--max-concurrency', type=int, default=4, help="Serve mode: analyses allowed to run at once")
+    parser.add_argument('--watch', help="Keep running and generate a report for every bundle dropped into this directory")
+    parser.add_argument('--settle-seconds', type=float, default=2.0, help="Watch mode: how long a bundle must stay unchanged before it is processed")
+    parser.add_argument('--poll-interval', type=float, default=1.0, help="Watch mode: rescan interval when inotify is unavailable")
+    parser.add_argument('--process-existing', action='store_true', help="Watch mode: also process bundles already in the directory at startup")
+    parser.add_argument('--max-depth', type=int, default=None, help="Do not look for bundle files more than this many folders deep")
+    parser.add_argument('--exclude', action='append', default=[], help="Skip files and folders matching this glob (repeatable)")
+    parser.add_argument('--fleet-report', action='store_true', help="Also write an aggregated Fleet_Summary.html in batch mode")
+    parser.add_argument('--connectivity-report', action='store_true', help="Also write a Connectivity_Summary.html ranking the most-failing test connection URLs across the batch")
+    parser.add_argument('--cache-dir', help="Reuse parsed snapshots and reports cached in this directory")
+    parser.add_argument('--cache-max-mb', type=int, default=None, help=f"Maximum size of the cache directory in MB (default: {DEFAULT_CACHE_MAX_BYTES // (1024 * 1024)})")
+    parser.add_argument('--output-format', choices=["html", *SNAPSHOT_FORMATS], default="html", help="Write HTML reports, or one NDJSON/CSV snapshot record per endpoint without rendering HTML")
+    parser.add_argument('--site', action='store_true', help="Write slim HTML pages that share one stylesheet in assets/ instead of self-contained reports")
+    parser.add_argument('--gzip', action='store_true', help="Also write a precompressed .gz copy of every report and site asset")
+    parser.add_argument('--dashboard', action='store_true', help="Keep a paged, filterable Dashboard.html index of the reports in the output directory up to date")
+    parser.add_argument('--content-names', action='store_true', help="Name HTML reports after a digest of the bundle and baseline, so re-analyzing an identical bundle reuses its existing report")
+    parser.add_argument('--scan-logs', action='store_true', help="Also scan the bundle's *.log files for known error signatures and report the matches")
+    parser.add_argument('--log-signatures', help="JSON file mapping signature names to regular expressions for --scan-logs (implies --scan-logs)")
+    parser.add_argument('--history-db', help="Record every analyzed snapshot in this SQLite database; reports then include what changed since the host's previous snapshot")
+    parser.add_argument('--profile', action='store_true', help="Time each stage and write a Chrome trace and summary table next to the reports")
     args = parser.parse_args()
 
     debug = args.debug
-
-    python_executable = sys.executable
-    script_path = os.path.join(os.path.dirname(__file__), "select_directory.py")
-    subprocess.run([python_executable, script_path] + (["--debug"] if debug else []))
+    layout = "site" if args.site else "single"
+    cache_max_bytes = args.cache_max_mb * 1024 * 1024 if args.cache_max_mb is not None else None
+    scan_options = {"max_depth": args.max_depth, "exclude": args.exclude}
+    if args.log_signatures:
+        from log_scan import load_signatures
+        log_signatures = load_signatures(args.log_signatures)
+        if log_signatures is None:
+            return 1
+    elif args.scan_logs:
+        from log_scan import DEFAULT_SIGNATURES
+        log_signatures = DEFAULT_SIGNATURES
+    else:
+        log_signatures = None
+    if log_signatures is not None and not (args.folder or args.input_root or args.watch):
+        # The folder picker only copies the six artifacts into temp/, so
+        # there would be no logs to scan.
+        print("Error: --scan-logs and --log-signatures need --folder, --input-root or --watch.")
+        return 1
+
+    # Options the serve and watch modes have no use for are rejected rather
+    # than silently ignored.
+    if args.serve:
+        unsupported = ["output_dir", "cache_dir", "cache_max_mb", "max_depth", "exclude", "output_format", "site", "gzip", "content_names", "history_db", "dashboard", "fleet_report", "connectivity_report", "profile"]
+    elif args.watch:
+        unsupported = ["fleet_report", "connectivity_report", "profile"]
+    else:
+        unsupported = []
+    for name in unsupported:
+        if getattr(args, name) != parser.get_default(name):
+            parser.error(f"--{name.replace('_', '-')} is not supported with {'--serve' if args.serve else '--watch'}")
+
+    if args.serve:
+        from server import run_server
+        root_path = os.path.dirname(os.path.abspath(__file__))
+        version_info_path = os.path.join(root_path, "version_info.json")
+        run_server(args.host, args.port, version_info_path, args.max_concurrency, workers=args.workers)
+        return 0
+
+    if args.watch:
+        from watch import run_watch
+        root_path = os.path.dirname(os.path.abspath(__file__))
+        version_info_path = os.path.join(root_path, "version_info.json")
+        output_dir = args.output_dir or os.path.join(root_path, "results")
+        run_watch(args.watch, output_dir, version_info_path, workers=args.workers, settle_seconds=args.settle_seconds, poll_interval=args.poll_interval, process_existing=args.process_existing, debug=debug, cache_dir=args.cache_dir, cache_max_bytes=cache_max_bytes, scan_options=scan_options, dashboard=args.dashboard, log_signatures=log_signatures, output_format=args.output_format, history_db=args.history_db, content_names=args.content_names, layout=layout, gzip_copy=args.gzip)
+        return 0
+
+    if args.input_root:
+        from batch import run_batch, is_failure
+        root_path = os.path.dirname(os.path.abspath(__file__))
+        version_info_path = os.path.join(root_path, "version_info.json")
+        output_dir = args.output_dir or os.path.join(root_path, "results")
+        results = run_batch(args.input_root, output_dir, version_info_path, workers=args.workers, debug=debug, cache_dir=args.cache_dir, cache_max_bytes=cache_max_bytes, fleet_report=args.fleet_report, scan_options=scan_options, profile=args.profile, output_format=args.output_format, history_db=args.history_db, content_names=args.content_names, layout=layout, gzip_copy=args.gzip, dashboard=args.dashboard, connectivity_report=args.connectivity_report, log_signatures=log_signatures)
+        return 1 if any(is_failure(r) for r in results) else 0
+
+    if args.folder and not os.path.exists(args.folder):
+        print(f"Error: {args.folder} does not exist.")
+        return 1
+
+    if args.profile:
+        start_profiling()
 
     root_path = os.path.dirname(os.path.abspath(__file__))
-    info_txt_path = os.path.join(root_path, "temp", "Info.txt")
-    info_json_path = os.path.join(root_path, "temp", "json", "Info.json")
-    test_connections_path = os.path.join(root_path, "temp", "TestConnections.txt")
-    test_connection_output = os.path.join(root_path, "temp", "json", "TestConnections.json")
-    machine_info_path = os.path.join(root_path, "temp", "machine_info.json")
-    system_info_path = os.path.join(root_path, "temp", "SystemInfo.json")
-    system_info_output = os.path.join(root_path, "temp", "json", "SystemInfo.json")
-    services_info_path = os.path.join(root_path, "temp", "Services.json")
-    services_info_output = os.path.join(root_path, "temp", "json", "Services.json")
-    runningprocesses_info_path = os.path.join(root_path, "temp", "RunningProcesses.json")
-    runningprocesses_info_output = os.path.join(root_path, "temp", "json", "RunningProcesses.json")
+    logs_dir = os.path.join(root_path, "temp")
     version_info_path = os.path.join(root_path, "version_info.json")
 
-    logs_dir = os.path.join(root_path, "temp")
-    analyzer_dir = os.path.join(logs_dir, "json")
-    os.makedirs(analyzer_dir, exist_ok=True)
-
-    info_json_data = slice_json(info_txt_path)
-    if info_json_data is not None:
-        os.makedirs(os.path.dirname(info_json_path), exist_ok=True)
-        with open(info_json_path, "w") as a_info:
-            json.dump(info_json_data, a_info, indent=4)
-        if debug:
-            print(f"Parsed {info_txt_path} and successfully created {info_json_path}")
+    if args.folder:
+        # The bundle is read where it lies; nothing is copied into temp/.
+        bundle_path = args.folder
+        output_dir = args.output_dir or "results"
     else:
-        print("Failed to analyze 'Info.txt.'")
+        with span("select and copy files"):
+            run_directory_picker(debug, args.max_depth, args.exclude)
+        bundle_path = logs_dir
+        output_dir = "results"
 
-    test_values = convert_test_connection_to_json(test_connections_path, test_connection_output)
-    if test_values is not None:
+    if os.path.exists(version_info_path):
         if debug:
-            print(f"Parsed {test_connections_path} and successfully created {test_connection_output}")
+            print(f"Version info file found at {version_info_path}")
     else:
-        print("Failed to analyze 'TestConnections.txt'")
+        print(f"Version info file not found at {version_info_path}")
 
-    if os.path.exists(system_info_path):
-        shutil.copy(system_info_path, system_info_output)
-        if debug:
-            print(f"Copied {system_info_path} to {system_info_output}")
-    else:
-        print(f"SystemInfo.json not found at {system_info_path}")
+    from pipeline import analyze_bundle, parse_bundle, report_digest, snapshot_host_name, clean_workspace
 
-    if os.path.exists(services_info_path):
-        shutil.copy(services_info_path, services_info_output)
-        if debug:
-            print(f"Copied {services_info_path} to {services_info_output}")
+    debug_dump_dir = os.path.join(logs_dir, "json") if debug else None
+    scan_options = scan_options if args.folder else None
+    if args.cache_dir:
+        from parse_cache import ParseCache
+        cache = ParseCache(args.cache_dir, cache_max_bytes)
     else:
-        print(f"Services.json not found at {services_info_path}")
-
-    if os.path.exists(runningprocesses_info_path):
-        shutil.copy(runningprocesses_info_path, runningprocesses_info_output)
-        if debug:
-            print(f"Copied {runningprocesses_info_path} to {runningprocesses_info_output}")
+        cache = None
+    if args.history_db:
+        from history import HistoryStore
+        history = HistoryStore(args.history_db)
     else:
-        print(f"RunningProcesses.json not found at {runningprocesses_info_path}")
-
-    if os.path.exists(version_info_path):
-        if debug:
-            print(f"Version info file found at {version_info_path}")
+        history = None
+    if args.output_format == "html":
+        from create_html import write_html_report, write_site_assets
+        snapshot, html_content = analyze_bundle(bundle_path, version_info_path, debug_dump_dir, cache, scan_options, history, layout, log_signatures)
+        host_name = snapshot_host_name(snapshot)
+        html_output_path = os.path.join(output_dir, "Analyzer_Results.html")
+        if args.site:
+            write_site_assets(output_dir, args.gzip)
+        content_key = report_digest(snapshot, version_info_path, layout) if args.content_names else None
+        output_path = write_html_report(html_content, host_name, html_output_path, content_key, args.gzip)
+        if output_path is None:
+            return 1
+        print(f"HTML report generated at {output_path} for host {host_name}")
+        if args.dashboard:
+            from dashboard import Dashboard, dashboard_row
+            from version_baseline import load_baseline
+            board = Dashboard(output_dir)
+            board.add(dashboard_row(snapshot, output_path, output_dir, load_baseline(version_info_path)), flush=True)
+            print(f"Dashboard updated at {board.index_path}")
     else:
-        print(f"Version info file not found at {version_info_path}")
+        from snapshot_export import SnapshotOutput, snapshot_record
+        snapshot = parse_bundle(bundle_path, debug_dump_dir, cache, scan_options, log_signatures)
+        host_name = snapshot_host_name(snapshot)
+        if history is not None:
+            history.record(snapshot, bundle_path)
+        # Appended, so repeated interactive runs build up one ingestible file.
+        with SnapshotOutput(args.output_format, output_dir) as snapshots:
+            snapshots.write(snapshot_record(snapshot, version_info_path))
+        output_path = snapshots.path
+        print(f"Snapshot record written to {output_path} for host {host_name}")
+    if cache is not None:
+        cache.evict()
+        if debug:
+            print(f"Cache stats: {cache.stats}")
+    if history is not None:
+        history.close()
+
+    if not args.folder:
+        open_directory(os.path.dirname(output_path))
+        clean_workspace(logs_dir, debug)
 
-    html_output_path = os.path.join("results", "Analyzer_Results.html")
-    host_name, html_path_with_name = generate_html_from_json(info_json_path, html_output_path, version_info_path)
-    print(f"HTML report generated at {html_path_with_name} for host {host_name}")
-
-    open_directory(os.path.dirname(html_path_with_name))
-
-    files_to_delete = [
-        info_txt_path,
-        info_json_path,
-        test_connections_path,
-        test_connection_output,
-        machine_info_path,
-        system_info_path,
-        system_info_output,
-        services_info_path,
-        services_info_output,
-        runningprocesses_info_path,
-        runningprocesses_info_output
-    ]
-
-    for file_path in files_to_delete:
-        try:
-            os.remove(file_path)
-            if debug:
-                print(f"Deleted {file_path}")
-        except FileNotFoundError:
-            if debug:
-                print(f"{file_path} not found, skipping deletion.")
+    if args.profile:
+        write_profile(stop_profiling(host=host_name), os.path.dirname(output_path))
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
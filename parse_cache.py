@@ -0,0 +1,168 @@
+import os
+import zlib
+import json
+import hashlib
+import tempfile
+
+from create_html import script_version
+from snapshot_model import EndpointSnapshot
+from defaults import DEFAULT_CACHE_MAX_BYTES
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Scanning the cache directory costs one stat per entry, so the size bound
+# is enforced every few writes rather than on each one.
+EVICT_INTERVAL = 16
+
+# Bump when the snapshot layout changes so stale entries stop matching.
+CACHE_FORMAT = 4
+
+def hash_source(source):
+    digest = hashlib.sha256()
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        digest.update(source)
+        return digest.hexdigest()
+
+    file = source() if callable(source) else open(source, 'rb')
+    with file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def hash_file(file_path):
+    try:
+        return hash_source(file_path)
+    except FileNotFoundError:
+        return "missing"
+
+class ParseCache:
+    def __init__(self, cache_dir, max_bytes=None):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes if max_bytes is not None else DEFAULT_CACHE_MAX_BYTES
+        self.stats = {
+            "parse_hits": 0,
+            "parse_misses": 0,
+            "render_hits": 0,
+            "render_misses": 0,
+            "evictions": 0
+        }
+        # Start one store short of the interval so the first store checks
+        # the size bound; a single-bundle run stores too little to reach it.
+        self.stores_since_evict = EVICT_INTERVAL - 1
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def snapshot_key(self, sources, logs_key=None):
+        digest = hashlib.sha256(f"snapshot:{CACHE_FORMAT}:{script_version}".encode())
+        for name in sorted(sources):
+            digest.update(f"\0{name}\0{hash_source(sources[name])}".encode())
+        if logs_key is not None:
+            digest.update(f"\0logs\0{logs_key}".encode())
+        return digest.hexdigest()
+
+    def report_key(self, snapshot_key, version_info_path, layout="single"):
+        digest = hashlib.sha256(f"report:{CACHE_FORMAT}:{script_version}:{layout}".encode())
+        digest.update(f"\0{snapshot_key}\0{hash_file(version_info_path)}".encode())
+        return digest.hexdigest()
+
+    def entry_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + ".bin")
+
+    def load(self, key):
+        entry_path = self.entry_path(key)
+        try:
+            with open(entry_path, 'rb') as file:
+                # Entries are plain JSON, never pickles: the cache directory
+                # may be shared, and loading must not run anyone's code.
+                value = json.loads(zlib.decompress(file.read()))
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Discarding unreadable cache entry {entry_path}: {e}")
+            self.remove(entry_path)
+            return None
+
+        # Refreshing the mtime is what makes eviction least-recently-used.
+        try:
+            os.utime(entry_path)
+        except OSError:
+            pass
+        return value
+
+    def store(self, key, value):
+        entry_path = self.entry_path(key)
+        entry_dir = os.path.dirname(entry_path)
+        os.makedirs(entry_dir, exist_ok=True)
+
+        payload = zlib.compress(json.dumps(value, separators=(',', ':')).encode('utf-8'))
+        fd, tmp_path = tempfile.mkstemp(dir=entry_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                file.write(payload)
+            # Readers in other processes see either the old entry or the new
+            # one, never a partial write.
+            os.replace(tmp_path, entry_path)
+        except Exception:
+            self.remove(tmp_path)
+            raise
+
+        self.stores_since_evict += 1
+        if self.stores_since_evict >= EVICT_INTERVAL:
+            self.evict()
+
+    def remove(self, file_path):
+        try:
+            os.remove(file_path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def entries(self):
+        entries = []
+        for bucket in os.scandir(self.cache_dir):
+            if not bucket.is_dir():
+                continue
+            for entry in os.scandir(bucket.path):
+                if not entry.name.endswith(".bin"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def evict(self):
+        self.stores_since_evict = 0
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            return
+
+        entries.sort()
+        for _, size, entry_path in entries:
+            if total <= self.max_bytes:
+                break
+            # Another process may have evicted the same entry already.
+            if self.remove(entry_path):
+                self.stats["evictions"] += 1
+            total -= size
+
+    def get_snapshot(self, key, parse):
+        entry = self.load(key)
+        if isinstance(entry, dict) and isinstance(entry.get("snapshot"), dict):
+            self.stats["parse_hits"] += 1
+            return EndpointSnapshot(entry["snapshot"])
+        self.stats["parse_misses"] += 1
+        snapshot = parse()
+        self.store(key, {"snapshot": snapshot.to_dict()})
+        return snapshot
+
+    def get_report(self, key, render):
+        entry = self.load(key)
+        if isinstance(entry, dict) and isinstance(entry.get("report"), str):
+            self.stats["render_hits"] += 1
+            return entry["report"]
+        self.stats["render_misses"] += 1
+        html_content = render()
+        self.store(key, {"report": html_content})
+        return html_content
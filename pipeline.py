@@ -0,0 +1,213 @@
+import io
+import os
+import json
+import time
+import hashlib
+from contextlib import ExitStack, contextmanager
+
+from profiling import span, NULL_SPAN
+from select_directory import ARTIFACT_NAMES, collect_sources, source_mtime
+from info_to_json import parse_info_file
+from testconnection_to_json import read_test_connections
+from create_html import script_version, stream_services, stream_processes, get_services, get_processes, get_host_name, render_report, get_run_timestamp, RUN_TIMESTAMP_PLACEHOLDER
+from parse_cache import hash_file
+from snapshot_model import EndpointSnapshot
+from log_scan import open_logs, scan_logs, logs_key, get_log_hits_html
+
+@contextmanager
+def open_bundle(bundle_path, scan_options=None):
+    with ExitStack() as stack:
+        with span("collect") as collect_span:
+            sources = collect_sources(bundle_path, stack, **(scan_options or {}))
+            collect_span.set(records=len(sources))
+        yield sources
+
+def open_source(source):
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return io.TextIOWrapper(io.BytesIO(source), encoding='utf-8-sig', errors='replace')
+    if callable(source):
+        return io.TextIOWrapper(source(), encoding='utf-8-sig', errors='replace')
+    return open(source, 'r', encoding='utf-8-sig', errors='replace')
+
+def read_source(source, source_span=NULL_SPAN):
+    with open_source(source) as file:
+        content = file.read()
+        source_span.set(bytes_read=file.buffer.tell())
+        return content
+
+def parse_json_source(sources, name, default):
+    if name not in sources:
+        print(f"{name} not found in bundle")
+        return default
+    try:
+        with span(f"parse {name}") as parse_span:
+            return json.loads(read_source(sources[name], parse_span))
+    except Exception as e:
+        print(f"Error reading '{name}': {e}")
+        return default
+
+def parse_streamed_source(sources, name, extractor, default):
+    if name not in sources:
+        print(f"{name} not found in bundle")
+        return default
+    try:
+        with span(f"parse {name}") as parse_span, open_source(sources[name]) as file:
+            result = extractor(file)
+            parse_span.set(bytes_read=file.buffer.tell())
+            return result
+    except Exception as e:
+        print(f"Error reading '{name}': {e}")
+        return default
+
+def sources_collected_at(sources):
+    # Info.txt is written when the bundle is collected; uploads without a
+    # timestamp fall back to the time they were analyzed.
+    collected_at = source_mtime(sources["Info.txt"]) if "Info.txt" in sources else None
+    return collected_at if collected_at is not None else time.time()
+
+def parse_source_dicts(sources):
+    failed_steps = []
+
+    info = None
+    if "Info.txt" in sources:
+        try:
+            with span("parse Info.txt") as parse_span, open_source(sources["Info.txt"]) as info_file:
+                info = parse_info_file(info_file)
+                parse_span.set(bytes_read=info_file.buffer.tell())
+                parse_span.set(records=len(info) + len(info.get("AgentInfo", {}).get("plugins", [])))
+        except json.JSONDecodeError as e:
+            print(f"Error parsing JSON content in Info.txt: {e}")
+        except Exception as e:
+            print(f"Error processing Info.txt: {e}")
+    else:
+        print("Info.txt not found in bundle")
+    if info is None:
+        print("Failed to analyze 'Info.txt.'")
+        failed_steps.append("Info.txt")
+        info = {}
+
+    test_connections = None
+    if "TestConnections.txt" in sources:
+        try:
+            with span("parse TestConnections.txt") as parse_span, open_source(sources["TestConnections.txt"]) as connection_file:
+                test_connections = read_test_connections(connection_file)
+                parse_span.set(bytes_read=connection_file.buffer.tell(), records=len(test_connections))
+        except Exception as e:
+            print(f"An error occurred: {e}")
+    if test_connections is None:
+        print("Failed to analyze 'TestConnections.txt'")
+        failed_steps.append("TestConnections.txt")
+        test_connections = {}
+
+    return {
+        "info": info,
+        "test_connections": test_connections,
+        "machine_info": parse_json_source(sources, "machine_info.json", {}),
+        "system_info": parse_json_source(sources, "SystemInfo.json", {}),
+        "services": parse_streamed_source(sources, "Services.json", stream_services, get_services([])),
+        "processes": parse_streamed_source(sources, "RunningProcesses.json", stream_processes, get_processes([])),
+        "failed_steps": failed_steps,
+        "collected_at": sources_collected_at(sources)
+    }
+
+def parse_sources(sources, logs=None, log_signatures=None):
+    snapshot_dict = parse_source_dicts(sources)
+    if logs is not None:
+        snapshot_dict["log_hits"] = scan_logs(logs, log_signatures)
+    return EndpointSnapshot(snapshot_dict)
+
+def render_snapshot(snapshot, version_info_path, history_html="", layout="single", run_timestamp=None):
+    # Snapshots parsed without log scanning have no log_hits and no section.
+    log_hits = snapshot.get('log_hits')
+    log_hits_html = get_log_hits_html(log_hits) if log_hits is not None else ""
+    with span("render"):
+        return render_report(
+            snapshot.info,
+            snapshot.machine_info,
+            snapshot.test_connections,
+            snapshot.system_info,
+            snapshot.services,
+            snapshot.processes,
+            version_info_path,
+            history_html,
+            layout,
+            log_hits_html,
+            run_timestamp
+        )
+
+def dump_snapshot(snapshot, dump_dir, debug=False):
+    os.makedirs(dump_dir, exist_ok=True)
+    output_path = os.path.join(dump_dir, "snapshot.json")
+    with span("dump snapshot") as dump_span, open(output_path, "w") as outfile:
+        json.dump(snapshot.to_dict(), outfile, indent=4)
+        dump_span.set(bytes_written=outfile.tell())
+    if debug:
+        print(f"Wrote {output_path}")
+    return output_path
+
+def load_snapshot(sources, cache=None, logs=None, log_signatures=None):
+    if cache is None:
+        return None, parse_sources(sources, logs, log_signatures)
+    with span("hash sources"):
+        snapshot_key = cache.snapshot_key(sources, logs_key(logs, log_signatures) if logs is not None else None)
+    snapshot = cache.get_snapshot(snapshot_key, lambda: parse_sources(sources, logs, log_signatures))
+    # The key covers the artifacts' content only, so the collection time
+    # always comes from the bundle at hand, not from its first parse.
+    snapshot.collected_at = sources_collected_at(sources)
+    return snapshot_key, snapshot
+
+def record_history(snapshot, history, bundle=None):
+    with span("record history"):
+        return history.record_with_diff_html(snapshot, bundle)
+
+def analyze(sources, version_info_path, debug_dump_dir=None, cache=None, history=None, bundle=None, layout="single", logs=None, log_signatures=None):
+    snapshot_key, snapshot = load_snapshot(sources, cache, logs, log_signatures)
+    history_html = record_history(snapshot, history, bundle) if history is not None else ""
+    if history_html:
+        # The diff depends on what was recorded before, not only on the
+        # bundle, so this report cannot come from the report cache.
+        html_content = render_snapshot(snapshot, version_info_path, history_html, layout)
+    elif cache is None:
+        html_content = render_snapshot(snapshot, version_info_path, layout=layout)
+    else:
+        report_key = cache.report_key(snapshot_key, version_info_path, layout)
+        html_content = cache.get_report(report_key, lambda: render_snapshot(snapshot, version_info_path, layout=layout, run_timestamp=RUN_TIMESTAMP_PLACEHOLDER))
+        html_content = html_content.replace(RUN_TIMESTAMP_PLACEHOLDER, get_run_timestamp(), 1)
+
+    if debug_dump_dir is not None:
+        dump_snapshot(snapshot, debug_dump_dir, debug=True)
+    return snapshot, html_content
+
+def analyze_bundle(bundle_path, version_info_path, debug_dump_dir=None, cache=None, scan_options=None, history=None, layout="single", log_signatures=None):
+    with open_bundle(bundle_path, scan_options) as sources, open_logs(bundle_path, scan_options, log_signatures) as logs:
+        return analyze(sources, version_info_path, debug_dump_dir, cache, history, bundle_path, layout, logs, log_signatures)
+
+def parse_bundle(bundle_path, debug_dump_dir=None, cache=None, scan_options=None, log_signatures=None):
+    # Snapshot only, for outputs that never render the HTML report.
+    with open_bundle(bundle_path, scan_options) as sources, open_logs(bundle_path, scan_options, log_signatures) as logs:
+        _, snapshot = load_snapshot(sources, cache, logs, log_signatures)
+    if debug_dump_dir is not None:
+        dump_snapshot(snapshot, debug_dump_dir, debug=True)
+    return snapshot
+
+def report_digest(snapshot, version_info_path, layout="single"):
+    # Names a report by what it was rendered from rather than by its bytes,
+    # which include the run time. The collection time is not shown in the
+    # report, so re-collecting an identical bundle reuses its report.
+    digest = hashlib.sha256(f"report:{script_version}:{layout}\0{hash_file(version_info_path)}\0".encode())
+    digest.update(json.dumps(snapshot.content_dict(), sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()
+
+def snapshot_host_name(snapshot):
+    return get_host_name(snapshot.info)
+
+def clean_workspace(workspace, debug=False):
+    for filename in ARTIFACT_NAMES:
+        file_path = os.path.join(workspace, filename)
+        try:
+            os.remove(file_path)
+            if debug:
+                print(f"Deleted {file_path}")
+        except FileNotFoundError:
+            if debug:
+                print(f"{file_path} not found, skipping deletion.")
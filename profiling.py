@@ -0,0 +1,130 @@
+import os
+import json
+import time
+import threading
+from collections import defaultdict
+
+SUMMARY_COUNTERS = ("bytes_read", "bytes_written", "records")
+MAX_LISTED_BUNDLES = 10
+
+class NullSpan:
+    # Returned when profiling is off, so instrumented code pays for one
+    # global lookup and nothing else.
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **args):
+        pass
+
+NULL_SPAN = NullSpan()
+
+class Span:
+    __slots__ = ("profiler", "name", "args", "start")
+
+    def __init__(self, profiler, name, args):
+        self.profiler = profiler
+        self.name = name
+        self.args = args
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter_ns()
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        self.profiler.events.append({
+            "name": self.name,
+            "ph": "X",
+            "ts": self.start / 1000,
+            "dur": (end - self.start) / 1000,
+            "pid": self.profiler.pid,
+            "tid": threading.get_ident(),
+            "args": self.args,
+        })
+        return False
+
+    def set(self, **args):
+        self.args.update(args)
+
+class Profiler:
+    def __init__(self):
+        self.pid = os.getpid()
+        self.events = []
+
+    def span(self, name, **args):
+        return Span(self, name, args)
+
+active_profiler = None
+
+def span(name, **args):
+    if active_profiler is None:
+        return NULL_SPAN
+    return active_profiler.span(name, **args)
+
+def start_profiling():
+    global active_profiler
+    active_profiler = Profiler()
+    return active_profiler
+
+def stop_profiling(**tags):
+    # Tags (e.g. the host name, which is only known once Info.txt has been
+    # parsed) are applied to every span recorded since start_profiling.
+    global active_profiler
+    profiler, active_profiler = active_profiler, None
+    if profiler is None:
+        return []
+    if tags:
+        for event in profiler.events:
+            event["args"].update(tags)
+    return profiler.events
+
+def summarize(events):
+    stages = defaultdict(lambda: {"count": 0, "total": 0.0, "max": 0.0, "bytes_read": 0, "bytes_written": 0, "records": 0})
+    for event in events:
+        stage = stages[event["name"]]
+        stage["count"] += 1
+        stage["total"] += event["dur"]
+        stage["max"] = max(stage["max"], event["dur"])
+        for counter in SUMMARY_COUNTERS:
+            stage[counter] += event["args"].get(counter, 0) or 0
+
+    lines = [f"{'Stage':<34} {'Count':>6} {'Total ms':>11} {'Mean ms':>10} {'Max ms':>10} {'Read KB':>11} {'Written KB':>11} {'Records':>10}"]
+    for name, stage in sorted(stages.items(), key=lambda item: item[1]["total"], reverse=True):
+        lines.append(
+            f"{name:<34} {stage['count']:>6} {stage['total'] / 1000:>11.2f} {stage['total'] / stage['count'] / 1000:>10.2f} "
+            f"{stage['max'] / 1000:>10.2f} {stage['bytes_read'] / 1024:>11.1f} {stage['bytes_written'] / 1024:>11.1f} {stage['records']:>10}"
+        )
+
+    bundles = [event for event in events if event["name"] == "bundle"]
+    if len(bundles) > 1:
+        lines.append("")
+        lines.append(f"Slowest bundles (of {len(bundles)}):")
+        for event in sorted(bundles, key=lambda e: e["dur"], reverse=True)[:MAX_LISTED_BUNDLES]:
+            lines.append(f"  {event['dur'] / 1000:>10.2f} ms  {event['args'].get('host', 'N/A')}  {event['args'].get('bundle', '')}")
+    return "\n".join(lines)
+
+def write_profile(events, output_dir):
+    os.makedirs(output_dir, exist_ok=True)
+    trace_path = os.path.join(output_dir, "profile_trace.json")
+    summary_path = os.path.join(output_dir, "profile_summary.txt")
+    summary = summarize(events)
+
+    try:
+        with open(trace_path, 'w', encoding='utf-8') as file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
+        with open(summary_path, 'w', encoding='utf-8') as file:
+            file.write(summary + "\n")
+    except Exception as e:
+        print(f"Error writing profile to '{output_dir}': {e}")
+        return None, None
+
+    print()
+    print(summary)
+    print(f"\nProfile written to {trace_path} (open in chrome://tracing or Perfetto) and {summary_path}")
+    return trace_path, summary_path
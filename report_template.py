@@ -0,0 +1,344 @@
+import re
+import string
+import hashlib
+
+class CompiledTemplate:
+    def __init__(self, source):
+        # str.format-style source is split once into alternating literal
+        # chunks and field names; rendering is then a single join.
+        self.parts = []
+        for literal, field_name, format_spec, conversion in string.Formatter().parse(source):
+            if literal:
+                self.parts.append((literal, None))
+            if field_name is not None:
+                if format_spec or conversion:
+                    raise ValueError(f"Unsupported format spec for field '{field_name}'")
+                self.parts.append((None, field_name))
+        self.fields = frozenset(name for _, name in self.parts if name is not None)
+
+    def iter_render(self, values):
+        for literal, field_name in self.parts:
+            if field_name is None:
+                yield literal
+            else:
+                yield str(values[field_name])
+
+    def render(self, values):
+        return "".join(self.iter_render(values))
+
+    def write(self, file, values):
+        file.writelines(self.iter_render(values))
+
+def escape_braces(text):
+    return text.replace("{", "{{").replace("}", "}}")
+
+def compact_markup(source):
+    # Site pages drop the template's indentation and comments; nothing in
+    # the report depends on that whitespace.
+    source = re.sub(r"[ \t]*<!--.*?-->\n?", "", source)
+    return "\n".join(line.strip() for line in source.splitlines() if line.strip()) + "\n"
+
+# Indentation, and the inline row striping that the stylesheet's
+# nth-child(even) rule already applies.
+fragment_padding = re.compile(r'\n\s+| style="background-color: #(?:d9d9d9|ffffff);"')
+
+def compact_fragment(html):
+    # Same treatment for the generated table fragments of a site page.
+    return fragment_padding.sub(lambda match: "\n" if match.group().startswith("\n") else "", html)
+
+# Generated fields holding indented markup.
+FRAGMENT_FIELDS = ("storage_info_html", "connection_results_html", "log_hits_html", "history_html")
+
+REPORT_STYLESHEET = """            body {
+                font-family: Consolas, monospace;
+                padding: 20px;
+            }
+            h1 {
+                margin-bottom: 20px;
+            }
+            h3 {
+                margin-top: 40px;
+            }
+            .info-item {
+                margin-bottom: 10px;
+            }
+            .info-item label {
+                display: inline-block;
+                width: 50%;
+            }
+            .info-item-connection label {
+                display: inline-block;
+                width: 670px;
+                margin-bottom: 10px
+            }
+            .indicator {
+                display: inline-block;
+                width: 10px;
+                height: 10px;
+                border-radius: 50%;
+                margin-right: 10px;
+            }
+            .indicator-started {
+                background-color: green;
+            }
+            .indicator-stopped {
+                background-color: red;
+            }
+            .grey-background {
+                color: #808080;
+                padding: 10px;
+                margin-top: 20px;
+            }
+            .grey-background a {
+                color: #808080;
+                text-decoration: none;
+                font-weight: bold;
+            }
+            .grey-background a:hover {
+                text-decoration: underline;
+            }
+
+            table {
+                border-collapse: collapse;
+                width: 100%;
+                table-layout:fixed;
+            }
+
+            td, th {
+                border: 0px solid #dddddd;
+                text-align: left;
+                padding: 8px;
+                font-weight: normal;
+            }
+
+            .data_table tr:nth-child(even), .storage_info tr:nth-child(even), .connection_results tr:nth-child(even) {
+                background-color: #d9d9d9;
+            }
+
+            td:nth-child(1), td:nth-child(3), th:nth-child(1), th:nth-child(3) {
+                font-weight: bold;
+            }
+
+            td.table_category, th.table_category {
+                font-weight: bold;
+                font-size: 150%;
+            }
+
+            /* Specific styles for storage information and test connection tables */
+            .storage_info th, .connection_results th {
+                font-weight: bold;
+            }
+
+            .storage_info td, .connection_results td {
+                font-weight: normal;
+            }
+
+            .connection_results .status-passed {
+                color: green;
+            }
+
+            .connection_results .status-failed {
+                color: red;
+            }
+"""
+
+# Shared stylesheet of site mode. The name carries a digest of the content
+# so file servers can cache it indefinitely.
+STYLESHEET_NAME = f"report.{hashlib.sha256(REPORT_STYLESHEET.encode('utf-8')).hexdigest()[:12]}.css"
+
+REPORT_HEAD = """
+    <!DOCTYPE html>
+    <html lang="en">
+    <head>
+        <meta charset="UTF-8">
+        <meta name="viewport" content="width=device-width, initial-scale=1.0">
+        <title>{title_host_name} Results</title>
+"""
+
+REPORT_BODY = """    </head>
+    <body>
+        <h1>Endpoint Agent Analyzer Results</h1>
+        <div class="info-item">
+            <label><span style="font-weight: bold;">Script Version:</span> {script_version} | <span style="font-weight: bold;">Script RunTime:</span> {run_timestamp}</label>
+        </div>
+        <br>
+        
+        <!-- Account Token and Nebula Machine ID Information -->
+        <table>
+        <tr>
+        <th>Account Token:</th>
+        <th colspan="3">{account_token}</th>
+        </tr>
+        <tr>
+        <th>Nebula Machine ID:</th>
+        <th colspan="3">{nebula_machine_id}</th>
+        </tr>
+        </table>
+        <hr>
+
+        <!-- General Information and Operating System Information -->
+        <div>
+        <table class="data_table">
+        <tr>
+        <th  colspan="2" class="table_category">General Information</th>
+        <th colspan="2" class="table_category">Operating System</th>
+        </tr>
+        <tr>
+        <th>Endpoint Name:</th>
+        <th>{host_name}</th>
+        <th>OS Version:</th>
+        <th>{os_version}</th>
+        </tr>
+        <tr>
+        <th>FQDN</th>
+        <th>{fqdn}</th>
+        <th>OS Friendly Name:</th>
+        <th>{os_release_name}</th>
+        </tr>
+        <tr>
+        <th>Last User:</th>
+        <th>{last_user}</th>
+        <th>OS Type:</th>
+        <th>{os_type}</th>
+        </tr>
+        <tr>
+        <th>System Uptime</th>
+        <th>{system_uptime}</th>
+        <th>OS Architecture:</th>
+        <th>{os_architecture}</th>
+        </tr>
+        </table>
+        <hr>
+        </div>
+        
+        <!-- Protection Status and Agent and Plugins Information -->
+        <div>
+        <table class="data_table">
+        <tr>
+        <th  colspan="2" class="table_category">Protection Status</th>
+        <th colspan="2" class="table_category">Agent and Plugins</th>
+        </tr>
+        <tr>
+        <th>Malware Protection:</th>
+        <th>{rtp_status}</th>
+        <th>Endpoint Agent:</th>
+        <th>{engine_version}</th>
+        </tr>
+        <tr>
+        <th>Exploit Protection:</th>
+        <th>{ae_status}</th>
+        <th>Endpoint Protection:</th>
+        <th>{endpoint_protection_version}</th>
+        </tr>
+        <tr>
+        <th>Behavior Protection:</th>
+        <th>{arw_status}</th>
+        <th>Active Response Shell:</th>
+        <th>{active_response_shell_version}</th>
+        </tr>
+        <tr>
+        <th>Web Protection:</th>
+        <th>{mwac_status}</th>
+        <th>Brute Force Protection:</th>
+        <th>{brute_force_protection_version}</th>
+        </tr>
+        <tr>
+        <th>Self Protection:</th>
+        <th>{sp_status}</th>
+        <th>Asset Manager:</th>
+        <th>{asset_manager_version}</th>
+        </tr>
+        <tr>
+        <th></th>
+        <th></th>
+        <th>Endpoint Detection and Response:</th>
+        <th>{edr_version}</th>
+        </tr>
+        <tr>
+        <th></th>
+        <th></th>
+        <th>User Agent:</th>
+        <th>{user_agent_versions}</th>
+        </tr>
+        <tr>
+        <th></th>
+        <th></th>
+        <th>Service Version:</th>
+        <th>{service_version}</th>
+        </tr>
+        </table>
+        </div>
+
+        <!-- Services and Processes Information-->
+        <div>
+        <table class="data_table">
+        <tr>
+        <th  colspan="2" class="table_category">Services</th>
+        <th colspan="2" class="table_category">Processes</th>
+        </tr>
+        <tr>
+        <th>Malwarebytes Service:</th>
+        <th>{mbam_service_state}</th>
+        <th>MBAMService.exe</th>
+        <th>{mbam_service_process}</th>
+        </tr>
+        <tr>
+        <th>Endpoint Agent:</th>
+        <th>{ea_service_state}</th>
+        <th>MBCloudEA.exe</th>
+        <th>{mb_cloud_ea_process}</th>
+        </tr>
+        <tr>
+        <th>Endpoint Agent Monitor</th>
+        <th>{ea_monitor_state}</th>
+        <th>EAServiceMonitor.exe</th>
+        <th>{ea_service_monitor_process}</th>
+        </tr>
+        <tr>
+        <th></th>
+        <th></th>
+        <th>EATray.exe</th>
+        <th>{ea_tray_process}</th>
+        </tr>
+        <tr>
+        <th>VPN Service</th>
+        <th>{mb_vpn_service_state}</th>
+        <th>MBVpnService.exe</th>
+        <th>{mb_vpn_service_process}</th>
+        </tr>
+        <tr>
+        <th>VPN Tunnel Service</th>
+        <th>{mb_vpn_tunnel_service_state}</th>
+        <th></th>
+        <th></th>
+        </tr>
+
+        </div>
+        <hr>
+
+        <!-- Storage Information -->
+        <div class="storage_info">
+            {storage_info_html}
+        </div>
+        <!-- Test Connection Results Information -->
+        <div class="connection_results">
+            {connection_results_html}
+        </div>
+        <div class="full-width grey-background">
+            * If one of the above failed, ask the customer to review:
+            <a href="https://support.threatdown.com/hc/en-us/articles/4413798711699-Network-access-requirements-for-Nebula">Network access requirements for Nebula</a>
+        </div>
+{log_hits_html}{history_html}    </body>
+    </html>
+    """
+
+# Single-file report with the stylesheet inlined, e.g. for emailing.
+REPORT_TEMPLATE = CompiledTemplate(REPORT_HEAD + "        <style>\n" + escape_braces(REPORT_STYLESHEET) + "        </style>\n" + REPORT_BODY)
+
+# Site page linking the shared stylesheet written by write_site_assets().
+SITE_REPORT_TEMPLATE = CompiledTemplate(compact_markup(REPORT_HEAD + f'<link rel="stylesheet" href="assets/{STYLESHEET_NAME}">\n' + REPORT_BODY))
+
+report_templates = {
+    "single": REPORT_TEMPLATE,
+    "site": SITE_REPORT_TEMPLATE,
+}
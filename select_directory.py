@@ -1,21 +1,165 @@
 import os
+import time
 import shutil
-import tkinter as tk
-from tkinter import filedialog
+import zipfile
+import posixpath
+import fnmatch
+import functools
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import argparse
 
-def collect_files(folder_path):
-    collected_files = []
+ARTIFACT_NAMES = ["Info.txt", "machine_info.json", "TestConnections.txt", "SystemInfo.json", "Services.json", "RunningProcesses.json"]
 
-    for root, _, files in os.walk(folder_path):
-        for file in files:
-            if file in ["Info.txt", "machine_info.json", "TestConnections.txt", "SystemInfo.json", "Services.json", "RunningProcesses.json"]:
-                file_path = os.path.join(root, file)
-                collected_files.append(file_path)
-    
-    return collected_files
+SCAN_WORKERS = 8
+
+def list_directory(folder_path):
+    try:
+        with os.scandir(folder_path) as entries:
+            return [(entry.name, entry.path, entry.is_dir(follow_symlinks=False)) for entry in entries]
+    except OSError as e:
+        print(f"Skipping {folder_path}: {e}")
+        return []
+
+def is_excluded(name, rel_path, exclude):
+    return any(fnmatch.fnmatch(name, pattern) or fnmatch.fnmatch(rel_path, pattern) for pattern in exclude)
+
+def scan_bundle(folder_path, max_depth=None, exclude=None, stop_when_complete=True):
+    exclude = exclude or []
+    artifacts = {}
+    duplicates = {}
+    archive_paths = []
+
+    # Breadth-first, one directory level at a time. Listing a level's
+    # directories concurrently hides per-directory latency on network
+    # shares, and shallower copies of an artifact win over deeper ones.
+    level = [folder_path]
+    depth = 0
+    with ThreadPoolExecutor(max_workers=SCAN_WORKERS) as executor:
+        while level:
+            next_level = []
+            for listing in executor.map(list_directory, level):
+                for name, path, is_dir in listing:
+                    rel_path = os.path.relpath(path, folder_path)
+                    if is_excluded(name, rel_path, exclude):
+                        continue
+                    if is_dir:
+                        next_level.append(path)
+                    elif name in ARTIFACT_NAMES:
+                        if name in artifacts:
+                            duplicates.setdefault(name, []).append(path)
+                        else:
+                            artifacts[name] = path
+                    elif is_archive_name(name):
+                        archive_paths.append(path)
+
+            if stop_when_complete and len(artifacts) == len(ARTIFACT_NAMES):
+                break
+            depth += 1
+            if max_depth is not None and depth > max_depth:
+                break
+            level = sorted(next_level)
+
+    return artifacts, duplicates, archive_paths
+
+def report_duplicates(artifacts, duplicates):
+    for name, paths in duplicates.items():
+        for path in paths:
+            print(f"Duplicate {name} at {path} ignored; using {artifacts[name]}")
+
+def collect_files(folder_path, max_depth=None, exclude=None):
+    artifacts, duplicates, _ = scan_bundle(folder_path, max_depth, exclude)
+    report_duplicates(artifacts, duplicates)
+    return list(artifacts.values())
+
+def is_archive_name(file_name):
+    return file_name.lower().endswith(".zip")
+
+def collect_archive_members(archive, stack, sources):
+    nested_archives = []
+    for info in archive.infolist():
+        if info.is_dir():
+            continue
+        file_name = posixpath.basename(info.filename)
+        if file_name in ARTIFACT_NAMES:
+            sources.setdefault(file_name, functools.partial(archive.open, info))
+        elif is_archive_name(file_name):
+            nested_archives.append(info)
+
+    for info in nested_archives:
+        if len(sources) == len(ARTIFACT_NAMES):
+            break
+        member = stack.enter_context(archive.open(info))
+        try:
+            nested = stack.enter_context(zipfile.ZipFile(member))
+        except zipfile.BadZipFile as e:
+            print(f"Skipping {info.filename}: {e}")
+            continue
+        collect_archive_members(nested, stack, sources)
+
+    return sources
+
+def source_mtime(source):
+    # When the artifact was written: the file's mtime, or the member's
+    # timestamp for artifacts inside an archive. None if unknown.
+    if isinstance(source, str):
+        try:
+            return os.path.getmtime(source)
+        except OSError:
+            return None
+    if isinstance(source, functools.partial) and source.args and isinstance(source.args[0], zipfile.ZipInfo):
+        return time.mktime(source.args[0].date_time + (0, 0, -1))
+    return None
+
+def collect_sources(bundle_path, stack, max_depth=None, exclude=None):
+    sources = {}
+
+    if os.path.isfile(bundle_path):
+        archive = stack.enter_context(zipfile.ZipFile(bundle_path))
+        return collect_archive_members(archive, stack, sources)
+
+    artifacts, duplicates, archive_paths = scan_bundle(bundle_path, max_depth, exclude)
+    report_duplicates(artifacts, duplicates)
+    sources.update(artifacts)
+
+    for archive_path in archive_paths:
+        if len(sources) == len(ARTIFACT_NAMES):
+            break
+        try:
+            archive = stack.enter_context(zipfile.ZipFile(archive_path))
+        except zipfile.BadZipFile as e:
+            print(f"Skipping {archive_path}: {e}")
+            continue
+        collect_archive_members(archive, stack, sources)
+
+    return sources
+
+def copy_files(files_to_collect, logs_dir, debug=False):
+    if not os.path.exists(logs_dir):
+        os.makedirs(logs_dir)
+
+    # Artifacts found twice in one collection are not copied over each
+    # other; files left in logs_dir by an earlier run are replaced.
+    destinations = {}
+    for file_path in files_to_collect:
+        dest_path = os.path.join(logs_dir, os.path.basename(file_path))
+        if dest_path in destinations:
+            print(f"Duplicate {os.path.basename(file_path)} at {file_path} not copied; using {destinations[dest_path]}")
+            continue
+        destinations[dest_path] = file_path
+
+    with ThreadPoolExecutor(max_workers=SCAN_WORKERS) as executor:
+        futures = {executor.submit(shutil.copy2, file_path, dest_path): (file_path, dest_path) for dest_path, file_path in destinations.items()}
+        for future in as_completed(futures):
+            future.result()
+            if debug:
+                file_path, dest_path = futures[future]
+                print(f"Copied {file_path} to {dest_path}")
 
 def select_folder():
+    # Imported here so scripted runs never pay for loading Tk.
+    import tkinter as tk
+    from tkinter import filedialog
+
     root = tk.Tk()
     root.withdraw()
     folder_path = filedialog.askdirectory(title="Select Folder")
@@ -24,6 +168,8 @@ def select_folder():
 def main():
     parser = argparse.ArgumentParser(description="Select and process files from a directory.")
     parser.add_argument('--debug', action='store_true', help="Enable debug output")
+    parser.add_argument('--max-depth', type=int, default=None, help="Do not descend more than this many folders below the selected one")
+    parser.add_argument('--exclude', action='append', default=[], help="Skip files and folders matching this glob (repeatable)")
     args = parser.parse_args()
 
     debug = args.debug
@@ -33,19 +179,12 @@ def main():
         print("No folder selected.")
         return
     
-    files_to_collect = collect_files(selected_folder)
+    files_to_collect = collect_files(selected_folder, args.max_depth, args.exclude)
 
     logs_dir = os.path.join(os.getcwd(), "temp")
     
-    if not os.path.exists(logs_dir):
-        os.makedirs(logs_dir)
-    
     if files_to_collect:
-        for file_path in files_to_collect:
-            dest_path = os.path.join(logs_dir, os.path.basename(file_path))
-            shutil.copy(file_path, dest_path)
-            if debug:
-                print(f"Copied {file_path} to {dest_path}")
+        copy_files(files_to_collect, logs_dir, debug)
     else:
         print("No files found to collect.")
 
@@ -0,0 +1,216 @@
+import io
+import json
+import signal
+import asyncio
+import zipfile
+import posixpath
+from contextlib import ExitStack
+from email.parser import BytesParser
+from email.policy import HTTP
+from urllib.parse import urlsplit, parse_qs
+from concurrent.futures import ProcessPoolExecutor
+
+from pipeline import parse_sources, render_snapshot
+from select_directory import ARTIFACT_NAMES, collect_archive_members, is_archive_name
+from version_baseline import load_baseline
+
+# Bodies are held in memory while they are analyzed, so at most
+# max_concurrency times this much is buffered at once.
+MAX_BODY_BYTES = 128 * 1024 * 1024
+MAX_HEADER_BYTES = 64 * 1024
+
+reasons = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    411: "Length Required",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+}
+
+class HttpError(Exception):
+    # Both values live in args so the error survives the trip back from a
+    # worker process.
+    def __init__(self, status, message):
+        super().__init__(status, message)
+        self.status = status
+        self.message = message
+
+    def __str__(self):
+        return self.message
+
+def init_worker(version_info_path):
+    # Ctrl+C is handled by the event loop; workers finish their request.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # Warm the per-process baseline cache once; later calls only stat the
+    # file and reuse the parsed index.
+    load_baseline(version_info_path)
+
+def analyze_payload(payload_kind, payload, output_format, version_info_path):
+    with ExitStack() as stack:
+        if payload_kind == "zip":
+            archive = stack.enter_context(zipfile.ZipFile(io.BytesIO(payload)))
+            sources = collect_archive_members(archive, stack, {})
+        else:
+            sources = payload
+        if "Info.txt" not in sources:
+            raise HttpError(400, "No Info.txt found in the uploaded bundle")
+
+        snapshot = parse_sources(sources)
+        if output_format == "json":
+            return "application/json", json.dumps(snapshot.to_dict()).encode('utf-8')
+        return "text/html; charset=utf-8", render_snapshot(snapshot, version_info_path).encode('utf-8')
+
+def analyze_body(content_type, body, output_format, version_info_path):
+    # Runs in a worker: parsing a large multipart body or checking a zip
+    # would otherwise stall the event loop for every other request.
+    if content_type.startswith("multipart/form-data"):
+        payload_kind, payload = parse_multipart(content_type, body)
+    else:
+        payload_kind, payload = "zip", body
+
+    if payload_kind == "zip" and not zipfile.is_zipfile(io.BytesIO(payload)):
+        raise HttpError(400, "Request body is not a zip archive")
+    return analyze_payload(payload_kind, payload, output_format, version_info_path)
+
+def parse_multipart(content_type, body):
+    message = BytesParser(policy=HTTP).parsebytes(f"Content-Type: {content_type}\r\n\r\n".encode('latin-1') + body)
+    if not message.is_multipart():
+        raise HttpError(400, "Malformed multipart body")
+
+    sources = {}
+    for part in message.iter_parts():
+        filename = part.get_filename()
+        if not filename:
+            continue
+        filename = posixpath.basename(filename.replace("\\", "/"))
+        content = part.get_payload(decode=True) or b""
+        if is_archive_name(filename):
+            return "zip", content
+        if filename in ARTIFACT_NAMES:
+            sources[filename] = content
+    return "files", sources
+
+async def read_request(reader):
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.LimitOverrunError:
+        raise HttpError(400, "Request header too large")
+    except asyncio.IncompleteReadError:
+        return None
+
+    lines = head.decode('latin-1').split("\r\n")
+    try:
+        method, target, _ = lines[0].split(" ", 2)
+    except ValueError:
+        raise HttpError(400, "Malformed request line")
+
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+
+    return method, target, headers
+
+def body_length(headers):
+    if "content-length" not in headers:
+        raise HttpError(411, "Content-Length is required")
+    try:
+        length = int(headers["content-length"])
+    except ValueError:
+        raise HttpError(400, "Invalid Content-Length")
+    if length < 0:
+        raise HttpError(400, "Invalid Content-Length")
+    if length > MAX_BODY_BYTES:
+        raise HttpError(413, f"Request body exceeds {MAX_BODY_BYTES} bytes")
+    return length
+
+async def write_response(writer, status, content_type, body):
+    writer.write((
+        f"HTTP/1.1 {status} {reasons.get(status, '')}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        "Connection: close\r\n\r\n"
+    ).encode('latin-1'))
+    writer.write(body)
+    await writer.drain()
+
+class AnalyzerServer:
+    def __init__(self, version_info_path, max_concurrency, workers=None):
+        self.version_info_path = version_info_path
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.executor = ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(version_info_path,))
+        self.baseline = load_baseline(version_info_path)
+
+    async def handle_analyze(self, query, headers, reader):
+        output_format = query.get("format", ["html"])[0]
+        if output_format not in ("html", "json"):
+            raise HttpError(400, "format must be 'html' or 'json'")
+        length = body_length(headers)
+        content_type = headers.get("content-type", "application/zip")
+
+        # The body is only read once a slot is free, so the concurrency
+        # limit also bounds how much request data is held in memory.
+        async with self.semaphore:
+            try:
+                body = await reader.readexactly(length)
+            except asyncio.IncompleteReadError:
+                raise HttpError(400, "Request body is shorter than its Content-Length")
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, analyze_body, content_type, body, output_format, self.version_info_path)
+
+    async def handle_connection(self, reader, writer):
+        try:
+            try:
+                request = await read_request(reader)
+                if request is None:
+                    return
+                method, target, headers = request
+                url = urlsplit(target)
+
+                if url.path == "/health":
+                    self.baseline = load_baseline(self.version_info_path)
+                    status = {"status": "ok", "baseline_versions": len(self.baseline.versions)}
+                    await write_response(writer, 200, "application/json", json.dumps(status).encode('utf-8'))
+                elif url.path == "/analyze":
+                    if method != "POST":
+                        raise HttpError(405, "Use POST to submit a bundle")
+                    content_type, response = await self.handle_analyze(parse_qs(url.query), headers, reader)
+                    await write_response(writer, 200, content_type, response)
+                else:
+                    raise HttpError(404, f"No route for {url.path}")
+            except HttpError as e:
+                await write_response(writer, e.status, "text/plain; charset=utf-8", str(e).encode('utf-8'))
+            except Exception as e:
+                print(f"Error handling request: {e}")
+                await write_response(writer, 500, "text/plain; charset=utf-8", str(e).encode('utf-8'))
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    def close(self):
+        self.executor.shutdown()
+
+async def serve(host, port, version_info_path, max_concurrency, workers=None):
+    analyzer = AnalyzerServer(version_info_path, max_concurrency, workers)
+    server = await asyncio.start_server(analyzer.handle_connection, host, port, limit=MAX_HEADER_BYTES)
+    bound = ", ".join(f"{sock.getsockname()[0]}:{sock.getsockname()[1]}" for sock in server.sockets)
+    print(f"Serving analyzer on {bound} (max {max_concurrency} concurrent analyses). Press Ctrl+C to stop.")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        analyzer.close()
+
+def run_server(host, port, version_info_path, max_concurrency, workers=None):
+    try:
+        asyncio.run(serve(host, port, version_info_path, max_concurrency, workers))
+    except KeyboardInterrupt:
+        print("\nServer stopped.")
@@ -0,0 +1,177 @@
+import os
+import csv
+import json
+import time
+
+from create_html import (
+    script_version, get_plugin_versions, get_protection_statuses, get_drive_usage, get_services, get_processes,
+    plugin_baseline_names
+)
+from fleet import protection_status_names, baseline_labels
+from version_baseline import load_baseline
+from defaults import SNAPSHOT_FORMATS
+
+snapshot_file_names = {output_format: f"Endpoint_Snapshots.{output_format}" for output_format in SNAPSHOT_FORMATS}
+
+service_names = list(get_services([]))
+process_names = list(get_processes([]))
+
+def endpoint_record(snapshot, baseline):
+    data = snapshot.info
+    agent_info = data.get('AgentInfo', {})
+    protection_statuses = get_protection_statuses(agent_info)
+
+    plugins = {}
+    for product, version in get_plugin_versions(agent_info.get('plugins', [])).items():
+        confluence_name = plugin_baseline_names[product]
+        plugins[product] = {
+            "version": version,
+            "baseline_version": baseline.get(confluence_name),
+            "baseline_status": baseline_labels[baseline.classify(confluence_name, [version])[0]],
+        }
+
+    drives = []
+    for drive, storage_used_gb, total_size_gb, freespace_available_gb, storage_used_percentage in get_drive_usage(snapshot.machine_info.get('drives', [])):
+        drives.append({
+            "name": drive.get('name', 'N/A'),
+            "volume_label": drive.get('volume_label', 'N/A'),
+            "drive_format": drive.get('drive_format', 'N/A'),
+            "used_gb": round(storage_used_gb, 2),
+            "total_gb": round(total_size_gb, 2),
+            "free_gb": round(freespace_available_gb, 2),
+            "percent_used": round(storage_used_percentage, 2),
+        })
+
+    connections = []
+    for url, details in snapshot.test_connections.items():
+        connections.append({
+            "url": url,
+            "result": bool(details.get("Result", False)),
+            "status_code": details.get("StatusCode"),
+            "expected_status_code": details.get("ExpectedStatusCode"),
+        })
+
+    return {
+        "host_name": agent_info.get('host_name', 'N/A'),
+        "nebula_machine_id": data.get('NebulaMachineId', 'N/A'),
+        "script_version": script_version,
+        "protection": {key: protection_statuses.get(key, 'N/A') for key in protection_status_names},
+        "plugins": plugins,
+        "services": {name: snapshot.services.get(name, 'N/A') for name in service_names},
+        "processes": {name: snapshot.processes.get(name, 'N/A') for name in process_names},
+        "drives": drives,
+        "connections": connections,
+        "failed_steps": list(snapshot.failed_steps),
+    }
+
+def plugin_column(product):
+    return f"plugin_{plugin_baseline_names[product].lower()}"
+
+csv_columns = (
+    ["host_name", "nebula_machine_id", "script_version"]
+    + [f"protection_{key}" for key in protection_status_names]
+    + [f"{plugin_column(product)}_{field}" for product in plugin_baseline_names for field in ("version", "baseline_version", "baseline_status")]
+    + [f"service_{name}" for name in service_names]
+    + [f"process_{name}" for name in process_names]
+    + ["max_drive_percent_used", "drives", "connections_passed", "connections_failed", "failed_urls", "failed_steps"]
+)
+
+def flatten_record(record):
+    # CSV has no nesting: fixed-shape sections become columns, drives are
+    # kept as an embedded JSON array and connections are reduced to counts
+    # plus the failing URLs.
+    row = {
+        "host_name": record["host_name"],
+        "nebula_machine_id": record["nebula_machine_id"],
+        "script_version": record["script_version"],
+    }
+    for key, status in record["protection"].items():
+        row[f"protection_{key}"] = status
+    for product, plugin in record["plugins"].items():
+        for field, value in plugin.items():
+            row[f"{plugin_column(product)}_{field}"] = value
+    for name, state in record["services"].items():
+        row[f"service_{name}"] = state
+    for name, responding in record["processes"].items():
+        row[f"process_{name}"] = responding
+
+    failed_urls = [connection["url"] for connection in record["connections"] if not connection["result"]]
+    row["max_drive_percent_used"] = max((drive["percent_used"] for drive in record["drives"]), default=0.0)
+    row["drives"] = json.dumps(record["drives"])
+    row["connections_passed"] = len(record["connections"]) - len(failed_urls)
+    row["connections_failed"] = len(failed_urls)
+    row["failed_urls"] = " ".join(failed_urls)
+    row["failed_steps"] = " ".join(record["failed_steps"])
+    return row
+
+class NdjsonWriter:
+    def __init__(self, file):
+        self.file = file
+
+    def write(self, record):
+        self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        # Flush per record so a consumer tailing the file sees each
+        # endpoint as soon as it has been analyzed.
+        self.file.flush()
+
+class CsvWriter:
+    def __init__(self, file):
+        self.file = file
+        self.writer = csv.DictWriter(file, fieldnames=csv_columns)
+        if file.tell() == 0:
+            self.writer.writeheader()
+
+    def write(self, record):
+        self.writer.writerow(flatten_record(record))
+        self.file.flush()
+
+snapshot_writers = {
+    "ndjson": NdjsonWriter,
+    "csv": CsvWriter,
+}
+
+def read_csv_header(path):
+    try:
+        with open(path, encoding='utf-8', newline='') as file:
+            return next(csv.reader(file), None)
+    except (OSError, UnicodeDecodeError, csv.Error):
+        return None
+
+def set_aside_stale_csv(path):
+    # Rows with a different column set cannot share one CSV; the old file is
+    # kept under a timestamped name and a fresh one is started.
+    if os.path.getsize(path) == 0 or read_csv_header(path) == csv_columns:
+        return
+    base, extension = os.path.splitext(path)
+    stale_path = f"{base}.{time.strftime('%Y%m%d-%H%M%S', time.localtime(os.path.getmtime(path)))}{extension}"
+    os.replace(path, stale_path)
+    print(f"{path} has different columns; moved it to {stale_path}")
+
+class SnapshotOutput:
+    # Interactive, batch and watch runs all append to the same file in
+    # output_dir, so it accumulates one record per analyzed endpoint.
+    def __init__(self, output_format, output_dir):
+        os.makedirs(output_dir, exist_ok=True)
+        self.path = os.path.join(output_dir, snapshot_file_names[output_format])
+        if output_format == "csv" and os.path.exists(self.path):
+            set_aside_stale_csv(self.path)
+        self.file = open(self.path, 'a', encoding='utf-8', newline='')
+        self.writer = snapshot_writers[output_format](self.file)
+        self.count = 0
+
+    def write(self, record):
+        self.writer.write(record)
+        self.count += 1
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+def snapshot_record(snapshot, version_info_path):
+    return endpoint_record(snapshot, load_baseline(version_info_path))
@@ -0,0 +1,166 @@
+import sys
+
+from create_html import get_services, get_processes
+
+def intern_value(value):
+    # Versions, states, URLs and labels repeat across endpoints, so every
+    # snapshot shares one copy of each.
+    if isinstance(value, str):
+        return sys.intern(value)
+    if isinstance(value, (list, tuple)):
+        return tuple(intern_value(item) for item in value)
+    return value
+
+def keep_value(value):
+    return value
+
+def record_of(record_type):
+    def convert(value):
+        return record_type(value) if isinstance(value, dict) else intern_value(value)
+    return convert
+
+def records_of(record_type):
+    def convert(value):
+        if not isinstance(value, list):
+            return intern_value(value)
+        return tuple(record_type(item) if isinstance(item, dict) else intern_value(item) for item in value)
+    return convert
+
+def plain_value(value):
+    if isinstance(value, Record):
+        return value.to_dict()
+    if isinstance(value, (list, tuple)):
+        return [plain_value(item) for item in value]
+    if isinstance(value, dict):
+        return {key: plain_value(item) for key, item in value.items()}
+    return value
+
+class Record:
+    # Slotted replacement for one of the parsed JSON dicts. Only the keys
+    # the reports use are kept. get() and items() take the source's own key
+    # names, so the create_html get_*/format_* helpers accept either form.
+    # A key missing from the source leaves its slot unset.
+    __slots__ = ()
+    source_keys = {}
+    converters = {}
+
+    def __init__(self, source=None):
+        if not source:
+            return
+        for key, name in self.source_keys.items():
+            if key in source:
+                setattr(self, name, self.converters.get(key, intern_value)(source[key]))
+
+    def get(self, key, default=None):
+        name = self.source_keys.get(key)
+        if name is None:
+            return default
+        return getattr(self, name, default)
+
+    def __contains__(self, key):
+        name = self.source_keys.get(key)
+        return name is not None and hasattr(self, name)
+
+    def items(self):
+        for key, name in self.source_keys.items():
+            if hasattr(self, name):
+                yield key, getattr(self, name)
+
+    def to_dict(self):
+        return {key: plain_value(value) for key, value in self.items()}
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+class ProtectionStatus(Record):
+    source_keys = {key: key for key in ('rtp', 'ae', 'arw', 'mwac', 'sp')}
+    __slots__ = tuple(source_keys.values())
+
+class Plugin(Record):
+    __slots__ = ('product_name', 'plugin_version', 'protection_status')
+    source_keys = {name: name for name in __slots__}
+    converters = {'protection_status': record_of(ProtectionStatus)}
+
+class OsInfo(Record):
+    __slots__ = ('os_version', 'os_release_name', 'os_type', 'os_architecture')
+    source_keys = {name: name for name in __slots__}
+
+class AgentInfo(Record):
+    __slots__ = ('host_name', 'fully_qualified_host_name', 'last_user', 'engine_version', 'service_version', 'tray_version', 'os_info', 'plugins')
+    source_keys = {name: name for name in __slots__}
+    converters = {
+        'host_name': keep_value,
+        'fully_qualified_host_name': keep_value,
+        'last_user': keep_value,
+        'os_info': record_of(OsInfo),
+        'plugins': records_of(Plugin),
+    }
+
+class EndpointInfo(Record):
+    __slots__ = ('account_token', 'nebula_machine_id', 'agent_info')
+    source_keys = {'AccountToken': 'account_token', 'NebulaMachineId': 'nebula_machine_id', 'AgentInfo': 'agent_info'}
+    converters = {
+        'AccountToken': keep_value,
+        'NebulaMachineId': keep_value,
+        'AgentInfo': record_of(AgentInfo),
+    }
+
+class Drive(Record):
+    __slots__ = ('name', 'volume_label', 'drive_format', 'total_size', 'freespace_available')
+    source_keys = {name: name for name in __slots__}
+
+class MachineInfo(Record):
+    __slots__ = ('drives',)
+    source_keys = {'drives': 'drives'}
+    converters = {'drives': records_of(Drive)}
+
+class SystemInfo(Record):
+    __slots__ = ('system_uptime',)
+    source_keys = {'SystemUptime': 'system_uptime'}
+    converters = {'SystemUptime': keep_value}
+
+class Connection(Record):
+    __slots__ = ('url', 'message', 'status_code', 'expected_status_code', 'result')
+    source_keys = {'UriTested': 'url', 'Message': 'message', 'StatusCode': 'status_code', 'ExpectedStatusCode': 'expected_status_code', 'Result': 'result'}
+
+def connections_of(value):
+    if not isinstance(value, dict):
+        return {}
+    return {sys.intern(url): Connection(details) if isinstance(details, dict) else details for url, details in value.items()}
+
+class LogHit(Record):
+    __slots__ = ('signature', 'count', 'first_seen', 'last_seen', 'files', 'sample')
+    source_keys = {name: name for name in __slots__}
+    converters = {'sample': keep_value}
+
+class ServiceStates(Record):
+    source_keys = {name: name for name in get_services([])}
+    __slots__ = tuple(source_keys.values())
+
+class ProcessStates(Record):
+    source_keys = {name: name for name in get_processes([])}
+    __slots__ = tuple(source_keys.values())
+
+class EndpointSnapshot(Record):
+    __slots__ = ('info', 'test_connections', 'machine_info', 'system_info', 'services', 'processes', 'failed_steps', 'collected_at', 'log_hits')
+    source_keys = {name: name for name in __slots__}
+    converters = {
+        'info': record_of(EndpointInfo),
+        'test_connections': connections_of,
+        'machine_info': record_of(MachineInfo),
+        'system_info': record_of(SystemInfo),
+        'services': record_of(ServiceStates),
+        'processes': record_of(ProcessStates),
+        'failed_steps': tuple,
+        'log_hits': records_of(LogHit),
+    }
+
+    def content_dict(self):
+        # What the bundle contains, without when it was collected, so the
+        # same bundle always hashes the same.
+        content = self.to_dict()
+        content.pop('collected_at', None)
+        return content
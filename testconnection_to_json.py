@@ -1,35 +1,44 @@
+import io
 import json
-import re
+
+from json_stream import DEFAULT_CHUNK_SIZE, iter_json_objects
+
+def format_test_connection(data):
+    return {
+        "UriTested": data["UriTested"],
+        "Message": data["Message"],
+        "StatusCode": data["StatusCode"],
+        "ExpectedStatusCode": data["ExpectedStatusCode"],
+        "Result": data["Result"],
+        "Headers": data["Headers"]
+    }
+
+def iter_test_connections(connection_file, source_name="TestConnections.txt", chunk_size=DEFAULT_CHUNK_SIZE):
+    def report_error(e):
+        print(f"Error reading file {source_name}: {e}")
+
+    for data in iter_json_objects(connection_file, chunk_size, on_error=report_error):
+        if isinstance(data, dict) and "UriTested" in data:
+            yield format_test_connection(data)
+
+def read_test_connections(connection_file, source_name="TestConnections.txt"):
+    test_values = {}
+    for formatted_output in iter_test_connections(connection_file, source_name):
+        test_values[formatted_output["UriTested"]] = formatted_output
+    return test_values
+
+def parse_test_connections(connection_data, source_name="TestConnections.txt"):
+    return read_test_connections(io.StringIO(connection_data), source_name)
 
 def convert_test_connection_to_json(test_connection_path, test_connection_output):
     try:
         with open(test_connection_path, 'r') as connection_file:
-            connection_data = connection_file.read()
-        
-        pattern = re.compile(r'\{[^\}]*?\}', re.DOTALL)
-        blocks = pattern.findall(connection_data)
-        
-        test_values = {}
-        for block in blocks:
-            try:
-                data = json.loads(block)
-                if "UriTested" in data:
-                    formatted_output = {
-                        "UriTested": data["UriTested"],
-                        "Message": data["Message"],
-                        "StatusCode": data["StatusCode"],
-                        "ExpectedStatusCode": data["ExpectedStatusCode"],
-                        "Result": data["Result"],
-                        "Headers": data["Headers"]
-                    }
-                    test_values[data["UriTested"]] = formatted_output
-            except json.JSONDecodeError as e:
-                print(f"Error reading file {test_connection_path}: {e}")
+            test_values = read_test_connections(connection_file, test_connection_path)
 
         with open(test_connection_output, 'w') as outfile:
             json.dump(test_values, outfile, indent=4)
-        
+
         return test_values
     except Exception as e:
         print(f"An error occurred: {e}")
-        return None
\ No newline at end of file
+        return None
@@ -0,0 +1,71 @@
+import io
+import os
+import sys
+import json
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from json_stream import iter_json_objects
+from testconnection_to_json import read_test_connections
+
+def connection(index):
+    return {
+        "UriTested": f"https://host{index}.example.com/",
+        "Message": "OK",
+        "StatusCode": 200,
+        "ExpectedStatusCode": 200,
+        "Result": True,
+        "Headers": {"Content-Type": "text/html", "Server": "nginx"},
+    }
+
+def connection_text(count, separator="\nTesting connection...\n"):
+    return separator.join(json.dumps(connection(index), indent=4) for index in range(count))
+
+def parse(text, chunk_size=64, **kwargs):
+    errors = []
+    objects = list(iter_json_objects(io.StringIO(text), chunk_size, on_error=errors.append, **kwargs))
+    return objects, errors
+
+def test_nested_headers_stay_inside_their_object():
+    objects, errors = parse(connection_text(3))
+    assert objects == [connection(index) for index in range(3)]
+    assert errors == []
+
+def test_objects_spanning_chunk_boundaries():
+    text = connection_text(20)
+    for chunk_size in (1, 7, 64, 4096):
+        objects, errors = parse(text, chunk_size)
+        assert objects == [connection(index) for index in range(20)]
+        assert errors == []
+
+def test_braces_and_quotes_inside_strings():
+    record = {"UriTested": "x", "Message": 'a "}{" b \\ {', "Headers": {"k": "}"}}
+    objects, errors = parse("noise " + json.dumps(record) + " noise", 5)
+    assert objects == [record]
+    assert errors == []
+
+def test_oversize_object_is_skipped_whole():
+    big = {"UriTested": "big", "Headers": {"nested": 1}, "Padding": "x" * 5000}
+    text = json.dumps({"a": 1}) + json.dumps(big) + json.dumps({"b": 2})
+    objects, errors = parse(text, 16, max_object_size=1000)
+    assert objects == [{"a": 1}, {"b": 2}]
+    assert len(errors) == 1
+
+def test_unterminated_trailing_input():
+    text = connection_text(2) + '\n{"UriTested": "cut", "Headers": {"Server": "nginx"}'
+    objects, errors = parse(text)
+    assert objects[:2] == [connection(0), connection(1)]
+    assert len(errors) >= 1
+    assert list(read_test_connections(io.StringIO(text))) == [connection(0)["UriTested"], connection(1)["UriTested"]]
+
+def test_stray_brace_does_not_hide_later_objects():
+    text = "Starting tests {\n" + connection_text(50)
+    objects, errors = parse(text)
+    assert objects == [connection(index) for index in range(50)]
+    assert len(errors) == 1
+    assert len(read_test_connections(io.StringIO(text))) == 50
+
+def test_stray_brace_between_objects():
+    text = connection_text(1) + "\n{ not json\n" + connection_text(1).replace("host0", "host1")
+    objects, _ = parse(text, 8)
+    assert [obj.get("UriTested") for obj in objects if "UriTested" in obj] == ["https://host0.example.com/", "https://host1.example.com/"]
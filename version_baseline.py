@@ -0,0 +1,75 @@
+import os
+import json
+from functools import lru_cache
+
+@lru_cache(maxsize=4096)
+def parse_version(version):
+    try:
+        return tuple(map(int, version.split('.')))
+    except (ValueError, AttributeError):
+        return None
+
+def compare_parsed(version_tuple, base_version_tuple):
+    if version_tuple is None or base_version_tuple is None:
+        return None
+    if version_tuple < base_version_tuple:
+        return -1
+    elif version_tuple == base_version_tuple:
+        return 0
+    return 1
+
+class BaselineIndex:
+    def __init__(self, version_info_path, mtime, version_data):
+        self.version_info_path = version_info_path
+        self.mtime = mtime
+        self.versions = {}
+        self.parsed = {}
+        for item in version_data:
+            confluence_name = item.get('confluence_name', '')
+            plugin_version = item.get('plugin_version', 'N/A')
+            self.versions[confluence_name] = plugin_version
+            self.parsed[confluence_name] = parse_version(plugin_version)
+
+    def get(self, confluence_name, default='N/A'):
+        return self.versions.get(confluence_name, default)
+
+    def select(self, confluence_names):
+        return {name: self.versions[name] for name in confluence_names if name in self.versions}
+
+    def classify(self, confluence_name, versions):
+        # Returns -1 (behind), 0 (equal), 1 (ahead) or None (unparseable)
+        # for each version. Repeated versions are parsed once.
+        base_version_tuple = self.parsed.get(confluence_name)
+        results = {}
+        for version in versions:
+            if version not in results:
+                results[version] = compare_parsed(parse_version(version), base_version_tuple)
+        return [results[version] for version in versions]
+
+# Keyed by absolute path; each entry is rebuilt only when the file's mtime
+# changes, so long-running processes pick up edits to version_info.json.
+loaded_baselines = {}
+
+def load_baseline(version_info_path):
+    abs_path = os.path.abspath(version_info_path)
+    try:
+        mtime = os.stat(abs_path).st_mtime_ns
+    except FileNotFoundError:
+        print(f"Error: File '{version_info_path}' not found.")
+        loaded_baselines.pop(abs_path, None)
+        return BaselineIndex(version_info_path, None, [])
+
+    index = loaded_baselines.get(abs_path)
+    if index is not None and index.mtime == mtime:
+        return index
+
+    try:
+        with open(abs_path, 'r', encoding='utf-8') as file:
+            version_data = json.load(file)
+    except Exception as e:
+        print(f"Error reading '{version_info_path}': {e}")
+        version_data = []
+
+    index = BaselineIndex(version_info_path, mtime, version_data)
+    loaded_baselines[abs_path] = index
+    return index
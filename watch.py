@@ -0,0 +1,281 @@
+import os
+import sys
+import json
+import time
+import errno
+import select
+import signal
+import ctypes
+import ctypes.util
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from atomic_write import replace_file, remove_quietly
+from batch import process_bundle, is_failure
+from create_html import write_site_assets
+from dashboard import Dashboard
+from history import HistoryStore
+from parse_cache import ParseCache
+from select_directory import is_archive_name
+from snapshot_export import SnapshotOutput
+
+PARTIAL_SUFFIXES = (".part", ".partial", ".tmp", ".crdownload", ".filepart", ".download")
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+# How long to sleep between scans when nothing is pending. With inotify the
+# loop is woken by events instead, so this only bounds missed-event drift.
+IDLE_RESCAN_SECONDS = 60.0
+RESULT_POLL_SECONDS = 0.25
+
+# Bundles seen but not reported when the watch stopped. The next run picks
+# them up even without --process-existing.
+UNPROCESSED_NAME = ".watch_unprocessed.json"
+
+def open_inotify(watch_dir):
+    if not sys.platform.startswith('linux'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            return None
+        if libc.inotify_add_watch(fd, os.fsencode(watch_dir), WATCH_MASK) < 0:
+            os.close(fd)
+            return None
+        return fd
+    except (OSError, AttributeError):
+        return None
+
+def wait_for_events(fd, timeout):
+    if fd is None:
+        time.sleep(timeout)
+        return
+    readable, _, _ = select.select([fd], [], [], timeout)
+    if not readable:
+        return
+    # Only the wake-up matters; the directory is rescanned either way.
+    while True:
+        try:
+            if not os.read(fd, 64 * 1024):
+                break
+        except OSError as e:
+            if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                break
+            raise
+
+def is_partial_name(name):
+    return name.startswith(('.', '~')) or name.lower().endswith(PARTIAL_SUFFIXES)
+
+def directory_signature(folder_path):
+    count = 0
+    total_size = 0
+    latest_mtime = 0
+    pending = [folder_path]
+    while pending:
+        try:
+            with os.scandir(pending.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(entry.path)
+                        continue
+                    stat = entry.stat(follow_symlinks=False)
+                    count += 1
+                    total_size += stat.st_size
+                    latest_mtime = max(latest_mtime, stat.st_mtime_ns)
+        except OSError:
+            continue
+    return (count, total_size, latest_mtime)
+
+class BundleWatcher:
+    def __init__(self, watch_dir, settle_seconds):
+        self.watch_dir = watch_dir
+        self.settle_seconds = settle_seconds
+        # path -> (signature, monotonic time the signature was first seen)
+        self.pending = {}
+        # path -> top-level (size, mtime) of the entry when it was queued
+        self.processed = {}
+
+    def list_candidates(self):
+        candidates = {}
+        try:
+            with os.scandir(self.watch_dir) as entries:
+                for entry in entries:
+                    if is_partial_name(entry.name):
+                        continue
+                    is_dir = entry.is_dir()
+                    if not is_dir and not is_archive_name(entry.name):
+                        continue
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    candidates[entry.path] = (is_dir, (stat.st_size, stat.st_mtime_ns))
+        except FileNotFoundError:
+            print(f"Watch folder {self.watch_dir} does not exist")
+        return candidates
+
+    def mark_existing(self, exclude=()):
+        for path, (_, top_level) in self.list_candidates().items():
+            if path not in exclude:
+                self.processed[path] = top_level
+
+    def poll(self):
+        now = time.monotonic()
+        ready = []
+        candidates = self.list_candidates()
+
+        for path in list(self.processed):
+            if path not in candidates:
+                del self.processed[path]
+        for path in list(self.pending):
+            if path not in candidates:
+                del self.pending[path]
+
+        for path, (is_dir, top_level) in candidates.items():
+            if self.processed.get(path) == top_level:
+                continue
+            signature = directory_signature(path) if is_dir else top_level
+            previous = self.pending.get(path)
+            if previous is None or previous[0] != signature:
+                # New or still being written: restart the settle timer.
+                self.pending[path] = (signature, now)
+            elif now - previous[1] >= self.settle_seconds:
+                del self.pending[path]
+                self.processed[path] = top_level
+                ready.append(path)
+        return sorted(ready)
+
+def load_unprocessed(output_dir, watch_dir):
+    record_path = os.path.join(output_dir, UNPROCESSED_NAME)
+    try:
+        with open(record_path, 'r', encoding='utf-8') as file:
+            record = json.load(file)
+    except FileNotFoundError:
+        return []
+    except (OSError, ValueError) as e:
+        print(f"Error reading {record_path}: {e}")
+        return []
+    if record.get("watch_dir") != os.path.abspath(watch_dir):
+        return []
+    return record.get("paths", [])
+
+def save_unprocessed(output_dir, watch_dir, paths):
+    record_path = os.path.join(output_dir, UNPROCESSED_NAME)
+    if not paths:
+        remove_quietly(record_path)
+        return
+    os.makedirs(output_dir, exist_ok=True)
+    replace_file(record_path, json.dumps({"watch_dir": os.path.abspath(watch_dir), "paths": sorted(paths)}, indent=4))
+    print(f"{len(paths)} bundle(s) were not processed and will be picked up by the next watch of {watch_dir}:")
+    for path in sorted(paths):
+        print(f"  {path}")
+
+def ignore_interrupts():
+    # Ctrl+C is handled by the watch loop, which lets in-flight bundles
+    # finish; workers should not die mid-report on the same signal.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+def run_watch(watch_dir, output_dir, version_info_path, workers=None, settle_seconds=2.0, poll_interval=1.0, process_existing=False, debug=False, cache_dir=None, cache_max_bytes=None, scan_options=None, dashboard=False, log_signatures=None, output_format="html", history_db=None, content_names=False, layout="single", gzip_copy=False):
+    watcher = BundleWatcher(watch_dir, settle_seconds)
+    resumed = load_unprocessed(output_dir, watch_dir)
+    if resumed:
+        print(f"Resuming {len(resumed)} bundle(s) left unprocessed by the previous watch")
+    if not process_existing:
+        watcher.mark_existing(set(resumed))
+
+    fd = open_inotify(watch_dir)
+    max_in_flight = workers or os.cpu_count() or 1
+    print(f"Watching {watch_dir} ({'inotify' if fd is not None else f'polling every {poll_interval}s'}), writing reports to {output_dir}. Press Ctrl+C to stop.")
+
+    if output_format == "html" and layout == "site":
+        write_site_assets(output_dir, gzip_copy)
+    snapshots = SnapshotOutput(output_format, output_dir) if output_format != "html" else None
+    # As in batch mode, workers only build the rows; the parent writes them.
+    history = HistoryStore(history_db) if history_db else None
+    board = Dashboard(output_dir) if dashboard and output_format == "html" else None
+    queue = deque()
+    # future -> (bundle path, monotonic time it was queued)
+    in_flight = {}
+    counts = {"processed": 0, "failed": 0}
+
+    def report(future):
+        path, queued_at = in_flight.pop(future)
+        result = future.result()
+        counts["processed"] += 1
+        latency = time.monotonic() - queued_at
+        if is_failure(result):
+            counts["failed"] += 1
+            reason = result["error"] if result["error"] is not None else f"could not parse {', '.join(result['failed_steps'])}"
+            print(f"FAILED {result['bundle']}: {reason}")
+        elif snapshots is not None:
+            snapshots.write(result["record"])
+            print(f"Snapshot record for host {result['host_name']} written to {snapshots.path} ({latency:.2f}s after the bundle settled)")
+        else:
+            print(f"HTML report generated at {result['html_path']} for host {result['host_name']} ({latency:.2f}s after the bundle settled)")
+            if board is not None:
+                # Reports arrive one at a time here, so each one is visible
+                # in the dashboard right away.
+                board.add(result["dashboard"], flush=True)
+        if history is not None and not is_failure(result):
+            history.insert(result["history"])
+
+    executor = ProcessPoolExecutor(max_workers=max_in_flight, initializer=ignore_interrupts)
+    try:
+        try:
+            while True:
+                for path in watcher.poll():
+                    queue.append((path, time.monotonic()))
+                    if debug:
+                        print(f"Queued {path}")
+
+                while queue and len(in_flight) < max_in_flight:
+                    path, queued_at = queue.popleft()
+                    future = executor.submit(process_bundle, path, output_dir, version_info_path, debug, cache_dir, cache_max_bytes, False, scan_options, output_format=output_format, record_history=history is not None, content_names=content_names, layout=layout, gzip_copy=gzip_copy, dashboard=board is not None, log_signatures=log_signatures)
+                    in_flight[future] = (path, queued_at)
+
+                if in_flight:
+                    done, _ = wait(in_flight, timeout=0, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        report(future)
+
+                timeout = IDLE_RESCAN_SECONDS if fd is not None else poll_interval
+                if watcher.pending:
+                    timeout = min(timeout, poll_interval)
+                if in_flight:
+                    timeout = min(timeout, RESULT_POLL_SECONDS)
+                if queue and len(in_flight) < max_in_flight:
+                    # A result just freed a worker; submit the next bundle now.
+                    timeout = 0
+                wait_for_events(fd, timeout)
+        except KeyboardInterrupt:
+            print()
+            if in_flight:
+                # Workers ignore SIGINT, so bundles already started finish;
+                # report them rather than dropping their results.
+                print(f"Finishing {len(in_flight)} bundle(s) in progress (Ctrl+C again to abandon them)...")
+                try:
+                    while in_flight:
+                        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            report(future)
+                except KeyboardInterrupt:
+                    pass
+        print(f"Stopped watching {watch_dir}: {counts['processed']} bundle(s) processed, {counts['failed']} failed.")
+    finally:
+        executor.shutdown(wait=not in_flight, cancel_futures=True)
+        if fd is not None:
+            os.close(fd)
+        if snapshots is not None:
+            snapshots.close()
+        if history is not None:
+            history.close()
+        if cache_dir:
+            ParseCache(cache_dir, cache_max_bytes).evict()
+        unprocessed = [path for path, _ in queue] + [path for path, _ in in_flight.values()] + list(watcher.pending)
+        save_unprocessed(output_dir, watch_dir, unprocessed)